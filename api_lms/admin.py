@@ -13,7 +13,8 @@ from .models import (
     ForoConsulta, ForoRespuesta,
     Notificacion,
     Encuesta, RespuestaEncuesta,
-    PlantillaDiploma,
+    PlantillaDiploma, DiplomaJob,
+    PaqueteScorm, RecursoScorm, ArchivoScorm,
     MetricaHistorica,
     AuditLog
 )
@@ -51,5 +52,9 @@ admin.site.register(Notificacion)
 admin.site.register(Encuesta)
 admin.site.register(RespuestaEncuesta)
 admin.site.register(PlantillaDiploma)
+admin.site.register(DiplomaJob)
+admin.site.register(PaqueteScorm)
+admin.site.register(RecursoScorm)
+admin.site.register(ArchivoScorm)
 admin.site.register(MetricaHistorica)
 admin.site.register(AuditLog)
\ No newline at end of file
@@ -6,5 +6,6 @@ class ApiLmsConfig(AppConfig):
     name = 'api_lms'
 
     def ready(self):
-        """Importar signals cuando la app esté lista"""
+        """Importar signals y checks cuando la app esté lista"""
         import api_lms.signals  # ← AGREGAR ESTA LÍNEA
+        import api_lms.checks
@@ -7,6 +7,7 @@ from rest_framework_simplejwt.views import TokenRefreshView
 from .auth_views import (
     CustomTokenObtainPairView,
     register,
+    register_masivo,
     logout,
     verify_token,
     change_password,
@@ -22,6 +23,9 @@ urlpatterns = [
     # Registro de nuevos usuarios
     path('register/', register, name='register'),
     
+    # Registro masivo (solo administradores)
+    path('register/masivo/', register_masivo, name='register_masivo'),
+    
     # Logout (blacklist del refresh token)
     path('logout/', logout, name='logout'),
     
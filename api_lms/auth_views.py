@@ -8,12 +8,17 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from django.contrib.auth.models import User
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError
 
-from api_lms.models import Usuario
+from api_lms.permissions import IsAdministrador
 from api_lms.serializers import UsuarioSerializer
+from api_lms.services.avatares import urls_avatar
+from api_lms.services.registro import (
+    registrar_usuario, registrar_masivo, validar_registros, campo_duplicado
+)
 
 
 # =====================================================
@@ -52,6 +57,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
                 'rol': perfil.tipo_usuario,  # ← AGREGAR ESTO
                 'rut': perfil.get_rut(),
                 'avatar_url': perfil.avatar_url,
+                'avatar_variantes': urls_avatar(perfil),
             }
         else:
             data['user'] = {
@@ -91,11 +97,14 @@ def register(request):
         "nombres": "Juan",
         "apellido_paterno": "Pérez",
         "apellido_materno": "González",
-        "tipo_usuario": "estudiante",  # 'administrador', 'relator', 'estudiante'
         "telefono": "+56912345678",
         "region": "Valparaíso",
         "comuna": "Limache"
     }
+    
+    Siempre crea estudiantes (tipo_usuario del body se ignora); los
+    relatores y administradores los crea un administrador con
+    register_masivo.
     """
     
     # Validar que las contraseñas coincidan
@@ -117,77 +126,112 @@ def register(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Verificar que el username no exista
-    if User.objects.filter(username=request.data.get('username')).exists():
+    if not request.data.get('email'):
+        return Response(
+            {'error': 'El email es obligatorio'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Username, email y RUT repetidos los rechazan las restricciones únicas
+    # de la BD dentro de la transacción (sin consultas previas)
+    try:
+        usuario = registrar_usuario(request.data, password)
+    except IntegrityError as e:
+        campo, mensaje = campo_duplicado(e)
+        if campo is None:
+            return Response(
+                {'error': f'Error al crear usuario: {str(e)}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         return Response(
-            {'error': 'El nombre de usuario ya existe'}, 
+            {'error': mensaje, 'campo': campo}, 
             status=status.HTTP_400_BAD_REQUEST
         )
+    except Exception as e:
+        return Response(
+            {'error': f'Error al crear usuario: {str(e)}'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    # Generar tokens
+    refresh = RefreshToken.for_user(usuario.user)
+    
+    return Response({
+        'message': 'Usuario registrado exitosamente',
+        'user': UsuarioSerializer(usuario).data,
+        'tokens': {
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        }
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdministrador])
+def register_masivo(request):
+    """
+    Registro masivo de usuarios (cohortes corporativas), todo o nada
+    
+    Body esperado:
+    {
+        "tipo_usuario": "estudiante",  # Opcional, por defecto para cada registro
+        "usuarios": [
+            {"username": ..., "email": ..., "password": ..., "rut_numero": ..., "rut_dv": ...,
+             "nombres": ..., "apellido_paterno": ..., "apellido_materno": ..., "empresa_actual": ...},
+            ...
+        ]
+    }
     
-    # Verificar que el email no exista
-    if User.objects.filter(email=request.data.get('email')).exists():
+    Sin "password" la cuenta queda con contraseña inutilizable hasta que el
+    usuario la restablezca. Si algún registro falla no se crea ninguno y se
+    devuelve la lista de errores por índice.
+    """
+    registros = request.data.get('usuarios')
+    tipo_usuario = request.data.get('tipo_usuario', 'estudiante')
+    maximo = settings.REGISTRO_MASIVO['MAX_USUARIOS']
+    
+    if not isinstance(registros, list) or not registros:
+        return Response(
+            {'error': 'Se requiere una lista "usuarios" no vacía'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(registros) > maximo:
         return Response(
-            {'error': 'El email ya está registrado'}, 
+            {'error': f'Máximo {maximo} usuarios por solicitud'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Verificar que el RUT no exista
-    rut_numero = request.data.get('rut_numero')
-    rut_dv = request.data.get('rut_dv')
-    if Usuario.objects.filter(rut_numero=rut_numero, rut_dv=rut_dv).exists():
+    errores = validar_registros(registros, tipo_usuario)
+    if errores:
         return Response(
-            {'error': 'El RUT ya está registrado'}, 
+            {'error': 'Hay registros con errores; no se creó ningún usuario', 'errores': errores}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
     try:
-        # Crear usuario de Django
-        user = User.objects.create_user(
-            username=request.data.get('username'),
-            email=request.data.get('email'),
-            password=password,
-            first_name=request.data.get('nombres', ''),
-            last_name=request.data.get('apellido_paterno', '')
-        )
-        
-        # Crear perfil de Usuario extendido
-        usuario = Usuario.objects.create(
-            user=user,
-            rut_numero=rut_numero,
-            rut_dv=rut_dv,
-            nombres=request.data.get('nombres'),
-            apellido_paterno=request.data.get('apellido_paterno'),
-            apellido_materno=request.data.get('apellido_materno'),
-            tipo_usuario=request.data.get('tipo_usuario', 'estudiante'),
-            telefono=request.data.get('telefono', ''),
-            region=request.data.get('region', ''),
-            comuna=request.data.get('comuna', ''),
-            nivel_educacional=request.data.get('nivel_educacional', ''),
-            profesion=request.data.get('profesion', ''),
-            activo=True
-        )
-        
-        # Generar tokens
-        refresh = RefreshToken.for_user(user)
-        
-        return Response({
-            'message': 'Usuario registrado exitosamente',
-            'user': UsuarioSerializer(usuario).data,
-            'tokens': {
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-            }
-        }, status=status.HTTP_201_CREATED)
-        
-    except Exception as e:
-        # Si algo falla, eliminar el usuario si se creó
-        if 'user' in locals():
-            user.delete()
-        
+        usuarios = registrar_masivo(registros, tipo_usuario)
+    except IntegrityError as e:
+        # Otro registro concurrente tomó un username/email/RUT del lote
+        campo, mensaje = campo_duplicado(e)
         return Response(
-            {'error': f'Error al crear usuario: {str(e)}'}, 
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            {'error': mensaje or f'Error al crear usuarios: {str(e)}', 'campo': campo}, 
+            status=status.HTTP_409_CONFLICT
         )
+    
+    return Response({
+        'message': f'{len(usuarios)} usuarios registrados exitosamente',
+        'creados': len(usuarios),
+        'usuarios': [
+            {
+                'id': usuario.id,
+                'user_id': usuario.user_id,
+                'username': usuario.user.username,
+                'email': usuario.user.email,
+                'tipo_usuario': usuario.tipo_usuario,
+            }
+            for usuario in usuarios
+        ]
+    }, status=status.HTTP_201_CREATED)
 
 
 # =====================================================
@@ -250,6 +294,7 @@ def verify_token(request):
                 'tipo_usuario': perfil.tipo_usuario,
                 'rut': perfil.get_rut(),
                 'avatar_url': perfil.avatar_url,
+                'avatar_variantes': urls_avatar(perfil),
             }
         })
     
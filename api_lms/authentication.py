@@ -0,0 +1,139 @@
+# authentication.py
+# Autenticación JWT sin consultas: rol y perfil desde los claims del token
+# LMS JC Digital Training
+
+"""
+CustomTokenObtainPairSerializer ya guarda `rol` y `usuario_id` en el token.
+JWTAuthentication igual cargaba el User en cada request, y los permisos
+cargaban después el perfil (Usuario) solo para leer tipo_usuario: dos
+consultas antes de llegar a la vista.
+
+JWTClaimsAuthentication entrega un UsuarioToken construido con los claims
+verificados. El perfil y el User se cargan (en una sola consulta) solo si
+la vista los usa; los permisos y los filtros por rol usan rol_usuario() y
+perfil_id(), que no tocan la BD.
+
+Consecuencia: desactivar un usuario o cambiarle el rol se refleja cuando
+expira su access token (SIMPLE_JWT['ACCESS_TOKEN_LIFETIME']), no en el
+siguiente request. Los tokens sin esos claims (usuarios sin perfil) siguen
+el camino normal de JWTAuthentication.
+"""
+
+from django.contrib.auth.models import User
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from api_lms.models import Usuario
+
+_SIN_CARGAR = object()
+
+
+class UsuarioToken:
+    """
+    Usuario autenticado a partir del access token
+
+    id, rol y usuario_id vienen del token. `perfil` carga el Usuario con su
+    User (select_related) la primera vez que se pide; cualquier otro
+    atributo (email, username, check_password(), save()...) se delega a
+    ese User.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, token):
+        try:
+            self.id = token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('El token no contiene un identificador de usuario')
+        self.pk = self.id
+        self.token = token
+        self.rol = token['rol']
+        self.usuario_id = token['usuario_id']
+        self._perfil = _SIN_CARGAR
+
+    def _cargar_perfil(self):
+        """Usuario del token (una consulta la primera vez), o None si ya no existe"""
+        if self._perfil is _SIN_CARGAR:
+            self._perfil = Usuario.objects.select_related('user').filter(
+                pk=self.usuario_id, user_id=self.id
+            ).first()
+        return self._perfil
+
+    @property
+    def perfil(self):
+        perfil = self._cargar_perfil()
+        if perfil is None:
+            # Igual que la relación inversa de Django: hasattr(user, 'perfil') da False
+            raise AttributeError('El usuario no tiene perfil')
+        return perfil
+
+    @cached_property
+    def usuario_django(self):
+        """
+        User de Django (viene con el perfil si ya se cargó)
+
+        Raises:
+            AuthenticationFailed si el User del token ya no existe
+        """
+        perfil = self._cargar_perfil()
+        if perfil is not None:
+            return perfil.user
+        try:
+            return User.objects.get(pk=self.id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed('Usuario no encontrado', code='user_not_found')
+
+    def __getattr__(self, nombre):
+        # Solo se llega aquí si el atributo no existe o su property lanzó
+        # AttributeError: perfil y usuario_django no se delegan (evita la
+        # recursión perfil -> usuario_django -> perfil)
+        if nombre.startswith('_') or nombre in ('perfil', 'usuario_django'):
+            raise AttributeError(nombre)
+        return getattr(self.usuario_django, nombre)
+
+    def __eq__(self, otro):
+        if isinstance(otro, (UsuarioToken, User)):
+            return self.id == otro.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __str__(self):
+        return f'UsuarioToken {self.id} ({self.rol})'
+
+
+class JWTClaimsAuthentication(JWTAuthentication):
+    """JWTAuthentication que no consulta la BD cuando el token trae rol y perfil"""
+
+    def get_user(self, validated_token):
+        if 'rol' not in validated_token or 'usuario_id' not in validated_token:
+            return super().get_user(validated_token)
+        return UsuarioToken(validated_token)
+
+
+def rol_usuario(user):
+    """
+    Rol del usuario autenticado ('administrador', 'relator', 'estudiante')
+
+    Args:
+        user: request.user (UsuarioToken, User o AnonymousUser)
+
+    Returns:
+        str o None si no está autenticado o no tiene perfil
+    """
+    if isinstance(user, UsuarioToken):
+        return user.rol
+    perfil = getattr(user, 'perfil', None)
+    return perfil.tipo_usuario if perfil is not None else None
+
+
+def perfil_id(user):
+    """ID del perfil (Usuario) del usuario autenticado, o None"""
+    if isinstance(user, UsuarioToken):
+        return user.usuario_id
+    perfil = getattr(user, 'perfil', None)
+    return perfil.pk if perfil is not None else None
@@ -0,0 +1,20 @@
+# checks.py
+# Verificaciones de configuración (manage.py check)
+# LMS JC Digital Training
+
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def cache_compartido_para_versiones(app_configs, **kwargs):
+    """Los tokens de versión en un cache por proceso no se invalidan entre workers"""
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.CACHE_RESPUESTAS['ACTIVO'] and backend in settings.CACHES_POR_PROCESO:
+        return [Warning(
+            f'CACHE_RESPUESTAS_ACTIVO está activo con {backend.rsplit(".", 1)[-1]}, que es por proceso',
+            hint='Use RedisCache (CACHE_BACKEND/CACHE_LOCATION) si hay más de un worker; '
+                 'las invalidaciones solo llegan al proceso que atendió la escritura.',
+            id='api_lms.W001',
+        )]
+    return []
@@ -2,29 +2,152 @@
 # Utilidades para generación de diplomas PDF
 # LMS JC Digital Training - CORREGIDO SEGÚN MODELOS REALES
 
-import uuid
-from datetime import datetime
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import re
+import struct
+from datetime import date, datetime, timedelta
 from io import BytesIO
-import cloudinary.uploader
 
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
 from django.template.loader import render_to_string
 from django.utils import timezone
-from api_lms.models import PlantillaDiploma, Inscripcion
+from django.utils.crypto import constant_time_compare, salted_hmac
+from api_lms.models import PlantillaDiploma, Inscripcion, DiplomaJob
+from api_lms.services.almacenamiento import EtapaSubida, obtener_backend, subir_con_reintentos
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib import colors
 from reportlab.lib.units import cm
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER
+from reportlab.graphics import renderSVG
+from reportlab.graphics.barcode.qr import QrCodeWidget
+from reportlab.graphics.shapes import Drawing
 from bs4 import BeautifulSoup
 
-def generar_codigo_validacion():
+logger = logging.getLogger(__name__)
+
+# Códigos firmados: DIP- + base32(inscripción id | día de emisión | HMAC truncado)
+PREFIJO_CODIGO = 'DIP-'
+EPOCA_CODIGOS = date(2020, 1, 1)
+_FORMATO_PAYLOAD = '>IH'  # uint32 inscripción id, uint16 días desde EPOCA_CODIGOS
+_LARGO_PAYLOAD = struct.calcsize(_FORMATO_PAYLOAD)
+_LARGO_FIRMA = 10  # bytes de HMAC-SHA256 conservados (80 bits)
+_SALT_FIRMA = 'api_lms.diplomas.codigo_validacion'
+_PATRON_CODIGO_LEGADO = re.compile(r'^DIP-[0-9A-F]{8}$')
+
+
+def _firmar_payload(payload):
+    """HMAC-SHA256 truncado del payload con DIPLOMAS_FIRMA['SECRETO']"""
+    return salted_hmac(
+        _SALT_FIRMA, payload,
+        secret=settings.DIPLOMAS_FIRMA['SECRETO'],
+        algorithm='sha256'
+    ).digest()[:_LARGO_FIRMA]
+
+
+def _codificar_token(datos):
+    """Base32 sin relleno '='"""
+    return base64.b32encode(datos).decode().rstrip('=')
+
+
+def generar_codigo_validacion(inscripcion_id, fecha_emision=None):
     """
-    Genera un código único de validación para el diploma
-    Formato: DIP-XXXXXX (8 caracteres aleatorios)
+    Genera el código de validación firmado de un diploma
+    Formato: DIP- seguido de 26 caracteres base32
+    
+    El código contiene la inscripción y el día de emisión firmados con HMAC,
+    de modo que su autenticidad se puede verificar sin consultar la base de datos.
+    
+    Args:
+        inscripcion_id: ID de la inscripción
+        fecha_emision: datetime/date de emisión (por defecto, hoy)
+    
+    Returns:
+        str con el código
     """
-    codigo = f"DIP-{uuid.uuid4().hex[:8].upper()}"
-    return codigo
+    fecha_emision = fecha_emision or timezone.now()
+    if isinstance(fecha_emision, datetime):
+        fecha_emision = timezone.localdate(fecha_emision)
+    
+    dias = (fecha_emision - EPOCA_CODIGOS).days
+    payload = struct.pack(_FORMATO_PAYLOAD, inscripcion_id, dias)
+    return f"{PREFIJO_CODIGO}{_codificar_token(payload + _firmar_payload(payload))}"
+
+
+def verificar_firma_codigo(codigo_validacion):
+    """
+    Verifica offline la firma de un código de validación (sin acceso a BD)
+    
+    Args:
+        codigo_validacion: Código a verificar
+    
+    Returns:
+        dict con 'inscripcion_id' y 'fecha_emision' si la firma es válida,
+        None si el código está mal formado o fue falsificado
+    """
+    if not codigo_validacion or not codigo_validacion.startswith(PREFIJO_CODIGO):
+        return None
+    
+    token = codigo_validacion[len(PREFIJO_CODIGO):].upper()
+    try:
+        datos = base64.b32decode(token + '=' * (-len(token) % 8))
+    except (binascii.Error, ValueError):
+        return None
+    
+    # Rechazar codificaciones no canónicas (bits de relleno alterados)
+    if len(datos) != _LARGO_PAYLOAD + _LARGO_FIRMA or _codificar_token(datos) != token:
+        return None
+    
+    payload, firma = datos[:_LARGO_PAYLOAD], datos[_LARGO_PAYLOAD:]
+    if not constant_time_compare(firma, _firmar_payload(payload)):
+        return None
+    
+    inscripcion_id, dias = struct.unpack(_FORMATO_PAYLOAD, payload)
+    return {
+        'inscripcion_id': inscripcion_id,
+        'fecha_emision': EPOCA_CODIGOS + timedelta(days=dias),
+    }
+
+
+def es_codigo_legado(codigo_validacion):
+    """Códigos DIP-XXXXXXXX aleatorios emitidos antes de los códigos firmados"""
+    return bool(_PATRON_CODIGO_LEGADO.match(codigo_validacion or ''))
+
+
+def url_validacion_diploma(codigo_validacion):
+    """URL pública de validación que se codifica en el QR del diploma"""
+    base = settings.DIPLOMAS_FIRMA['URL_VALIDACION']
+    return f"{base}{codigo_validacion}" if base else codigo_validacion
+
+
+def generar_qr_svg(contenido, tamaño=110):
+    """
+    Genera un código QR como data URI SVG, listo para un <img> en la plantilla
+    
+    Args:
+        contenido: Texto a codificar (la URL de validación)
+        tamaño: Lado del QR en puntos
+    
+    Returns:
+        str con el data URI
+    """
+    widget = QrCodeWidget(contenido, barLevel='M')
+    x1, y1, x2, y2 = widget.getBounds()
+    dibujo = Drawing(
+        tamaño, tamaño,
+        transform=[tamaño / (x2 - x1), 0, 0, tamaño / (y2 - y1), 0, 0]
+    )
+    dibujo.add(widget)
+    svg = renderSVG.drawToString(dibujo)
+    return 'data:image/svg+xml;base64,' + base64.b64encode(svg.encode('utf-8')).decode()
 
 
 def obtener_plantilla_activa():
@@ -44,19 +167,22 @@ def obtener_plantilla_activa():
     return plantilla
 
 
-def generar_variables_diploma(inscripcion, codigo_validacion):
+def generar_variables_diploma(inscripcion, codigo_validacion, fecha_emision=None):
     """
     Genera el diccionario de variables para reemplazar en la plantilla
     
     Args:
         inscripcion: Instancia de Inscripcion
         codigo_validacion: Código único de validación
+        fecha_emision: datetime de emisión (por defecto, ahora)
     
     Returns:
         dict con variables para el template
     """
     estudiante = inscripcion.estudiante
     curso = inscripcion.curso
+    fecha_emision = fecha_emision or timezone.now()
+    url_validacion = url_validacion_diploma(codigo_validacion)
     
     # Duración del curso
     duracion_horas = curso.horas_totales
@@ -107,8 +233,10 @@ def generar_variables_diploma(inscripcion, codigo_validacion):
         
         # Validación y fechas
         'codigo_validacion': codigo_validacion,
-        'fecha_emision': timezone.now().strftime('%d/%m/%Y'),
-        'año_emision': timezone.now().year,
+        'url_validacion': url_validacion,
+        'qr_validacion': f'<img class="qr-validacion" src="{generar_qr_svg(url_validacion)}" alt="QR de validación">',
+        'fecha_emision': fecha_emision.strftime('%d/%m/%Y'),
+        'año_emision': fecha_emision.year,
         
         # Empresa
         'empresa_nombre': 'JC Digital Training',
@@ -118,6 +246,37 @@ def generar_variables_diploma(inscripcion, codigo_validacion):
     return variables
 
 
+PLACEHOLDER_QR = '{{qr_validacion}}'
+
+# Para plantillas guardadas en la BD antes de existir {{qr_validacion}}:
+# no traen la clase .qr-validacion, así que el bloque lleva su propio estilo
+BLOQUE_QR = (
+    '<style>.qr-validacion { position: fixed; bottom: 5mm; right: 20mm; '
+    'width: 28mm; height: 28mm; }</style>' + PLACEHOLDER_QR
+)
+
+
+def plantilla_sin_qr(html):
+    """True si la plantilla no tiene el placeholder del QR de validación"""
+    return PLACEHOLDER_QR not in html
+
+
+def insertar_qr_validacion(html, variables):
+    """
+    Agrega el QR de validación a plantillas que no lo incluyen, antes de
+    </body> (o al final si no hay)
+
+    Returns:
+        str con el HTML de la plantilla (sin reemplazar variables)
+    """
+    if 'qr_validacion' not in variables or not plantilla_sin_qr(html):
+        return html
+    posicion = html.lower().rfind('</body>')
+    if posicion == -1:
+        return html + BLOQUE_QR
+    return html[:posicion] + BLOQUE_QR + html[posicion:]
+
+
 def generar_html_diploma(plantilla, variables):
     """
     Genera el HTML del diploma reemplazando variables
@@ -129,7 +288,7 @@ def generar_html_diploma(plantilla, variables):
     Returns:
         str con HTML completo
     """
-    html_template = plantilla.plantilla_html
+    html_template = insertar_qr_validacion(plantilla.plantilla_html, variables)
     
     # Reemplazar todas las variables en el formato {{variable}}
     for key, value in variables.items():
@@ -138,6 +297,39 @@ def generar_html_diploma(plantilla, variables):
     
     return html_template
 
+# Variables que no forman parte de la identidad del diploma: el código se
+# conserva entre regeneraciones y la emisión corresponde a la primera vez
+VARIABLES_EXCLUIDAS_HASH = {
+    'codigo_validacion', 'url_validacion', 'qr_validacion', 'fecha_emision', 'año_emision'
+}
+
+
+def calcular_hash_diploma(plantilla, variables):
+    """
+    Calcula la clave de contenido del diploma: SHA-256 de la versión de la
+    plantilla (su HTML) y de las variables renderizadas.
+    Mismo hash = mismo PDF, por lo que no hace falta volver a generarlo.
+    
+    Returns:
+        str hexadecimal de 64 caracteres
+    """
+    contenido = {
+        'plantilla_id': plantilla.id,
+        'plantilla_html': hashlib.sha256(plantilla.plantilla_html.encode('utf-8')).hexdigest(),
+        'variables': {
+            clave: str(valor)
+            for clave, valor in variables.items()
+            if clave not in VARIABLES_EXCLUIDAS_HASH
+        },
+    }
+    # El QR que agrega insertar_qr_validacion cambia el PDF: los diplomas
+    # de plantillas sin placeholder se regeneran una vez para incluirlo
+    if 'qr_validacion' in variables and plantilla_sin_qr(plantilla.plantilla_html):
+        contenido['qr_insertado'] = True
+    serializado = json.dumps(contenido, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+
 def generar_pdf_diploma(html_content):
     """
     Genera PDF usando Playwright - soporta CSS moderno con gradientes
@@ -181,57 +373,100 @@ def generar_pdf_diploma(html_content):
         raise Exception(f"Error con Playwright: {str(e)}")
 
 
-def subir_diploma_cloudinary(pdf_file, inscripcion, codigo_validacion):
+def nombre_archivo_diploma(inscripcion, clave):
+    """
+    Nombre (public_id) determinístico del PDF de un diploma.
+    Reintentar la subida con el mismo nombre sobrescribe el archivo en vez
+    de duplicarlo.
+    
+    Args:
+        clave: Hash de contenido del diploma (o código de validación)
+    """
+    estudiante_rut = inscripcion.estudiante.get_rut().replace('-', '')
+    curso_id = inscripcion.curso_id
+    return f"diploma_{estudiante_rut}_{curso_id}_{clave[:16]}"
+
+
+def public_id_diploma_anterior(inscripcion):
     """
-    Sube el PDF del diploma a Cloudinary
+    public_id del PDF vigente de la inscripción (antes de regenerarlo), o
+    None si no tiene diploma. Los diplomas sin hash de contenido se subieron
+    con el código de validación como clave.
+    """
+    if not (inscripcion.diploma_generado and inscripcion.diploma_url):
+        return None
+    clave = inscripcion.diploma_hash or inscripcion.diploma_codigo_validacion
+    if not clave:
+        return None
+    carpeta = settings.ALMACENAMIENTO['diplomas'].get('CARPETA', 'diplomas')
+    nombre = nombre_archivo_diploma(inscripcion, clave)
+    return f"{carpeta}/{nombre}" if carpeta else nombre
+
+
+def eliminar_diploma_anterior(public_id):
+    """
+    Borra del almacenamiento un PDF reemplazado por una regeneración.
+    Un fallo solo se registra: el diploma nuevo ya quedó guardado.
+    """
+    try:
+        obtener_backend('diplomas').eliminar(public_id, resource_type='raw')
+    except Exception:
+        logger.exception('No se pudo eliminar el diploma anterior %s', public_id)
+
+
+def subir_diploma_cloudinary(pdf_file, inscripcion, codigo_validacion, hash_contenido=None):
+    """
+    Sube el PDF del diploma al backend de almacenamiento configurado
+    (Cloudinary por defecto), con timeout y reintentos con backoff
     
     Args:
         pdf_file: BytesIO con el PDF
         inscripcion: Instancia de Inscripcion
         codigo_validacion: Código único del diploma
+        hash_contenido: Clave de contenido (ver calcular_hash_diploma)
     
     Returns:
         dict con información del archivo subido (url, public_id)
     """
-    # IMPORTANTE: Asegurar que el buffer está al inicio
-    pdf_file.seek(0)
-    
-    # Nombre del archivo
-    estudiante_rut = inscripcion.estudiante.get_rut().replace('-', '')
-    curso_id = inscripcion.curso.id
-    filename = f"diploma_{estudiante_rut}_{curso_id}_{codigo_validacion}"
+    config = settings.ALMACENAMIENTO['diplomas']
+    filename = nombre_archivo_diploma(inscripcion, hash_contenido or codigo_validacion)
     
-    # Subir a Cloudinary en carpeta 'diplomas'
-    upload_result = cloudinary.uploader.upload(
+    upload_result = subir_con_reintentos(
+        obtener_backend('diplomas'),
         pdf_file,
-        folder="diplomas",
         public_id=filename,
-        resource_type="raw",  # Para PDFs
-        overwrite=True
+        carpeta=config.get('CARPETA', 'diplomas'),
+        resource_type='raw',  # Para PDFs
+        reintentos=config.get('REINTENTOS', 3),
+        backoff_base=config.get('BACKOFF_BASE', 1.0),
     )
     
     return {
-        'url': upload_result['secure_url'],
+        'url': upload_result['url'],
         'public_id': upload_result['public_id'],
         'filename': filename
     }
 
 
-def generar_diploma_completo(inscripcion_id):
+def preparar_diploma(inscripcion_id):
     """
-    Función principal que genera el diploma completo y lo sube a Cloudinary
+    Valida la inscripción y renderiza el PDF del diploma (sin subirlo).
+    
+    Si la inscripción ya tiene un diploma generado con el mismo hash de
+    contenido, no se vuelve a renderizar: se retorna el existente con
+    'reutilizado': True. El código de validación y la fecha de emisión
+    se conservan entre regeneraciones.
     
     Args:
         inscripcion_id: ID de la inscripción
     
     Returns:
-        dict con información del diploma generado
+        dict con 'success', y si es exitoso: 'inscripcion', 'codigo_validacion',
+        'hash_contenido' y 'pdf_file' (o 'reutilizado' y 'resultado')
     """
-    from .notificaciones_utils import notificar_diploma_listo
-    
     # Obtener inscripción
     try:
-        inscripcion = Inscripcion.objects.get(id=inscripcion_id)
+        inscripcion = Inscripcion.objects.select_related('estudiante', 'curso').get(id=inscripcion_id)
     except Inscripcion.DoesNotExist:
         return {
             'error': 'Inscripción no encontrada',
@@ -245,8 +480,10 @@ def generar_diploma_completo(inscripcion_id):
             'success': False
         }
     
-    # Generar código de validación
-    codigo_validacion = generar_codigo_validacion()
+    # Conservar el código de validación si el diploma ya existía
+    codigo_validacion = inscripcion.diploma_codigo_validacion or generar_codigo_validacion(
+        inscripcion.id, inscripcion.fecha_diploma
+    )
     
     # Obtener plantilla activa
     plantilla = obtener_plantilla_activa()
@@ -257,69 +494,339 @@ def generar_diploma_completo(inscripcion_id):
         }
     
     # Generar variables
-    variables = generar_variables_diploma(inscripcion, codigo_validacion)
+    variables = generar_variables_diploma(
+        inscripcion, codigo_validacion, fecha_emision=inscripcion.fecha_diploma
+    )
+    hash_contenido = calcular_hash_diploma(plantilla, variables)
+    
+    # Nada cambió desde la última generación: reutilizar el artefacto
+    if (inscripcion.diploma_generado and inscripcion.diploma_url
+            and inscripcion.diploma_hash == hash_contenido):
+        return {
+            'success': True,
+            'reutilizado': True,
+            'inscripcion': inscripcion,
+            'resultado': resultado_diploma(
+                inscripcion,
+                inscripcion.diploma_url,
+                codigo_validacion,
+                nombre_archivo_diploma(inscripcion, hash_contenido),
+                reutilizado=True
+            )
+        }
     
     # Generar HTML
     html_content = generar_html_diploma(plantilla, variables)
     
-    # Generar PDF con xhtml2pdf
+    # Generar PDF con Playwright
     try:
         pdf_file = generar_pdf_diploma(html_content)
     except Exception as e:
         return {
             'error': f'Error al generar PDF: {str(e)}',
-            'success': False
+            'success': False,
+            'reintentable': True
         }
     
-    # Subir a Cloudinary
-    try:
-        upload_info = subir_diploma_cloudinary(pdf_file, inscripcion, codigo_validacion)
-    except Exception as e:
-        return {
-            'error': f'Error al subir a Cloudinary: {str(e)}',
-            'success': False
-        }
+    return {
+        'success': True,
+        'inscripcion': inscripcion,
+        'codigo_validacion': codigo_validacion,
+        'hash_contenido': hash_contenido,
+        'pdf_file': pdf_file
+    }
+
+
+def resultado_diploma(inscripcion, diploma_url, codigo_validacion, filename, reutilizado=False):
+    """Arma el dict de resultado común a generación y reutilización"""
+    return {
+        'success': True,
+        'reutilizado': reutilizado,
+        'diploma_url': diploma_url,
+        'codigo_validacion': codigo_validacion,
+        'filename': filename,
+        'estudiante': inscripcion.estudiante.nombre_completo(),
+        'curso': inscripcion.curso.nombre
+    }
+
+
+def registrar_diploma(inscripcion, upload_info, codigo_validacion, hash_contenido):
+    """
+    Guarda en la inscripción el diploma ya subido y notifica al estudiante
+    
+    Returns:
+        dict con información del diploma generado
+    """
+    from .notificaciones_utils import notificar_diploma_listo
     
-    # Actualizar inscripción con URL y código del diploma
+    # El hash cambió (plantilla o datos): el PDF anterior queda huérfano
+    public_id_anterior = public_id_diploma_anterior(inscripcion)
+    
+    # Actualizar inscripción con URL, código y hash del diploma
     inscripcion.diploma_url = upload_info['url']
     inscripcion.diploma_codigo_validacion = codigo_validacion
+    inscripcion.diploma_hash = hash_contenido
     inscripcion.diploma_generado = True
-    inscripcion.fecha_diploma = timezone.now()
+    # La fecha de emisión es la de la primera generación
+    if not inscripcion.fecha_diploma:
+        inscripcion.fecha_diploma = timezone.now()
     inscripcion.save(update_fields=[
         'diploma_url', 
         'diploma_codigo_validacion', 
+        'diploma_hash',
         'diploma_generado',
         'fecha_diploma'
     ])
     
+    # Solo tras guardar el nuevo: si algo falla antes, el anterior sigue vigente
+    if public_id_anterior and public_id_anterior != upload_info['public_id']:
+        eliminar_diploma_anterior(public_id_anterior)
+    
+    # La URL pudo cambiar: descartar la validación cacheada
+    invalidar_cache_validacion(codigo_validacion)
+    
     # Notificar al estudiante
     notificar_diploma_listo(inscripcion, upload_info['url'], codigo_validacion)
     
-    return {
-        'success': True,
-        'diploma_url': upload_info['url'],
-        'codigo_validacion': codigo_validacion,
-        'filename': upload_info['filename'],
-        'estudiante': inscripcion.estudiante.nombre_completo(),
-        'curso': inscripcion.curso.nombre
-    }
+    return resultado_diploma(inscripcion, upload_info['url'], codigo_validacion, upload_info['filename'])
 
-    # Notificar al estudiante
-    notificar_diploma_listo(inscripcion, upload_info['url'], codigo_validacion)
+
+def generar_diploma_completo(inscripcion_id):
+    """
+    Función principal que genera el diploma completo y lo sube a Cloudinary
     
-    return {
-        'success': True,
-        'diploma_url': upload_info['url'],
-        'codigo_validacion': codigo_validacion,
-        'filename': upload_info['filename'],
-        'estudiante': inscripcion.estudiante.nombre_completo(),
-        'curso': inscripcion.curso.nombre
-    }
+    Args:
+        inscripcion_id: ID de la inscripción
+    
+    Returns:
+        dict con información del diploma generado
+    """
+    preparado = preparar_diploma(inscripcion_id)
+    if not preparado['success']:
+        return preparado
+    if preparado.get('reutilizado'):
+        return preparado['resultado']
+    
+    inscripcion = preparado['inscripcion']
+    codigo_validacion = preparado['codigo_validacion']
+    hash_contenido = preparado['hash_contenido']
+    
+    # Subir al almacenamiento
+    try:
+        upload_info = subir_diploma_cloudinary(
+            preparado['pdf_file'], inscripcion, codigo_validacion, hash_contenido
+        )
+    except Exception as e:
+        return {
+            'error': f'Error al subir a Cloudinary: {str(e)}',
+            'success': False,
+            'reintentable': True
+        }
+    
+    return registrar_diploma(inscripcion, upload_info, codigo_validacion, hash_contenido)
+
+
+def generar_diplomas_masivo(inscripcion_ids, max_workers=None):
+    """
+    Genera diplomas para varias inscripciones en modo pipeline:
+    el render (Chromium) avanza secuencialmente mientras las subidas
+    corren en paralelo en la etapa de subida, así el ancho de banda
+    se aprovecha en vez de esperar cada subida en serie.
+    
+    Args:
+        inscripcion_ids: Lista de IDs de inscripción
+        max_workers: Tamaño del pool de subida (por defecto el de settings)
+    
+    Returns:
+        dict {inscripcion_id: resultado} con el mismo formato de generar_diploma_completo
+    """
+    config = settings.ALMACENAMIENTO['diplomas']
+    carpeta = config.get('CARPETA', 'diplomas')
+    resultados = {}
+    pendientes = []
+    
+    with EtapaSubida('diplomas', max_workers=max_workers) as etapa:
+        for inscripcion_id in inscripcion_ids:
+            preparado = preparar_diploma(inscripcion_id)
+            if not preparado['success']:
+                resultados[inscripcion_id] = preparado
+                continue
+            if preparado.get('reutilizado'):
+                resultados[inscripcion_id] = preparado['resultado']
+                continue
+            
+            inscripcion = preparado['inscripcion']
+            codigo_validacion = preparado['codigo_validacion']
+            hash_contenido = preparado['hash_contenido']
+            # Resolver el nombre aquí: los hilos de subida no tocan la BD
+            filename = nombre_archivo_diploma(inscripcion, hash_contenido)
+            futuro = etapa.enviar(preparado['pdf_file'], filename, carpeta, resource_type='raw')
+            pendientes.append((inscripcion, codigo_validacion, hash_contenido, filename, futuro))
+        
+        for inscripcion, codigo_validacion, hash_contenido, filename, futuro in pendientes:
+            try:
+                upload_result = futuro.result()
+            except Exception as e:
+                resultados[inscripcion.id] = {
+                    'error': f'Error al subir a Cloudinary: {str(e)}',
+                    'success': False,
+                    'reintentable': True
+                }
+                continue
+            
+            upload_info = {
+                'url': upload_result['url'],
+                'public_id': upload_result['public_id'],
+                'filename': filename
+            }
+            resultados[inscripcion.id] = registrar_diploma(
+                inscripcion, upload_info, codigo_validacion, hash_contenido
+            )
+    
+    return resultados
+
+
+# =====================================================
+# COLA DE GENERACIÓN ASÍNCRONA
+# =====================================================
+
+def encolar_diploma(inscripcion, solicitado_por=None):
+    """
+    Encola la generación del diploma de una inscripción.
+    Si ya hay un trabajo activo para la inscripción, lo reutiliza.
+    
+    Returns:
+        tuple (DiplomaJob, creado)
+    """
+    with transaction.atomic():
+        # Bloquear la inscripción serializa solicitudes concurrentes
+        Inscripcion.objects.select_for_update().filter(pk=inscripcion.pk).first()
+        job = DiplomaJob.objects.filter(
+            inscripcion=inscripcion,
+            estado__in=['pendiente', 'procesando']
+        ).first()
+        if job:
+            return job, False
+        
+        job = DiplomaJob.objects.create(
+            inscripcion=inscripcion,
+            solicitado_por=solicitado_por,
+            max_intentos=settings.DIPLOMAS_JOBS['MAX_INTENTOS'],
+        )
+        return job, True
+
+
+def tomar_siguiente_job():
+    """
+    Toma el siguiente trabajo disponible y lo marca como 'procesando'.
+    Usa SELECT ... FOR UPDATE SKIP LOCKED, por lo que varios workers pueden
+    consumir la cola en paralelo sin tomar el mismo trabajo.
+    Trabajos 'procesando' abandonados (worker caído) se vuelven a tomar
+    después de DIPLOMAS_JOBS['TIMEOUT_PROCESANDO'] segundos, salvo que ya
+    hayan agotado max_intentos: esos se marcan como 'error' (un trabajo que
+    tumba al worker no se reintenta para siempre).
+    
+    Returns:
+        DiplomaJob o None si la cola está vacía
+    """
+    ahora = timezone.now()
+    limite_procesando = ahora - timedelta(seconds=settings.DIPLOMAS_JOBS['TIMEOUT_PROCESANDO'])
+    
+    while True:
+        with transaction.atomic():
+            job = DiplomaJob.objects.select_for_update(skip_locked=True).filter(
+                Q(estado='pendiente', disponible_desde__lte=ahora) |
+                Q(estado='procesando', fecha_inicio__lt=limite_procesando)
+            ).order_by('disponible_desde', 'id').first()
+            
+            if not job:
+                return None
+            
+            if job.estado == 'procesando' and job.intentos >= job.max_intentos:
+                job.estado = 'error'
+                job.ultimo_error = (
+                    f'El worker no terminó el trabajo en {job.intentos} intentos '
+                    '(caída o tiempo agotado)'
+                )
+                job.fecha_fin = ahora
+                job.save(update_fields=['estado', 'ultimo_error', 'fecha_fin', 'updated_at'])
+                continue
+            
+            job.estado = 'procesando'
+            job.intentos += 1
+            job.fecha_inicio = ahora
+            job.save(update_fields=['estado', 'intentos', 'fecha_inicio', 'updated_at'])
+            return job
+
+
+def procesar_diploma_job(job):
+    """
+    Ejecuta un trabajo ya tomado por el worker.
+    Los errores transitorios (render, subida) se reprograman con backoff
+    exponencial hasta agotar max_intentos; los demás fallan de inmediato.
+    
+    Returns:
+        DiplomaJob actualizado
+    """
+    try:
+        resultado = generar_diploma_completo(job.inscripcion_id)
+    except Exception as e:
+        resultado = {
+            'error': f'Error inesperado: {str(e)}',
+            'success': False,
+            'reintentable': True
+        }
+    
+    ahora = timezone.now()
+    if resultado.get('success'):
+        job.estado = 'completado'
+        job.resultado = {
+            'diploma_url': resultado['diploma_url'],
+            'codigo_validacion': resultado['codigo_validacion'],
+            'estudiante': resultado['estudiante'],
+            'curso': resultado['curso']
+        }
+        job.ultimo_error = ''
+        job.fecha_fin = ahora
+    elif resultado.get('reintentable') and job.intentos < job.max_intentos:
+        espera = settings.DIPLOMAS_JOBS['BACKOFF_BASE'] * (2 ** (job.intentos - 1))
+        job.estado = 'pendiente'
+        job.ultimo_error = resultado.get('error', '')
+        job.disponible_desde = ahora + timedelta(seconds=espera)
+    else:
+        job.estado = 'error'
+        job.ultimo_error = resultado.get('error', 'Error al generar diploma')
+        job.fecha_fin = ahora
+    
+    job.save(update_fields=[
+        'estado', 'resultado', 'ultimo_error', 'disponible_desde', 'fecha_fin', 'updated_at'
+    ])
+    return job
+
+
+def clave_cache_validacion(codigo_validacion):
+    """Clave del cache de resultados de validación para un código"""
+    return f"diploma:validacion:{codigo_validacion}"
+
+
+def invalidar_cache_validacion(codigo_validacion):
+    """Elimina el resultado cacheado de un código (al generar o revocar un diploma)"""
+    if codigo_validacion:
+        cache.delete(clave_cache_validacion(codigo_validacion))
 
 
 def validar_codigo_diploma(codigo_validacion):
     """
-    Valida un código de diploma y retorna la información asociada
+    Valida un código de diploma y retorna la información asociada.
+    
+    Los códigos firmados se verifican primero offline (HMAC): un código
+    falsificado o mal escrito se rechaza sin tocar el cache ni la base de datos.
+    Los códigos legados (DIP-XXXXXXXX) siguen validándose contra la BD.
+    
+    Read-through cache: los resultados válidos se guardan por
+    DIPLOMAS_VALIDACION['CACHE_TTL'] y los códigos inexistentes por
+    DIPLOMAS_VALIDACION['CACHE_TTL_NEGATIVO'], para que un barrido de
+    códigos al azar no llegue a la base de datos.
     
     Args:
         codigo_validacion: Código a validar
@@ -327,8 +834,47 @@ def validar_codigo_diploma(codigo_validacion):
     Returns:
         dict con información del diploma o error
     """
+    codigo_validacion = (codigo_validacion or '').strip().upper()
+    firma = verificar_firma_codigo(codigo_validacion)
+    if firma is None and not es_codigo_legado(codigo_validacion):
+        return {
+            'valido': False,
+            'error': 'Código de diploma no encontrado'
+        }
+    
+    clave = clave_cache_validacion(codigo_validacion)
+    resultado = cache.get(clave)
+    if resultado is not None:
+        return resultado
+    
+    resultado = _validar_codigo_diploma_bd(codigo_validacion, firma)
+    
+    config = settings.DIPLOMAS_VALIDACION
+    ttl = config['CACHE_TTL'] if resultado['valido'] else config['CACHE_TTL_NEGATIVO']
+    cache.set(clave, resultado, ttl)
+    return resultado
+
+
+def _validar_codigo_diploma_bd(codigo_validacion, firma=None):
+    """
+    Consulta el diploma en la base de datos (una sola query con JOIN)
+    
+    Para códigos firmados la autenticidad ya está verificada; la consulta
+    por PK solo comprueba que el diploma siga vigente (no revocado ni
+    reemplazado por otro código).
+    """
     try:
-        inscripcion = Inscripcion.objects.get(diploma_codigo_validacion=codigo_validacion)
+        inscripciones = Inscripcion.objects.select_related('estudiante', 'curso')
+        if firma:
+            inscripcion = inscripciones.get(
+                pk=firma['inscripcion_id'],
+                diploma_codigo_validacion=codigo_validacion,
+                diploma_generado=True
+            )
+        else:
+            inscripcion = inscripciones.get(
+                diploma_codigo_validacion=codigo_validacion
+            )
         
         # Formatear fecha de término
         fecha_termino = inscripcion.fecha_fin_real or inscripcion.curso.fecha_fin
@@ -346,5 +892,5 @@ def validar_codigo_diploma(codigo_validacion):
     except Inscripcion.DoesNotExist:
         return {
             'valido': False,
-            'error': 'Código de diploma no encontrado'
-        }
\ No newline at end of file
+            'error': 'Diploma revocado o no vigente' if firma else 'Código de diploma no encontrado'
+        }
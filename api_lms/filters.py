@@ -0,0 +1,86 @@
+# filters.py
+# Filtros globales de DRF: campos parciales (?fields=/?expand=) también en el SQL
+# LMS JC Digital Training
+
+"""
+Parámetros de respuestas parciales (única definición; los serializers con
+CamposDinamicosMixin y los ViewSets se atienen a esto):
+
+- ?fields=a,b: solo esos campos de la respuesta
+- ?expand=x,y: relaciones anidadas, nombradas por su clave en la
+  respuesta (p.ej. curso_data en inscripciones). Se suman a ?fields=, y
+  en los listados con forma resumida (InscripcionViewSet) entregan esas
+  relaciones en su forma completa. Sin ?fields= solo tiene ese segundo
+  efecto.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import BaseSerializer
+
+
+def _lista_parametro(request, nombre):
+    valor = request.query_params.get(nombre, '')
+    return {campo.strip() for campo in valor.split(',') if campo.strip()}
+
+
+def relaciones_expandidas(request):
+    """Claves de las relaciones anidadas pedidas con ?expand= (set, vacío si no hay)"""
+    if request is None:
+        return set()
+    return _lista_parametro(request, 'expand')
+
+
+def campos_solicitados(request):
+    """
+    Campos pedidos con ?fields=, más las relaciones anidadas de ?expand=
+
+    Ejemplo: ?fields=id,nombre&expand=modulos entrega id, nombre y modulos
+
+    Returns:
+        set de nombres de campo, o None si la respuesta debe ser completa
+        (sin ?fields o en métodos de escritura)
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    campos = _lista_parametro(request, 'fields')
+    if not campos:
+        return None
+    return campos | relaciones_expandidas(request)
+
+
+class CamposDinamicosFilter(BaseFilterBackend):
+    """
+    Limita las columnas leídas a las que entregará el serializer
+
+    Si todos los campos pedidos con ?fields= son columnas del modelo, el
+    queryset se reduce con .only() y se quitan los select_related y
+    prefetch_related (ningún campo pedido los usa). Si se pide algún campo
+    calculado o anidado, el queryset queda intacto: no es posible saber qué
+    columnas necesita.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if getattr(view, 'action', None) not in ('list', 'retrieve'):
+            return queryset
+        if campos_solicitados(request) is None:
+            return queryset
+
+        # El serializer ya aplica ?fields= al construirse con el request
+        serializer = view.get_serializer()
+        modelo = queryset.model
+        columnas = {modelo._meta.pk.name}
+
+        for campo in serializer.fields.values():
+            if isinstance(campo, BaseSerializer) or campo.source == '*' or '.' in campo.source:
+                return queryset
+            try:
+                campo_modelo = modelo._meta.get_field(campo.source)
+            except FieldDoesNotExist:
+                return queryset  # propiedad del modelo
+            if not campo_modelo.concrete or campo_modelo.many_to_many:
+                return queryset
+            columnas.add(campo_modelo.name)
+
+        return queryset.select_related(None).prefetch_related(None).only(*columnas)
@@ -0,0 +1,219 @@
+# instrumentacion.py
+# Conteo de consultas SQL por request: headers, estadísticas y presupuestos por endpoint
+# LMS JC Digital Training
+
+import hashlib
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+logger = logging.getLogger(__name__)
+
+CLAVE_ENDPOINTS = 'instrumentacion:endpoints'
+
+# Listas IN (...) de largo variable y literales: misma huella para la misma consulta
+_RE_LISTA_PARAMETROS = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_RE_NUMEROS = re.compile(r'\b\d+\b')
+
+
+class PresupuestoConsultasExcedido(AssertionError):
+    """Un endpoint ejecutó más consultas que su presupuesto (modo estricto)"""
+
+
+def huella_sql(sql):
+    """Huella de una consulta, independiente de los valores de sus parámetros"""
+    normalizado = _RE_NUMEROS.sub('N', _RE_LISTA_PARAMETROS.sub('(...)', sql))
+    return hashlib.sha1(normalizado.encode()).hexdigest()[:12]
+
+
+class RegistroConsultas:
+    """
+    Wrapper de ejecución (connection.execute_wrapper) que cuenta consultas,
+    tiempo en BD y huellas repetidas
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.tiempo = 0.0
+        self.huellas = Counter()
+        self.ejemplos = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo += time.perf_counter() - inicio
+            self.total += 1
+            huella = huella_sql(sql)
+            self.huellas[huella] += 1
+            self.ejemplos.setdefault(huella, sql)
+
+    @property
+    def duplicadas(self):
+        """Ejecuciones de más de consultas con la misma huella (síntoma de N+1)"""
+        return sum(veces - 1 for veces in self.huellas.values() if veces > 1)
+
+    def mas_repetida(self):
+        if not self.huellas:
+            return None, 0
+        huella, veces = self.huellas.most_common(1)[0]
+        return self.ejemplos[huella], veces
+
+
+class InstrumentacionConsultasMiddleware:
+    """
+    Mide las consultas SQL de cada request (todas las conexiones)
+
+    Según INSTRUMENTACION:
+    - HEADERS: agrega X-DB-Queries, X-DB-Time-Ms, X-DB-Duplicates y
+      Server-Timing a la respuesta (pensado para DEBUG)
+    - ESTADISTICAS: acumula por endpoint en el cache; se consultan con
+      manage.py estadisticas_consultas
+    - Presupuesto: las vistas pueden declarar `presupuesto_consultas`; si se
+      excede se registra un warning, o se lanza PresupuestoConsultasExcedido
+      con ESTRICTO=True (tests/CI)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = settings.INSTRUMENTACION
+
+    def __call__(self, request):
+        if not self.config['ACTIVA']:
+            return self.get_response(request)
+
+        registro = RegistroConsultas()
+        with ExitStack() as pila:
+            for alias in connections:
+                pila.enter_context(connections[alias].execute_wrapper(registro))
+            response = self.get_response(request)
+
+        endpoint = self._nombre_endpoint(request)
+        if self.config['HEADERS']:
+            tiempo_ms = registro.tiempo * 1000
+            response['X-DB-Queries'] = registro.total
+            response['X-DB-Time-Ms'] = f'{tiempo_ms:.1f}'
+            response['X-DB-Duplicates'] = registro.duplicadas
+            response['Server-Timing'] = f'db;dur={tiempo_ms:.1f};desc="{registro.total} queries"'
+
+        if endpoint and self.config['ESTADISTICAS']:
+            acumular_estadisticas(endpoint, registro)
+
+        presupuesto = getattr(request, '_presupuesto_consultas', None)
+        if presupuesto is not None and registro.total > presupuesto:
+            sql, veces = registro.mas_repetida()
+            mensaje = (
+                f'{endpoint}: {registro.total} consultas (presupuesto {presupuesto}); '
+                f'más repetida ({veces}x): {sql[:200]}'
+            )
+            if self.config['ESTRICTO']:
+                raise PresupuestoConsultasExcedido(mensaje)
+            logger.warning(mensaje)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # ViewSets y APIView exponen la clase en view_func.cls
+        clase = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        request._presupuesto_consultas = getattr(
+            clase, 'presupuesto_consultas', getattr(view_func, 'presupuesto_consultas', None)
+        )
+
+    @staticmethod
+    def _nombre_endpoint(request):
+        coincidencia = getattr(request, 'resolver_match', None)
+        if coincidencia is None:
+            return None
+        nombre = coincidencia.view_name or coincidencia.route
+        return f'{request.method} {nombre}'
+
+
+# =====================================================
+# ESTADÍSTICAS AGREGADAS
+# =====================================================
+# Se acumulan en el cache compartido (Redis en producción): la
+# lectura/escritura no es atómica, igual que en throttling.py, así que con
+# mucha concurrencia los totales son aproximados.
+
+def clave_estadisticas(endpoint):
+    # El nombre del endpoint lleva espacios (no válidos como clave en memcached)
+    return f'instrumentacion:endpoint:{hashlib.sha1(endpoint.encode()).hexdigest()}'
+
+
+def acumular_estadisticas(endpoint, registro):
+    clave = clave_estadisticas(endpoint)
+    datos = cache.get(clave) or {
+        'solicitudes': 0,
+        'consultas': 0,
+        'max_consultas': 0,
+        'tiempo_ms': 0.0,
+        'duplicadas': 0,
+        'ejemplo_duplicada': '',
+    }
+    datos['solicitudes'] += 1
+    datos['consultas'] += registro.total
+    datos['max_consultas'] = max(datos['max_consultas'], registro.total)
+    datos['tiempo_ms'] += registro.tiempo * 1000
+    datos['duplicadas'] += registro.duplicadas
+    if registro.duplicadas:
+        sql, veces = registro.mas_repetida()
+        datos['ejemplo_duplicada'] = f'({veces}x) {sql[:300]}'
+    cache.set(clave, datos, None)
+
+    endpoints = cache.get(CLAVE_ENDPOINTS) or set()
+    if endpoint not in endpoints:
+        endpoints.add(endpoint)
+        cache.set(CLAVE_ENDPOINTS, endpoints, None)
+
+
+def obtener_estadisticas():
+    """Returns: dict {endpoint: datos acumulados}"""
+    endpoints = cache.get(CLAVE_ENDPOINTS) or set()
+    datos = cache.get_many([clave_estadisticas(endpoint) for endpoint in endpoints])
+    return {
+        endpoint: datos[clave_estadisticas(endpoint)]
+        for endpoint in endpoints
+        if clave_estadisticas(endpoint) in datos
+    }
+
+
+def reiniciar_estadisticas():
+    endpoints = cache.get(CLAVE_ENDPOINTS) or set()
+    cache.delete_many([clave_estadisticas(endpoint) for endpoint in endpoints] + [CLAVE_ENDPOINTS])
+
+
+# =====================================================
+# PRESUPUESTOS EN TESTS
+# =====================================================
+
+@contextmanager
+def presupuesto_consultas(maximo, using='default'):
+    """
+    Falla si el bloque ejecuta más de `maximo` consultas
+
+    Uso en tests:
+        with presupuesto_consultas(5):
+            self.client.get('/api/cursos/')
+
+    Raises:
+        PresupuestoConsultasExcedido con el listado de consultas
+    """
+    with CaptureQueriesContext(connections[using]) as contexto:
+        yield contexto
+
+    if len(contexto) > maximo:
+        detalle = '\n'.join(
+            f'{numero}. {consulta["sql"]}'
+            for numero, consulta in enumerate(contexto.captured_queries, start=1)
+        )
+        raise PresupuestoConsultasExcedido(
+            f'{len(contexto)} consultas ejecutadas, presupuesto {maximo}:\n{detalle}'
+        )
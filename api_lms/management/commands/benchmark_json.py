@@ -0,0 +1,120 @@
+# benchmark_json.py
+# Compara JSONRenderer de DRF con ORJSONRenderer sobre payloads típicos de la API
+# LMS JC Digital Training
+
+import json
+import timeit
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api_lms.renderers import ORJSONRenderer
+
+
+def payload_libro_notas(estudiantes, evaluaciones):
+    """Libro de notas de un curso: Decimals y fechas sin serializar, como en views_calificacion"""
+    ahora = timezone.now()
+    return {
+        'curso': {'id': 1, 'nombre': 'Curso de prueba'},
+        'inscripciones': [
+            {
+                'inscripcion_id': i,
+                'estudiante': {'id': i, 'nombre': f'Estudiante {i} Apellido Apellido', 'rut': f'{10000000 + i}-K'},
+                'estado': 'en_curso',
+                'nota_final_calculada': Decimal('5.43') + Decimal(i % 17) / 10,
+                'porcentaje_asistencia': Decimal('87.50'),
+                'fecha_revision': ahora - timedelta(days=i % 30),
+                'evaluaciones': [
+                    {
+                        'evaluacion_id': e,
+                        'evaluacion_nombre': f'Evaluación {e}',
+                        'peso_porcentaje': Decimal('20.00'),
+                        'puntaje_obtenido': Decimal('45.50'),
+                        'puntaje_total': Decimal('60.00'),
+                        'nota_obtenida': Decimal('5.2') + Decimal(e) / 10,
+                        'aprobado': True,
+                        'fecha_realizacion': ahora - timedelta(hours=e),
+                    }
+                    for e in range(evaluaciones)
+                ],
+            }
+            for i in range(estudiantes)
+        ],
+    }
+
+
+def payload_cursos(cursos, modulos):
+    """Página de /cursos/ tal como la entrega CursoSerializer (todo ya convertido a texto)"""
+    fecha = '2025-03-01 10:00:00'
+    return {
+        'count': cursos,
+        'next': None,
+        'previous': None,
+        'results': [
+            {
+                'id': c,
+                'nombre': f'Curso {c}: Excel avanzado para la gestión',
+                'descripcion': 'Descripción del curso con acentos y eñes. ' * 10,
+                'codigo_sence_curso': f'SENCE-{c:05d}',
+                'horas_totales': 40,
+                'nota_aprobacion': '4.00',
+                'estado': 'activo',
+                'publicado': True,
+                'created_at': fecha,
+                'updated_at': fecha,
+                'total_inscritos': 25,
+                'cupos_disponibles': 5,
+                'modulos': [
+                    {
+                        'id': c * 100 + m, 'curso': c, 'curso_nombre': f'Curso {c}',
+                        'nombre': f'Módulo {m}', 'descripcion': 'Contenido del módulo. ' * 5,
+                        'orden': m, 'horas_estimadas': 4, 'publicado': True,
+                        'created_at': fecha, 'updated_at': fecha,
+                    }
+                    for m in range(modulos)
+                ],
+                'relatores': [{'id': c, 'relator': 3, 'relator_nombre': 'Relator Ejemplo', 'activo': True}],
+            }
+            for c in range(cursos)
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark del renderer JSON (DRF vs orjson) sobre libro de notas y listado de cursos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=200)
+        parser.add_argument('--estudiantes', type=int, default=40)
+        parser.add_argument('--evaluaciones', type=int, default=8)
+        parser.add_argument('--cursos', type=int, default=20)
+        parser.add_argument('--modulos', type=int, default=8)
+
+    def handle(self, *args, **options):
+        casos = {
+            'libro de notas': payload_libro_notas(options['estudiantes'], options['evaluaciones']),
+            'listado de cursos': payload_cursos(options['cursos'], options['modulos']),
+        }
+        renderers = {'drf': JSONRenderer(), 'orjson': ORJSONRenderer()}
+        repeticiones = options['repeticiones']
+
+        for nombre, datos in casos.items():
+            salidas = {clave: renderer.render(datos) for clave, renderer in renderers.items()}
+            tiempos = {
+                clave: min(timeit.repeat(lambda r=renderer: r.render(datos), number=repeticiones, repeat=3))
+                / repeticiones * 1000
+                for clave, renderer in renderers.items()
+            }
+
+            # Mismo contenido: los Decimal y fechas sin serializar salen igual que en DRF
+            iguales = json.loads(salidas['drf']) == json.loads(salidas['orjson'])
+
+            self.stdout.write(
+                f"{nombre}: {len(salidas['orjson']) / 1024:.1f} KB | "
+                f"drf {tiempos['drf']:.3f} ms | orjson {tiempos['orjson']:.3f} ms | "
+                f"x{tiempos['drf'] / tiempos['orjson']:.1f} | "
+                f"{'mismo contenido' if iguales else 'CONTENIDO DISTINTO'}"
+            )
@@ -0,0 +1,105 @@
+# benchmark_permisos.py
+# Consultas y tiempo de los listados típicos con la capa de permisos por rol
+# LMS JC Digital Training
+
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from api_lms.auth_views import CustomTokenObtainPairSerializer
+from api_lms.authentication import JWTClaimsAuthentication
+from api_lms.instrumentacion import RegistroConsultas
+from api_lms.models import Usuario
+
+ENDPOINTS = [
+    '/api/cursos/',
+    '/api/inscripciones/',
+    '/api/modulos/',
+    '/api/lecciones/',
+    '/api/materiales/',
+    '/api/evaluaciones/',
+    '/api/notificaciones/',
+]
+
+# Sin cache de respuestas: cada request llega a la BD
+SIN_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = (
+        'Consultas por listado con el rol resuelto desde el token (una vez por request) '
+        'vs. el camino clásico que carga User y perfil en cada request'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', nargs='*', default=None,
+                            help='Usernames a medir (por defecto uno por rol)')
+        parser.add_argument('--endpoints', nargs='*', default=ENDPOINTS)
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def handle(self, *args, **options):
+        perfiles = self._perfiles(options['usuarios'])
+        if not perfiles:
+            raise CommandError('No hay usuarios con perfil para medir')
+
+        host = next((h for h in settings.ALLOWED_HOSTS if h != '*' and not h.startswith('.')), 'localhost')
+        cliente = Client(HTTP_HOST=host)
+
+        self.stdout.write(
+            f"{'usuario':<22} {'endpoint':<24} {'estado':>6} "
+            f"{'q claims':>9} {'q clásico':>10} {'ahorro':>7} {'ms claims':>10} {'ms clásico':>11}"
+        )
+        total_claims = total_clasico = 0
+        with override_settings(CACHES=SIN_CACHE):
+            for perfil in perfiles:
+                token = str(CustomTokenObtainPairSerializer.get_token(perfil.user).access_token)
+                etiqueta = f'{perfil.user.username} ({perfil.tipo_usuario})'
+                for endpoint in options['endpoints']:
+                    estado, consultas, ms = self._medir(cliente, endpoint, token, options['repeticiones'])
+                    # Camino clásico: JWTAuthentication carga el User y los permisos el perfil
+                    with mock.patch.object(JWTClaimsAuthentication, 'get_user', JWTAuthentication.get_user):
+                        _, consultas_clasico, ms_clasico = self._medir(
+                            cliente, endpoint, token, options['repeticiones']
+                        )
+                    total_claims += consultas
+                    total_clasico += consultas_clasico
+                    self.stdout.write(
+                        f"{etiqueta[:22]:<22} {endpoint[:24]:<24} {estado:>6} "
+                        f"{consultas:>9} {consultas_clasico:>10} {consultas_clasico - consultas:>7} "
+                        f"{ms:>10.1f} {ms_clasico:>11.1f}"
+                    )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Total: {total_claims} consultas con claims vs {total_clasico} en el camino clásico '
+            f'({total_clasico - total_claims} menos)'
+        ))
+
+    @staticmethod
+    def _perfiles(usernames):
+        queryset = Usuario.objects.select_related('user')
+        if usernames:
+            return list(queryset.filter(user__username__in=usernames))
+        perfiles = []
+        for rol in ('administrador', 'relator', 'estudiante'):
+            perfil = queryset.filter(tipo_usuario=rol, user__is_active=True).order_by('pk').first()
+            if perfil:
+                perfiles.append(perfil)
+        return perfiles
+
+    @staticmethod
+    def _medir(cliente, endpoint, token, repeticiones):
+        """Returns: (status de la respuesta, consultas del primer request, ms promedio)"""
+        registro = RegistroConsultas()
+        with connection.execute_wrapper(registro):
+            response = cliente.get(endpoint, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            cliente.get(endpoint, HTTP_AUTHORIZATION=f'Bearer {token}')
+        ms = (time.perf_counter() - inicio) / max(repeticiones, 1) * 1000
+        return response.status_code, registro.total, ms
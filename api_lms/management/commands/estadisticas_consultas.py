@@ -0,0 +1,53 @@
+# estadisticas_consultas.py
+# Muestra las consultas SQL acumuladas por endpoint (InstrumentacionConsultasMiddleware)
+# LMS JC Digital Training
+
+from django.core.management.base import BaseCommand
+
+from api_lms.instrumentacion import obtener_estadisticas, reiniciar_estadisticas
+
+ORDENES = {
+    'consultas': lambda datos: datos['consultas'] / datos['solicitudes'],
+    'tiempo': lambda datos: datos['tiempo_ms'] / datos['solicitudes'],
+    'duplicadas': lambda datos: datos['duplicadas'] / datos['solicitudes'],
+    'solicitudes': lambda datos: datos['solicitudes'],
+}
+
+
+class Command(BaseCommand):
+    help = 'Consultas SQL promedio, máximas, tiempo en BD y duplicadas por endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orden', choices=sorted(ORDENES), default='consultas')
+        parser.add_argument('--limite', type=int, default=30)
+        parser.add_argument('--ejemplos', action='store_true',
+                            help='Muestra la consulta más repetida de cada endpoint')
+        parser.add_argument('--reiniciar', action='store_true',
+                            help='Borra las estadísticas acumuladas')
+
+    def handle(self, *args, **options):
+        if options['reiniciar']:
+            reiniciar_estadisticas()
+            self.stdout.write(self.style.SUCCESS('Estadísticas reiniciadas'))
+            return
+
+        estadisticas = obtener_estadisticas()
+        if not estadisticas:
+            self.stdout.write('Sin estadísticas (¿INSTRUMENTACION["ACTIVA"] en False?)')
+            return
+
+        orden = ORDENES[options['orden']]
+        filas = sorted(estadisticas.items(), key=lambda item: orden(item[1]), reverse=True)
+
+        self.stdout.write(
+            f"{'endpoint':<50} {'req':>6} {'prom':>6} {'max':>5} {'ms prom':>8} {'dup prom':>9}"
+        )
+        for endpoint, datos in filas[:options['limite']]:
+            solicitudes = datos['solicitudes']
+            self.stdout.write(
+                f"{endpoint[:50]:<50} {solicitudes:>6} "
+                f"{datos['consultas'] / solicitudes:>6.1f} {datos['max_consultas']:>5} "
+                f"{datos['tiempo_ms'] / solicitudes:>8.1f} {datos['duplicadas'] / solicitudes:>9.1f}"
+            )
+            if options['ejemplos'] and datos['ejemplo_duplicada']:
+                self.stdout.write(f"    {datos['ejemplo_duplicada']}")
@@ -0,0 +1,125 @@
+# extraer_metadatos_materiales.py
+# Completa duración, páginas, dimensiones, tamaño y hash de materiales existentes
+# LMS JC Digital Training
+
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api_lms.models import Material
+from api_lms.services.almacenamiento import ArchivoRemoto, descargar_a_temporal
+from api_lms.services.metadatos import EXTRACTORES, extraer_metadatos
+from api_lms.services.subidas import calcular_sha256
+
+# Tipos cuyos metadatos se leen con peticiones por rango, sin descargar el archivo
+TIPOS_LECTURA_REMOTA = {'video', 'imagen', 'documento', 'presentacion'}
+
+
+def procesar_material(material, calcular_hash):
+    """
+    Extrae los metadatos de un material ya almacenado
+
+    Returns:
+        dict de campos a actualizar (vacío si no hay nada nuevo)
+    """
+    campos = {}
+
+    if material.tipo in TIPOS_LECTURA_REMOTA and not calcular_hash:
+        with io.BufferedReader(ArchivoRemoto(material.archivo_url), 64 * 1024) as f:
+            metadatos = extraer_metadatos(f, material.tipo)
+            if material.archivo_size is None:
+                campos['archivo_size'] = f.raw.total_bytes
+    else:
+        sufijo = os.path.splitext(material.archivo_url)[1]
+        ruta = descargar_a_temporal(material.archivo_url, sufijo=sufijo)
+        try:
+            metadatos = extraer_metadatos(ruta, material.tipo)
+            if material.archivo_size is None:
+                campos['archivo_size'] = os.path.getsize(ruta)
+            if calcular_hash and not material.archivo_hash:
+                campos['archivo_hash'] = calcular_sha256(ruta)
+        finally:
+            os.unlink(ruta)
+
+    if metadatos.get('duracion_segundos') is not None:
+        campos['duracion_segundos'] = metadatos['duracion_segundos']
+    if metadatos.get('total_paginas') is not None:
+        campos['total_paginas'] = metadatos['total_paginas']
+    if metadatos.get('metadata'):
+        campos['metadata'] = metadatos['metadata']
+
+    return campos
+
+
+class Command(BaseCommand):
+    help = 'Extrae localmente los metadatos de los materiales que no los tienen (backfill)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', choices=sorted(EXTRACTORES), help='Limitar a un tipo de material')
+        parser.add_argument('--limite', type=int, help='Máximo de materiales a procesar')
+        parser.add_argument('--workers', type=int, default=4, help='Descargas/lecturas en paralelo')
+        parser.add_argument(
+            '--hash',
+            action='store_true',
+            help='Calcular también archivo_hash (requiere descargar el archivo completo)'
+        )
+        parser.add_argument(
+            '--forzar',
+            action='store_true',
+            help='Reprocesar materiales que ya tienen metadatos'
+        )
+
+    def handle(self, *args, **options):
+        materiales = Material.objects.exclude(archivo_url='').filter(tipo__in=EXTRACTORES)
+
+        if options['tipo']:
+            materiales = materiales.filter(tipo=options['tipo'])
+
+        if not options['forzar']:
+            pendientes = (
+                Q(tipo='video', duracion_segundos__isnull=True)
+                | Q(tipo__in=['pdf', 'documento', 'presentacion'], total_paginas__isnull=True)
+                | Q(tipo='imagen', metadata={})
+                | Q(archivo_size__isnull=True)
+            )
+            if options['hash']:
+                pendientes |= Q(archivo_hash='')
+            materiales = materiales.filter(pendientes)
+
+        materiales = materiales.only(
+            'id', 'tipo', 'archivo_url', 'archivo_size', 'archivo_hash'
+        ).order_by('id')
+        if options['limite']:
+            materiales = materiales[:options['limite']]
+
+        materiales = list(materiales)
+        if not materiales:
+            self.stdout.write('No hay materiales pendientes')
+            return
+
+        self.stdout.write(f'Procesando {len(materiales)} materiales...')
+
+        def tarea(material):
+            try:
+                return material, procesar_material(material, options['hash']), None
+            except Exception as e:
+                return material, None, e
+
+        actualizados = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            # Los hilos solo hacen I/O de red; las escrituras quedan en este hilo
+            for material, campos, error in executor.map(tarea, materiales):
+                if error:
+                    self.stderr.write(f'  ✗ Material {material.id}: {error}')
+                    continue
+                if campos:
+                    # update() no modifica updated_at: es un backfill, no una edición
+                    Material.objects.filter(pk=material.pk).update(**campos)
+                    actualizados += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {actualizados}/{len(materiales)} materiales actualizados'
+        ))
@@ -0,0 +1,46 @@
+# generar_diplomas_pendientes.py
+# Genera en lote los diplomas de inscripciones completadas sin diploma
+# LMS JC Digital Training
+
+from django.core.management.base import BaseCommand
+
+from api_lms.diplomas_utils import generar_diplomas_masivo
+from api_lms.models import Inscripcion
+
+
+class Command(BaseCommand):
+    help = 'Genera los diplomas pendientes, subiendo los PDFs en paralelo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--curso', type=int, help='Limitar a un curso')
+        parser.add_argument('--limite', type=int, help='Máximo de diplomas a generar')
+        parser.add_argument('--workers', type=int, help='Tamaño del pool de subida')
+
+    def handle(self, *args, **options):
+        inscripciones = Inscripcion.objects.filter(
+            estado='completado',
+            diploma_generado=False
+        ).order_by('id')
+
+        if options['curso']:
+            inscripciones = inscripciones.filter(curso_id=options['curso'])
+
+        ids = list(inscripciones.values_list('id', flat=True))
+        if options['limite']:
+            ids = ids[:options['limite']]
+
+        if not ids:
+            self.stdout.write('No hay diplomas pendientes')
+            return
+
+        self.stdout.write(f'Generando {len(ids)} diplomas...')
+        resultados = generar_diplomas_masivo(ids, max_workers=options['workers'])
+
+        exitosos = 0
+        for inscripcion_id, resultado in resultados.items():
+            if resultado.get('success'):
+                exitosos += 1
+            else:
+                self.stderr.write(f"  ✗ Inscripción {inscripcion_id}: {resultado.get('error')}")
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {exitosos}/{len(ids)} diplomas generados'))
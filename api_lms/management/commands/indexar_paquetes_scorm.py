@@ -0,0 +1,69 @@
+# indexar_paquetes_scorm.py
+# Indexa los paquetes SCORM ya almacenados (manifiesto + posición de cada archivo en el ZIP)
+# LMS JC Digital Training
+
+import os
+
+from django.core.management.base import BaseCommand
+
+from api_lms.models import Material
+from api_lms.services.almacenamiento import descargar_a_temporal
+from api_lms.services.scorm import leer_paquete_scorm, guardar_paquete_scorm, registrar_error_scorm
+
+
+class Command(BaseCommand):
+    help = 'Indexa los materiales SCORM sin índice (p. ej. subidas directas o anteriores a la ingesta)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--material', type=int, help='Indexar solo este material')
+        parser.add_argument('--limite', type=int, help='Máximo de paquetes a indexar')
+        parser.add_argument(
+            '--forzar',
+            action='store_true',
+            help='Reindexar también los paquetes ya indexados o con error'
+        )
+
+    def handle(self, *args, **options):
+        materiales = Material.objects.filter(tipo='scorm').exclude(archivo_url='').order_by('id')
+
+        if options['material']:
+            materiales = materiales.filter(pk=options['material'])
+        elif not options['forzar']:
+            materiales = materiales.filter(paquete_scorm__isnull=True)
+
+        if options['limite']:
+            materiales = materiales[:options['limite']]
+
+        materiales = list(materiales)
+        if not materiales:
+            self.stdout.write('No hay paquetes SCORM pendientes')
+            return
+
+        indexados = 0
+        for material in materiales:
+            # El índice necesita la cabecera local de cada entrada: con el
+            # paquete en disco son lecturas locales en vez de una petición
+            # por rango por archivo
+            try:
+                ruta = descargar_a_temporal(material.archivo_url, sufijo='.zip')
+            except Exception as e:
+                self.stderr.write(f'  ✗ Material {material.id}: error al descargar: {e}')
+                continue
+
+            try:
+                datos = leer_paquete_scorm(ruta)
+            finally:
+                os.unlink(ruta)
+
+            if datos['success']:
+                paquete = guardar_paquete_scorm(material, datos)
+                indexados += 1
+                self.stdout.write(
+                    f'  ✓ Material {material.id}: {paquete.recursos.count()} recursos, '
+                    f'{paquete.total_archivos} archivos'
+                )
+            else:
+                registrar_error_scorm(material, datos['error'])
+                self.stderr.write(f"  ✗ Material {material.id}: {datos['error']}")
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {indexados}/{len(materiales)} paquetes indexados'))
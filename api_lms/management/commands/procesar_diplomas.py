@@ -0,0 +1,54 @@
+# procesar_diplomas.py
+# Worker de la cola de generación asíncrona de diplomas
+# LMS JC Digital Training
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api_lms.diplomas_utils import tomar_siguiente_job, procesar_diploma_job
+
+
+class Command(BaseCommand):
+    help = 'Procesa la cola de DiplomaJob (render + subida fuera del ciclo HTTP)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Vaciar la cola disponible y terminar (útil en cron)'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=settings.DIPLOMAS_JOBS['INTERVALO_POLLING'],
+            help='Segundos de espera cuando la cola está vacía'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Worker de diplomas iniciado')
+
+        while True:
+            close_old_connections()
+            job = tomar_siguiente_job()
+
+            if job is None:
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            job = procesar_diploma_job(job)
+            if job.estado == 'completado':
+                self.stdout.write(self.style.SUCCESS(
+                    f'✓ Job #{job.id} (inscripción {job.inscripcion_id}) completado'
+                ))
+            else:
+                self.stderr.write(
+                    f'✗ Job #{job.id} (inscripción {job.inscripcion_id}) '
+                    f'{job.estado}: {job.ultimo_error}'
+                )
+
+        self.stdout.write('Cola vacía, worker detenido')
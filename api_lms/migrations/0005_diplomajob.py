@@ -0,0 +1,40 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_lms', '0004_evaluacion_nota_maxima_evaluacion_nota_minima_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiplomaJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('intentos', models.IntegerField(default=0)),
+                ('max_intentos', models.IntegerField(default=3)),
+                ('disponible_desde', models.DateTimeField(default=django.utils.timezone.now, help_text='El worker no toma el trabajo antes de esta fecha (backoff entre reintentos)')),
+                ('resultado', models.JSONField(blank=True, default=dict)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('inscripcion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='diploma_jobs', to='api_lms.inscripcion')),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='diploma_jobs_solicitados', to='api_lms.usuario')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Diploma',
+                'verbose_name_plural': 'Trabajos de Diplomas',
+                'db_table': 'diploma_jobs',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['estado', 'disponible_desde'], name='diploma_job_estado_9a41b3_idx'), models.Index(fields=['inscripcion'], name='diploma_job_inscrip_1017c8_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_lms', '0005_diplomajob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inscripcion',
+            name='diploma_hash',
+            field=models.CharField(blank=True, help_text='Hash de contenido (plantilla + variables) del diploma generado', max_length=64),
+        ),
+    ]
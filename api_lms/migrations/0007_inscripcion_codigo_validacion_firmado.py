@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_lms', '0006_inscripcion_diploma_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inscripcion',
+            name='diploma_codigo_validacion',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_lms', '0007_inscripcion_codigo_validacion_firmado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='material',
+            name='metadata',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
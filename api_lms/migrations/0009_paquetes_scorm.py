@@ -0,0 +1,73 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_lms', '0008_material_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaqueteScorm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identificador', models.CharField(blank=True, max_length=255)),
+                ('version_scorm', models.CharField(blank=True, max_length=50)),
+                ('titulo', models.CharField(blank=True, max_length=300)),
+                ('estado', models.CharField(choices=[('indexado', 'Indexado'), ('error', 'Error')], default='indexado', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('total_archivos', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('material', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='paquete_scorm', to='api_lms.material')),
+            ],
+            options={
+                'verbose_name': 'Paquete SCORM',
+                'verbose_name_plural': 'Paquetes SCORM',
+                'db_table': 'paquetes_scorm',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivoScorm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ruta', models.CharField(max_length=500)),
+                ('offset_datos', models.BigIntegerField()),
+                ('bytes_comprimidos', models.BigIntegerField()),
+                ('bytes_descomprimidos', models.BigIntegerField()),
+                ('metodo_compresion', models.SmallIntegerField()),
+                ('crc32', models.BigIntegerField()),
+                ('paquete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archivos', to='api_lms.paquetescorm')),
+            ],
+            options={
+                'verbose_name': 'Archivo SCORM',
+                'verbose_name_plural': 'Archivos SCORM',
+                'db_table': 'archivos_scorm',
+                'unique_together': {('paquete', 'ruta')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RecursoScorm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identificador', models.CharField(max_length=255)),
+                ('tipo', models.CharField(choices=[('sco', 'SCO'), ('asset', 'Asset')], default='asset', max_length=10)),
+                ('href', models.CharField(blank=True, max_length=500)),
+                ('parametros', models.CharField(blank=True, max_length=500)),
+                ('titulo', models.CharField(blank=True, max_length=300)),
+                ('orden', models.IntegerField(blank=True, null=True)),
+                ('paquete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recursos', to='api_lms.paquetescorm')),
+            ],
+            options={
+                'verbose_name': 'Recurso SCORM',
+                'verbose_name_plural': 'Recursos SCORM',
+                'db_table': 'recursos_scorm',
+                'ordering': ['orden', 'id'],
+                'unique_together': {('paquete', 'identificador')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_lms', '0009_paquetes_scorm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='avatar_variantes',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
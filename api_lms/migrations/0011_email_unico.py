@@ -0,0 +1,39 @@
+# Índice único de email (sin distinguir mayúsculas) para el registro basado en restricciones
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def verificar_emails_duplicados(apps, schema_editor):
+    """El índice no se puede crear con emails repetidos: se listan para corregirlos a mano"""
+    User = apps.get_model('auth', 'User')
+    duplicados = list(
+        User.objects.exclude(email='')
+        .values(email_normalizado=Lower('email'))
+        .annotate(total=Count('id'))
+        .filter(total__gt=1)
+        .values_list('email_normalizado', flat=True)[:20]
+    )
+    if duplicados:
+        raise RuntimeError(
+            'Hay emails registrados en más de una cuenta; corríjalos antes de migrar: '
+            + ', '.join(duplicados)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_lms', '0010_usuario_avatar_variantes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(verificar_emails_duplicados, migrations.RunPython.noop),
+        # Parcial: las cuentas sin email (creadas desde el admin) no chocan entre sí
+        migrations.RunSQL(
+            "CREATE UNIQUE INDEX auth_user_email_unico ON auth_user (LOWER(email)) WHERE email <> ''",
+            "DROP INDEX IF EXISTS auth_user_email_unico",
+        ),
+    ]
@@ -0,0 +1,469 @@
+# mixins.py
+# Mixins para ViewSets de DRF
+# LMS JC Digital Training
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, parse_etags
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.validators import UniqueTogetherValidator
+
+from .authentication import rol_usuario, perfil_id
+from .serializers import precargar_relaciones
+from .services.cache_respuestas import cache_compartido, versiones_modelos, clave_respuesta, invalidar_modelos
+from .services.estructura import invalidar_curso
+
+
+class RespuestaCacheadaMixin:
+    """
+    Cachea las respuestas de list y retrieve de endpoints de catálogo
+
+    La clave combina endpoint, alcance (rol del usuario), parámetros y el
+    token de versión de cada modelo en `cache_modelos`. Los signals
+    reemplazan el token al guardar o eliminar una instancia, así que una
+    escritura invalida todas las respuestas que dependen de ese modelo sin
+    tener que recorrerlas.
+
+    Atributos:
+        cache_modelos: Modelos cuyos datos aparecen en la respuesta
+            (deben estar en MODELOS_VERSIONADOS de signals.py)
+        cache_por_usuario: Roles cuyo queryset depende del usuario; para
+            ellos el alcance incluye el ID del perfil
+        campos_en_vivo: Campos que cambian con cada escritura de otro
+            modelo (p.ej. conteos de inscritos). Se guardan vacíos en el
+            cache y completar_en_vivo() los recalcula en cada HIT, así esas
+            escrituras no invalidan la respuesta completa. Declararlos
+            obliga a implementar completar_en_vivo (se verifica al definir
+            la clase)
+    """
+    cache_modelos = ()
+    cache_por_usuario = ()
+    campos_en_vivo = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.campos_en_vivo and cls.completar_en_vivo is RespuestaCacheadaMixin.completar_en_vivo:
+            raise ImproperlyConfigured(
+                f'{cls.__name__} declara campos_en_vivo pero no implementa completar_en_vivo()'
+            )
+
+    def alcance_cache(self):
+        rol = rol_usuario(self.request.user)
+        if rol is None:
+            return None
+        if rol in self.cache_por_usuario:
+            return f"{rol}:{perfil_id(self.request.user)}"
+        return rol
+
+    def respuesta_cacheada(self, vista, request, *args, **kwargs):
+        alcance = self.alcance_cache()
+        if alcance is None or not cache_compartido():
+            return vista(request, *args, **kwargs)
+
+        clave = clave_respuesta(
+            request,
+            f"{self.basename}:{self.action}",
+            alcance,
+            versiones_modelos(self.cache_modelos)
+        )
+        datos = cache.get(clave)
+        if datos is not None:
+            if self.campos_en_vivo:
+                self.completar_en_vivo(elementos_respuesta(datos))
+            response = Response(datos)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = vista(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(clave, self.sin_campos_en_vivo(response.data), settings.CACHE_RESPUESTAS['TTL'])
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def sin_campos_en_vivo(self, datos):
+        """
+        Copia de los datos con los campos_en_vivo en None (se conserva la
+        clave para respetar ?fields=)
+        """
+        if not self.campos_en_vivo:
+            return datos
+
+        def vaciar(elemento):
+            return {
+                campo: None if campo in self.campos_en_vivo else valor
+                for campo, valor in elemento.items()
+            }
+
+        if isinstance(datos, list):
+            return [vaciar(elemento) for elemento in datos]
+        if 'results' in datos:
+            return {**datos, 'results': [vaciar(elemento) for elemento in datos['results']]}
+        return vaciar(datos)
+
+    def completar_en_vivo(self, elementos):
+        """Rellena los campos_en_vivo de los elementos (dicts) de una respuesta cacheada"""
+
+    def list(self, request, *args, **kwargs):
+        return self.respuesta_cacheada(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.respuesta_cacheada(super().retrieve, request, *args, **kwargs)
+
+
+def elementos_respuesta(datos):
+    """Elementos (dicts) de una respuesta de list (paginada o no) o retrieve"""
+    if isinstance(datos, list):
+        return datos
+    if 'results' in datos:
+        return datos['results']
+    return [datos]
+
+
+class ValidadoresCondicionalesMixin:
+    """
+    ETag débil y Last-Modified para list y retrieve, con respuesta 304
+    sin serializar nada si el cliente ya tiene la versión vigente
+
+    Los validadores salen de un agregado (Max de `campo_actualizacion` y
+    Count) sobre el queryset filtrado del request, más los tokens de versión
+    de `cache_modelos` si el ViewSet también usa RespuestaCacheadaMixin
+    (cubren los datos relacionados que el agregado no ve). El Count detecta
+    eliminaciones, que no cambian el máximo.
+
+    La visibilidad debe resolverse en get_queryset (como en el resto de los
+    ViewSets): para retrieve no se carga la instancia. Los campos_en_vivo
+    (que no versionan los tokens) entran al ETag por version_en_vivo().
+
+    Los filtros se aplican una sola vez por request: list y retrieve de DRF
+    reciben el mismo queryset filtrado que se usó para los validadores.
+    """
+    campo_actualizacion = 'updated_at'
+    _queryset_filtrado = None
+
+    def filter_queryset(self, queryset):
+        if self._queryset_filtrado is not None:
+            return self._queryset_filtrado
+        return super().filter_queryset(queryset)
+
+    def version_en_vivo(self, queryset):
+        """Huella de los campos_en_vivo del queryset ('' si no hay)"""
+        return ''
+
+    def validadores(self, queryset):
+        """
+        Returns:
+            (etag, ultima_modificacion) donde ultima_modificacion es un
+            timestamp o None; etag es None si el queryset está vacío o si
+            hay cache_modelos sin cache compartido (sus tokens no serían
+            los mismos en todos los procesos)
+        """
+        if getattr(self, 'cache_modelos', ()) and not cache_compartido():
+            return None, None
+
+        agregados = {'total': Count('pk')}
+        if self.campo_actualizacion:
+            agregados['ultima'] = Max(self.campo_actualizacion)
+
+        # Sobre los pk del queryset: sin anotaciones, joins duplicados ni prefetch
+        resultado = queryset.model.objects.filter(
+            pk__in=queryset.order_by().values('pk')
+        ).aggregate(**agregados)
+
+        if self.action == 'retrieve' and not resultado['total']:
+            return None, None  # el 404 lo entrega la vista
+
+        ultima = resultado.get('ultima')
+        # Mismo alcance que alcance_cache: los roles con datos por usuario
+        # no comparten ETag entre perfiles
+        alcance = rol_usuario(self.request.user) or ''
+        if alcance in getattr(self, 'cache_por_usuario', ()):
+            alcance = f"{alcance}:{perfil_id(self.request.user)}"
+        contenido = '|'.join([
+            ultima.isoformat() if ultima else '',
+            str(resultado['total']),
+            self.request.get_full_path(),
+            alcance,
+            versiones_modelos(getattr(self, 'cache_modelos', ())),
+            self.version_en_vivo(queryset),
+        ])
+        etag = 'W/"%s"' % hashlib.sha1(contenido.encode()).hexdigest()[:20]
+        return etag, (ultima.timestamp() if ultima else None)
+
+    def no_modificado(self, request, modelo, etag, ultima_modificacion):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            # Comparación débil: se ignora el prefijo W/ de ambos lados
+            etiquetas = {etiqueta.removeprefix('W/') for etiqueta in parse_etags(if_none_match)}
+            return '*' in etiquetas or etag.removeprefix('W/') in etiquetas
+
+        # La fecha solo cubre al modelo propio: si la respuesta incluye datos
+        # de otros modelos, If-Modified-Since no basta para responder 304
+        if any(relacionado is not modelo for relacionado in getattr(self, 'cache_modelos', ())):
+            return False
+
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return bool(
+            if_modified_since and ultima_modificacion
+            and int(ultima_modificacion) <= if_modified_since
+        )
+
+    def respuesta_condicional(self, vista, queryset, request, *args, **kwargs):
+        etag, ultima_modificacion = self.validadores(queryset)
+        if etag is None:
+            return vista(request, *args, **kwargs)
+
+        if self.no_modificado(request, queryset.model, etag, ultima_modificacion):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = vista(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+        response['ETag'] = etag
+        if ultima_modificacion:
+            response['Last-Modified'] = http_date(ultima_modificacion)
+        # Datos por usuario: solo el navegador los guarda y debe revalidar
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        self._queryset_filtrado = self.filter_queryset(self.get_queryset())
+        return self.respuesta_condicional(super().list, self._queryset_filtrado, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        self._queryset_filtrado = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self._queryset_filtrado.filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+        return self.respuesta_condicional(super().retrieve, queryset, request, *args, **kwargs)
+
+
+def _a_entero(valor):
+    if isinstance(valor, bool):
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+class OperacionesMasivasMixin:
+    """
+    Creación, actualización y reordenamiento masivo de contenido ordenado
+    (módulos, lecciones, materiales de lección, preguntas)
+
+    - POST  .../masivo/     lista de objetos nuevos
+    - PATCH .../masivo/     lista de cambios parciales, cada uno con "id"
+    - POST  .../reordenar/  {"<campo_padre>": id, "orden": [IDs en el nuevo orden]}
+
+    Todo se valida en memoria antes de escribir: cada relación se carga con
+    una sola consulta (precargar_relaciones) y unique_together se compara
+    contra una lectura de las filas existentes, en vez de consultar por
+    elemento. La escritura es bulk_create/bulk_update en una transacción:
+    se aplica todo o nada, y los errores vuelven por posición como en un
+    serializer many=True.
+
+    Los cambios de orden se hacen en dos pasadas (primero -pk, después el
+    valor final) para que intercambiar posiciones no choque con el índice
+    único (padre, orden).
+
+    bulk_create/bulk_update no emiten post_save, así que las versiones de
+    cache que mantienen los signals se invalidan aquí.
+
+    Atributos:
+        campo_padre: FK que agrupa el orden
+        campo_orden: Campo de posición dentro del padre
+        ruta_curso: Ruta al curso desde el modelo para invalidar la
+            estructura cacheada (services/estructura.py), o None
+    """
+    campo_padre = None
+    campo_orden = 'orden'
+    ruta_curso = None
+
+    @action(detail=False, methods=['post', 'patch'])
+    def masivo(self, request):
+        elementos = request.data
+        if not isinstance(elementos, list) or not elementos:
+            return Response({'error': 'Se espera una lista de objetos'}, status=status.HTTP_400_BAD_REQUEST)
+
+        maximo = settings.OPERACIONES_MASIVAS['MAX_ELEMENTOS']
+        if len(elementos) > maximo:
+            return Response(
+                {'error': f'Máximo {maximo} elementos por solicitud'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        actualizar = request.method == 'PATCH'
+        try:
+            with transaction.atomic():
+                instancias = self._instancias_masivas(elementos) if actualizar else {}
+                objetos, campos, errores = self._validar_masivo(elementos, instancias, actualizar)
+                if not any(errores):
+                    errores = self._validar_unicidad(objetos, instancias)
+                if any(errores):
+                    return Response(errores, status=status.HTTP_400_BAD_REQUEST)
+
+                cursos = self._cursos_afectados(instancias)
+                if actualizar:
+                    self._actualizar_masivo(objetos, campos)
+                else:
+                    objetos = self.get_queryset().model.objects.bulk_create(
+                        objetos, batch_size=settings.OPERACIONES_MASIVAS['BATCH_SIZE']
+                    )
+                self._invalidar_caches(objetos, cursos)
+        except IntegrityError as e:
+            # Escritura concurrente que pasó la validación en memoria
+            return Response({'error': f'Conflicto al guardar: {e}'}, status=status.HTTP_409_CONFLICT)
+
+        serializer = self.get_serializer(objetos, many=True)
+        return Response(
+            serializer.data,
+            status=status.HTTP_200_OK if actualizar else status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['post'])
+    def reordenar(self, request):
+        padre_id = _a_entero(request.data.get(self.campo_padre))
+        ids = request.data.get('orden')
+        if padre_id is None or not isinstance(ids, list):
+            return Response(
+                {'error': f'Se requieren "{self.campo_padre}" y "orden" (lista de IDs)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ids = [_a_entero(valor) for valor in ids]
+
+        modelo = self.get_queryset().model
+        with transaction.atomic():
+            existentes = set(
+                modelo.objects.select_for_update()
+                .filter(**{self.campo_padre: padre_id})
+                .values_list('pk', flat=True)
+            )
+            if len(set(ids)) != len(ids) or set(ids) != existentes:
+                return Response(
+                    {
+                        'error': '"orden" debe contener cada ID del grupo exactamente una vez',
+                        'ids': sorted(existentes),
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            objetos = [modelo(pk=pk, **{self.campo_orden: posicion}) for posicion, pk in enumerate(ids, start=1)]
+            self._actualizar_masivo(objetos, {self.campo_orden})
+            self._invalidar_caches(objetos)
+
+        queryset = self.get_queryset().filter(pk__in=ids).order_by(self.campo_orden)
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    def _instancias_masivas(self, elementos):
+        """Instancias visibles a actualizar, bloqueadas hasta el fin de la transacción"""
+        ids = [_a_entero(elemento.get('id')) for elemento in elementos if isinstance(elemento, dict)]
+        return self.get_queryset().select_for_update(of=('self',)).in_bulk(
+            [pk for pk in ids if pk is not None]
+        )
+
+    def _validar_masivo(self, elementos, instancias, actualizar):
+        """
+        Returns:
+            (objetos, campos, errores): objetos sin guardar con los datos
+            aplicados, nombres de campos modificados y un dict de errores
+            por elemento ({} si es válido)
+        """
+        serializer = self.get_serializer(partial=actualizar)
+        # unique_together se valida en conjunto en _validar_unicidad
+        serializer.validators = [
+            validador for validador in serializer.validators
+            if not isinstance(validador, UniqueTogetherValidator)
+        ]
+        precargar_relaciones(serializer, elementos)
+
+        modelo = self.get_queryset().model
+        objetos, campos, errores = [], set(), []
+        for elemento in elementos:
+            instancia = None
+            if actualizar:
+                instancia = instancias.get(_a_entero(elemento.get('id'))) if isinstance(elemento, dict) else None
+                if instancia is None:
+                    objetos.append(None)
+                    errores.append({'id': ['Se requiere el ID de un registro existente']})
+                    continue
+
+            serializer.instance = instancia
+            try:
+                datos = serializer.run_validation(elemento)
+            except ValidationError as e:
+                objetos.append(None)
+                errores.append(e.detail)
+                continue
+
+            objeto = instancia if instancia is not None else modelo()
+            for campo, valor in datos.items():
+                setattr(objeto, campo, valor)
+            campos.update(datos)
+            objetos.append(objeto)
+            errores.append({})
+        return objetos, campos, errores
+
+    def _validar_unicidad(self, objetos, instancias):
+        """unique_together dentro del lote y contra las filas que no se modifican"""
+        modelo = self.get_queryset().model
+        errores = [{} for _ in objetos]
+        for campos in modelo._meta.unique_together:
+            columnas = [modelo._meta.get_field(campo).attname for campo in campos]
+            mensaje = f'Ya existe un registro con el mismo {", ".join(campos)}'
+
+            posiciones = {}
+            for indice, objeto in enumerate(objetos):
+                clave = tuple(getattr(objeto, columna) for columna in columnas)
+                if clave in posiciones:
+                    errores[indice] = {'non_field_errors': [mensaje]}
+                posiciones.setdefault(clave, indice)
+
+            existentes = modelo.objects.filter(
+                **{f'{columnas[0]}__in': {clave[0] for clave in posiciones}}
+            ).exclude(pk__in=list(instancias)).values_list(*columnas)
+            for clave in existentes:
+                if clave in posiciones:
+                    errores[posiciones[clave]] = {'non_field_errors': [mensaje]}
+        return errores
+
+    def _actualizar_masivo(self, objetos, campos):
+        modelo = self.get_queryset().model
+        campos = set(campos)
+
+        ahora = timezone.now()
+        for campo in modelo._meta.concrete_fields:
+            if getattr(campo, 'auto_now', False):
+                campos.add(campo.name)
+                for objeto in objetos:
+                    setattr(objeto, campo.attname, ahora)
+
+        if self.campo_orden in campos:
+            modelo.objects.filter(pk__in=[objeto.pk for objeto in objetos]).update(
+                **{self.campo_orden: -F('pk')}
+            )
+        modelo.objects.bulk_update(objetos, campos, batch_size=settings.OPERACIONES_MASIVAS['BATCH_SIZE'])
+
+    def _cursos_afectados(self, objetos):
+        if not self.ruta_curso or not objetos:
+            return set()
+        pks = [getattr(objeto, 'pk', objeto) for objeto in objetos]
+        return set(
+            self.get_queryset().model.objects.filter(pk__in=pks).values_list(self.ruta_curso, flat=True)
+        )
+
+    def _invalidar_caches(self, objetos, cursos=()):
+        """Lo que harían los signals de post_save (cursos: los de antes del cambio)"""
+        invalidar_modelos(self.get_queryset().model)
+        cursos = set(cursos) | self._cursos_afectados(objetos)
+        if cursos:
+            invalidar_curso(*cursos)
@@ -61,6 +61,7 @@ class Usuario(models.Model):
     
     # Avatar
     avatar_url = models.URLField(max_length=500, blank=True)
+    avatar_variantes = models.JSONField(default=dict, blank=True)  # {'48': {'url', 'public_id'}, ...}
     
     # Metadata
     activo = models.BooleanField(default=True)
@@ -325,6 +326,9 @@ class Curso(models.Model):
     @property
     def total_inscritos(self):
         """Retorna total de estudiantes inscritos"""
+        # CursoViewSet anota el conteo en el queryset: sin consulta por curso
+        if hasattr(self, 'num_inscritos'):
+            return self.num_inscritos
         return self.inscripciones.count()
     
     @property
@@ -494,6 +498,7 @@ class Material(models.Model):
     # Metadata del archivo
     duracion_segundos = models.IntegerField(null=True, blank=True)
     total_paginas = models.IntegerField(null=True, blank=True)
+    metadata = models.JSONField(default=dict, blank=True)  # ancho/alto/formato de imágenes
     
     # Autoría
     subido_por = models.ForeignKey(
@@ -589,6 +594,94 @@ class LeccionMaterial(models.Model):
         return f"{self.leccion.nombre} - {self.material.nombre}"
 
 
+class PaqueteScorm(models.Model):
+    """Índice de un paquete SCORM (ZIP) almacenado como Material"""
+    
+    ESTADO_CHOICES = [
+        ('indexado', 'Indexado'),
+        ('error', 'Error'),
+    ]
+    
+    material = models.OneToOneField(Material, on_delete=models.CASCADE, related_name='paquete_scorm')
+    
+    # Datos de imsmanifest.xml
+    identificador = models.CharField(max_length=255, blank=True)
+    version_scorm = models.CharField(max_length=50, blank=True)
+    titulo = models.CharField(max_length=300, blank=True)
+    
+    # Estado de la indexación
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='indexado')
+    error = models.TextField(blank=True)
+    total_archivos = models.IntegerField(default=0)
+    
+    # Metadata
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'paquetes_scorm'
+        verbose_name = 'Paquete SCORM'
+        verbose_name_plural = 'Paquetes SCORM'
+    
+    def __str__(self):
+        return f"{self.titulo or self.material.nombre} (SCORM {self.version_scorm})"
+
+
+class RecursoScorm(models.Model):
+    """Recurso (SCO o asset) declarado en el manifiesto de un paquete SCORM"""
+    
+    TIPO_CHOICES = [
+        ('sco', 'SCO'),
+        ('asset', 'Asset'),
+    ]
+    
+    paquete = models.ForeignKey(PaqueteScorm, on_delete=models.CASCADE, related_name='recursos')
+    identificador = models.CharField(max_length=255)
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES, default='asset')
+    href = models.CharField(max_length=500, blank=True)
+    parametros = models.CharField(max_length=500, blank=True)
+    
+    # Ítem de la organización que lo referencia (título y posición en el árbol)
+    titulo = models.CharField(max_length=300, blank=True)
+    orden = models.IntegerField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'recursos_scorm'
+        unique_together = [('paquete', 'identificador')]
+        ordering = ['orden', 'id']
+        verbose_name = 'Recurso SCORM'
+        verbose_name_plural = 'Recursos SCORM'
+    
+    def __str__(self):
+        return f"{self.identificador} ({self.tipo})"
+
+
+class ArchivoScorm(models.Model):
+    """
+    Entrada del ZIP de un paquete SCORM, con la posición de sus bytes
+    dentro del paquete almacenado para servirla con una petición por rango
+    """
+    
+    paquete = models.ForeignKey(PaqueteScorm, on_delete=models.CASCADE, related_name='archivos')
+    ruta = models.CharField(max_length=500)
+    
+    # Ubicación en el ZIP
+    offset_datos = models.BigIntegerField()
+    bytes_comprimidos = models.BigIntegerField()
+    bytes_descomprimidos = models.BigIntegerField()
+    metodo_compresion = models.SmallIntegerField()  # 0 = stored, 8 = deflate
+    crc32 = models.BigIntegerField()
+    
+    class Meta:
+        db_table = 'archivos_scorm'
+        unique_together = [('paquete', 'ruta')]
+        verbose_name = 'Archivo SCORM'
+        verbose_name_plural = 'Archivos SCORM'
+    
+    def __str__(self):
+        return self.ruta
+
+
 # =====================================================
 # CONTINÚA EN PARTE 2...
 # =====================================================
@@ -694,7 +787,12 @@ class Inscripcion(models.Model):
     # Diploma
     diploma_generado = models.BooleanField(default=False)
     diploma_url = models.URLField(max_length=500, blank=True)
-    diploma_codigo_validacion = models.CharField(max_length=20, blank=True)
+    diploma_codigo_validacion = models.CharField(max_length=40, blank=True)
+    diploma_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="Hash de contenido (plantilla + variables) del diploma generado"
+    )
     fecha_diploma = models.DateTimeField(null=True, blank=True)
     
     # ← ❌ BORRAR ESTAS LÍNEAS (duplicados sin help_text)
@@ -1578,6 +1676,67 @@ class PlantillaDiploma(models.Model):
         super().save(*args, **kwargs)
 
 
+class DiplomaJob(models.Model):
+    """Trabajos en cola para la generación asíncrona de diplomas"""
+
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+    ]
+
+    inscripcion = models.ForeignKey(Inscripcion, on_delete=models.CASCADE, related_name='diploma_jobs')
+    solicitado_por = models.ForeignKey(
+        Usuario,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='diploma_jobs_solicitados'
+    )
+
+    # Estado
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+
+    # Reintentos
+    intentos = models.IntegerField(default=0)
+    max_intentos = models.IntegerField(default=3)
+    disponible_desde = models.DateTimeField(
+        default=timezone.now,
+        help_text="El worker no toma el trabajo antes de esta fecha (backoff entre reintentos)"
+    )
+
+    # Resultado
+    resultado = models.JSONField(default=dict, blank=True)
+    ultimo_error = models.TextField(blank=True)
+
+    # Tiempos
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    # Metadata
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'diploma_jobs'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['estado', 'disponible_desde']),
+            models.Index(fields=['inscripcion']),
+        ]
+        verbose_name = 'Trabajo de Diploma'
+        verbose_name_plural = 'Trabajos de Diplomas'
+
+    def __str__(self):
+        return f"Diploma job #{self.pk} - Inscripción {self.inscripcion_id} ({self.estado})"
+
+    @property
+    def activo(self):
+        """True si el trabajo aún no termina (pendiente o procesando)"""
+        return self.estado in ['pendiente', 'procesando']
+
+
 # =====================================================
 # MÓDULO 12: REPORTES Y MÉTRICAS HISTÓRICAS
 # =====================================================
@@ -13,9 +13,16 @@ ROLES DEL SISTEMA:
 - administrador: Control total del sistema
 """
 
+from functools import lru_cache
+
 from rest_framework import permissions
+from rest_framework.decorators import permission_classes
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
+from .authentication import rol_usuario
+from .models import Curso
+from .visibilidad import contexto_autorizacion
+
 
 # =====================================================
 # PERMISOS BASE POR ROL
@@ -32,8 +39,7 @@ class IsAdministrador(BasePermission):
         return (
             request.user and 
             request.user.is_authenticated and 
-            hasattr(request.user, 'perfil') and
-            request.user.perfil.tipo_usuario == 'administrador'
+            contexto_autorizacion(request).rol == 'administrador'
         )
 
 
@@ -48,8 +54,7 @@ class IsRelator(BasePermission):
         return (
             request.user and 
             request.user.is_authenticated and 
-            hasattr(request.user, 'perfil') and
-            request.user.perfil.tipo_usuario == 'relator'
+            contexto_autorizacion(request).rol == 'relator'
         )
 
 
@@ -65,8 +70,7 @@ class IsEstudiante(BasePermission):
         return (
             request.user and 
             request.user.is_authenticated and 
-            hasattr(request.user, 'perfil') and
-            request.user.perfil.tipo_usuario == 'estudiante'
+            contexto_autorizacion(request).rol == 'estudiante'
         )
 
 
@@ -77,13 +81,115 @@ class IsRelatorOrAdministrador(BasePermission):
     message = "Solo relatores o administradores pueden realizar esta acción."
     
     def has_permission(self, request, view):
-        if not (request.user and request.user.is_authenticated and hasattr(request.user, 'perfil')):
+        if not (request.user and request.user.is_authenticated):
             return False
         
-        tipo_usuario = request.user.perfil.tipo_usuario
+        tipo_usuario = contexto_autorizacion(request).rol
         return tipo_usuario in ['relator', 'administrador']
 
 
+# =====================================================
+# MOTOR DECLARATIVO: MATRIZ ROL / ACCIÓN POR VIEWSET
+# =====================================================
+
+# Pseudo-roles: cualquier usuario autenticado (tenga o no perfil) y
+# acceso sin autenticación
+AUTENTICADO = 'autenticado'
+PUBLICO = 'publico'
+
+ADMINISTRADOR = ('administrador',)
+RELATOR_O_ADMINISTRADOR = ('administrador', 'relator')
+ESTUDIANTE = ('estudiante',)
+AUTENTICADOS = (AUTENTICADO,)
+TODOS = (PUBLICO,)
+
+LECTURA = ('list', 'retrieve', 'metadata')
+ESCRITURA = ('create', 'update', 'partial_update', 'destroy')
+
+# Catálogo: todos leen, solo administradores escriben (incluye acciones extra)
+CATALOGO = {
+    LECTURA: AUTENTICADOS,
+    '*': ADMINISTRADOR,
+}
+
+
+@lru_cache(maxsize=None)
+def _matriz_expandida(vista):
+    """{acción: roles} de la clase de vista, con las tuplas de acciones desplegadas"""
+    expandida = {}
+    for acciones, roles in getattr(vista, 'permisos_por_rol', {}).items():
+        for accion in (acciones if isinstance(acciones, tuple) else (acciones,)):
+            expandida[accion] = frozenset(roles)
+    return expandida
+
+
+def roles_permitidos(view, origen=None):
+    """
+    Roles que pueden ejecutar la acción actual de la vista
+
+    Args:
+        view: Vista del request
+        origen: Clase con la matriz `permisos_por_rol` (por defecto la de
+            la vista)
+
+    Returns:
+        frozenset de roles (vacío si la acción no está declarada y no hay '*')
+    """
+    matriz = _matriz_expandida(origen or type(view))
+    accion = getattr(view, 'action', None)
+    return matriz.get(accion, matriz.get('*', frozenset()))
+
+
+class PermisoPorRol(BasePermission):
+    """
+    Permisos por rol y acción, declarados en el ViewSet:
+
+        permission_classes = [PermisoPorRol]
+        permisos_por_rol = {
+            LECTURA: AUTENTICADOS,
+            ('aprobar', 'rechazar'): ADMINISTRADOR,
+            '*': ADMINISTRADOR,
+        }
+
+    Las claves son una acción o una tupla de acciones; '*' cubre las no
+    declaradas y, si falta, se niega. El rol sale del ContextoAutorizacion
+    del request (una vez por request, sin consultas con tokens JWT).
+
+    Solo decide por rol: qué filas ve cada uno queda en get_queryset, y
+    las reglas por objeto en las clases por modelo de más abajo.
+
+    Las vistas de función (@api_view) no tienen acciones ni atributos de
+    clase: usan el decorador permisos_vista(), que declara la matriz en
+    una subclase de este permiso.
+    """
+    message = "No tiene permisos para realizar esta acción."
+    permisos_por_rol = None  # matriz propia (ver permisos_vista)
+    
+    def has_permission(self, request, view):
+        roles = roles_permitidos(view, type(self) if self.permisos_por_rol is not None else None)
+        if PUBLICO in roles:
+            return True
+        if not (request.user and request.user.is_authenticated):
+            return False
+        return AUTENTICADO in roles or contexto_autorizacion(request).rol in roles
+
+
+def permisos_vista(roles):
+    """
+    PermisoPorRol para una vista de función
+
+        @api_view(['POST'])
+        @permisos_vista(RELATOR_O_ADMINISTRADOR)
+        def upload_material(request):
+            ...
+
+    Args:
+        roles: Roles permitidos, para todos los métodos de la vista
+    """
+    permiso = type('PermisoPorRolVista', (PermisoPorRol,), {'permisos_por_rol': {'*': roles}})
+    return permission_classes([permiso])
+
+
 # =====================================================
 # PERMISOS ESPECÍFICOS POR MODELO
 # =====================================================
@@ -101,7 +207,7 @@ class UsuarioPermission(BasePermission):
             return False
         
         # Administradores tienen acceso total
-        if hasattr(request.user, 'perfil') and request.user.perfil.tipo_usuario == 'administrador':
+        if contexto_autorizacion(request).rol == 'administrador':
             return True
         
         # Otros usuarios solo pueden ver (GET, HEAD, OPTIONS)
@@ -109,12 +215,12 @@ class UsuarioPermission(BasePermission):
     
     def has_object_permission(self, request, view, obj):
         # Administradores pueden todo
-        if hasattr(request.user, 'perfil') and request.user.perfil.tipo_usuario == 'administrador':
+        if contexto_autorizacion(request).rol == 'administrador':
             return True
         
         # Usuarios solo pueden ver su propio perfil
         if request.method in SAFE_METHODS:
-            return obj == request.user.perfil
+            return obj.pk == contexto_autorizacion(request).perfil_id
         
         return False
 
@@ -131,7 +237,7 @@ class MaterialPermission(BasePermission):
         if not request.user.is_authenticated:
             return False
         
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: acceso total
         if tipo_usuario == 'administrador':
@@ -148,7 +254,7 @@ class MaterialPermission(BasePermission):
         return False
     
     def has_object_permission(self, request, view, obj):
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: pueden todo
         if tipo_usuario == 'administrador':
@@ -157,7 +263,7 @@ class MaterialPermission(BasePermission):
         # Relatores: pueden ver sus propios materiales, NO pueden editar ni eliminar
         if tipo_usuario == 'relator':
             if request.method in SAFE_METHODS:
-                return obj.relator == request.user.perfil
+                return obj.relator_autor_id == contexto_autorizacion(request).perfil_id
             return False  # NO pueden editar ni eliminar
         
         # Estudiantes: solo pueden ver materiales aprobados
@@ -180,7 +286,7 @@ class CursoPermission(BasePermission):
             # Permitir GET público para cursos destacados
             return request.method in SAFE_METHODS
         
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: acceso total
         if tipo_usuario == 'administrador':
@@ -193,7 +299,7 @@ class CursoPermission(BasePermission):
         if not request.user.is_authenticated:
             return False
         
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: pueden todo
         if tipo_usuario == 'administrador':
@@ -202,13 +308,13 @@ class CursoPermission(BasePermission):
         # Relatores: solo pueden ver cursos donde están asignados
         if tipo_usuario == 'relator':
             if request.method in SAFE_METHODS:
-                return obj.relatores.filter(id=request.user.perfil.id).exists()
+                return contexto_autorizacion(request).relator_de(obj.pk)
             return False
         
         # Estudiantes: solo pueden ver cursos donde están inscritos
         if tipo_usuario == 'estudiante':
             if request.method in SAFE_METHODS:
-                return obj.inscripciones.filter(estudiante=request.user.perfil, activo=True).exists()
+                return contexto_autorizacion(request).inscrito_en(obj.pk)
             return False
         
         return False
@@ -226,7 +332,7 @@ class InscripcionPermission(BasePermission):
         if not request.user.is_authenticated:
             return False
         
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: acceso total
         if tipo_usuario == 'administrador':
@@ -236,7 +342,7 @@ class InscripcionPermission(BasePermission):
         return request.method in SAFE_METHODS
     
     def has_object_permission(self, request, view, obj):
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: pueden todo
         if tipo_usuario == 'administrador':
@@ -245,13 +351,13 @@ class InscripcionPermission(BasePermission):
         # Relatores: pueden ver inscripciones de sus cursos
         if tipo_usuario == 'relator':
             if request.method in SAFE_METHODS:
-                return obj.curso.relatores.filter(id=request.user.perfil.id).exists()
+                return contexto_autorizacion(request).relator_de(curso_id_de(obj))
             return False
         
         # Estudiantes: solo pueden ver sus propias inscripciones
         if tipo_usuario == 'estudiante':
             if request.method in SAFE_METHODS:
-                return obj.estudiante == request.user.perfil
+                return obj.estudiante_id == contexto_autorizacion(request).perfil_id
             return False
         
         return False
@@ -269,7 +375,7 @@ class ProgresoPermission(BasePermission):
         if not request.user.is_authenticated:
             return False
         
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: acceso total
         if tipo_usuario == 'administrador':
@@ -286,7 +392,7 @@ class ProgresoPermission(BasePermission):
         return False
     
     def has_object_permission(self, request, view, obj):
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: pueden todo
         if tipo_usuario == 'administrador':
@@ -296,12 +402,12 @@ class ProgresoPermission(BasePermission):
         if tipo_usuario == 'estudiante':
             if request.method == 'DELETE':
                 return False
-            return obj.inscripcion.estudiante == request.user.perfil
+            return obj.inscripcion.estudiante_id == contexto_autorizacion(request).perfil_id
         
         # Relatores: pueden ver progreso de estudiantes en sus cursos
         if tipo_usuario == 'relator':
             if request.method in SAFE_METHODS:
-                return obj.inscripcion.curso.relatores.filter(id=request.user.perfil.id).exists()
+                return contexto_autorizacion(request).relator_de(obj.inscripcion.curso_id)
             return False
         
         return False
@@ -319,7 +425,7 @@ class EvaluacionPermission(BasePermission):
         if not request.user.is_authenticated:
             return False
         
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: acceso total
         if tipo_usuario == 'administrador':
@@ -329,7 +435,7 @@ class EvaluacionPermission(BasePermission):
         return request.method in SAFE_METHODS
     
     def has_object_permission(self, request, view, obj):
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: pueden todo
         if tipo_usuario == 'administrador':
@@ -338,13 +444,13 @@ class EvaluacionPermission(BasePermission):
         # Relatores: pueden ver evaluaciones de sus cursos
         if tipo_usuario == 'relator':
             if request.method in SAFE_METHODS:
-                return obj.curso.relatores.filter(id=request.user.perfil.id).exists()
+                return contexto_autorizacion(request).relator_de(curso_id_de(obj))
             return False
         
         # Estudiantes: pueden ver evaluaciones de cursos donde están inscritos
         if tipo_usuario == 'estudiante':
             if request.method in SAFE_METHODS:
-                return obj.curso.inscripciones.filter(estudiante=request.user.perfil, activo=True).exists()
+                return contexto_autorizacion(request).inscrito_en(curso_id_de(obj))
             return False
         
         return False
@@ -362,7 +468,7 @@ class ForoPermission(BasePermission):
         if not request.user.is_authenticated:
             return False
         
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: acceso total
         if tipo_usuario == 'administrador':
@@ -375,25 +481,22 @@ class ForoPermission(BasePermission):
         return False
     
     def has_object_permission(self, request, view, obj):
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: pueden todo
         if tipo_usuario == 'administrador':
             return True
         
         # Determinar si el usuario tiene acceso al curso del foro
-        if hasattr(obj, 'curso'):
-            curso = obj.curso
-        elif hasattr(obj, 'foro'):
-            curso = obj.foro.curso
-        else:
+        curso_id = curso_id_de(obj)
+        if curso_id is None:
             return False
         
         # Relatores: pueden leer y crear en foros de sus cursos, NO pueden eliminar
         if tipo_usuario == 'relator':
             if request.method == 'DELETE':
                 return False
-            tiene_acceso = curso.relatores.filter(id=request.user.perfil.id).exists()
+            tiene_acceso = contexto_autorizacion(request).relator_de(curso_id)
             if request.method in SAFE_METHODS or request.method == 'POST':
                 return tiene_acceso
             return False
@@ -402,7 +505,7 @@ class ForoPermission(BasePermission):
         if tipo_usuario == 'estudiante':
             if request.method in ['PUT', 'PATCH', 'DELETE']:
                 return False
-            tiene_acceso = curso.inscripciones.filter(estudiante=request.user.perfil, activo=True).exists()
+            tiene_acceso = contexto_autorizacion(request).inscrito_en(curso_id)
             return tiene_acceso and request.method in ['GET', 'HEAD', 'OPTIONS', 'POST']
         
         return False
@@ -419,7 +522,7 @@ class NotificacionPermission(BasePermission):
         if not request.user.is_authenticated:
             return False
         
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: acceso total
         if tipo_usuario == 'administrador':
@@ -429,7 +532,7 @@ class NotificacionPermission(BasePermission):
         return request.method in ['GET', 'HEAD', 'OPTIONS', 'PATCH']
     
     def has_object_permission(self, request, view, obj):
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: pueden todo
         if tipo_usuario == 'administrador':
@@ -437,7 +540,7 @@ class NotificacionPermission(BasePermission):
         
         # Usuarios solo pueden ver y actualizar sus propias notificaciones
         if request.method in ['GET', 'HEAD', 'OPTIONS', 'PATCH']:
-            return obj.usuario == request.user.perfil
+            return obj.usuario_id == contexto_autorizacion(request).perfil_id
         
         return False
 
@@ -457,7 +560,7 @@ class DiplomaPermission(BasePermission):
                 return True
             return False
         
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: acceso total
         if tipo_usuario == 'administrador':
@@ -467,7 +570,7 @@ class DiplomaPermission(BasePermission):
         return request.method in SAFE_METHODS
     
     def has_object_permission(self, request, view, obj):
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: pueden todo
         if tipo_usuario == 'administrador':
@@ -477,11 +580,11 @@ class DiplomaPermission(BasePermission):
         if request.method in SAFE_METHODS:
             # Estudiantes: sus propios diplomas
             if tipo_usuario == 'estudiante':
-                return obj.inscripcion.estudiante == request.user.perfil
+                return obj.inscripcion.estudiante_id == contexto_autorizacion(request).perfil_id
             
             # Relatores: diplomas de estudiantes en sus cursos
             if tipo_usuario == 'relator':
-                return obj.inscripcion.curso.relatores.filter(id=request.user.perfil.id).exists()
+                return contexto_autorizacion(request).relator_de(obj.inscripcion.curso_id)
         
         return False
 
@@ -499,7 +602,7 @@ class ReadOnlyForNonAdmin(BasePermission):
         if not request.user.is_authenticated:
             return False
         
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: acceso total
         if tipo_usuario == 'administrador':
@@ -515,7 +618,7 @@ class IsOwnerOrAdmin(BasePermission):
     """
     
     def has_object_permission(self, request, view, obj):
-        tipo_usuario = request.user.perfil.tipo_usuario if hasattr(request.user, 'perfil') else None
+        tipo_usuario = contexto_autorizacion(request).rol
         
         # Administradores: pueden todo
         if tipo_usuario == 'administrador':
@@ -524,11 +627,11 @@ class IsOwnerOrAdmin(BasePermission):
         # Propietario: solo lectura
         if request.method in SAFE_METHODS:
             if hasattr(obj, 'usuario'):
-                return obj.usuario == request.user.perfil
+                return obj.usuario_id == contexto_autorizacion(request).perfil_id
             if hasattr(obj, 'estudiante'):
-                return obj.estudiante == request.user.perfil
+                return obj.estudiante_id == contexto_autorizacion(request).perfil_id
             if hasattr(obj, 'relator'):
-                return obj.relator == request.user.perfil
+                return obj.relator_id == contexto_autorizacion(request).perfil_id
         
         return False
 
@@ -542,8 +645,7 @@ def es_administrador(user):
     return (
         user and 
         user.is_authenticated and 
-        hasattr(user, 'perfil') and 
-        user.perfil.tipo_usuario == 'administrador'
+        rol_usuario(user) == 'administrador'
     )
 
 
@@ -552,8 +654,7 @@ def es_relator(user):
     return (
         user and 
         user.is_authenticated and 
-        hasattr(user, 'perfil') and 
-        user.perfil.tipo_usuario == 'relator'
+        rol_usuario(user) == 'relator'
     )
 
 
@@ -562,26 +663,35 @@ def es_estudiante(user):
     return (
         user and 
         user.is_authenticated and 
-        hasattr(user, 'perfil') and 
-        user.perfil.tipo_usuario == 'estudiante'
+        rol_usuario(user) == 'estudiante'
     )
 
 
-def tiene_acceso_curso(user, curso):
-    """Helper function para verificar si un usuario tiene acceso a un curso"""
-    if not user.is_authenticated:
+def tiene_acceso_curso(request, curso):
+    """
+    Helper function para verificar si el usuario del request tiene acceso a un curso
+    (responde desde el ContextoAutorizacion del request)
+    """
+    if not request.user.is_authenticated:
         return False
     
-    if es_administrador(user):
-        return True
-    
-    if es_relator(user):
-        return curso.relatores.filter(id=user.perfil.id).exists()
-    
-    if es_estudiante(user):
-        return curso.inscripciones.filter(estudiante=user.perfil, activo=True).exists()
-    
-    return False
+    return contexto_autorizacion(request).puede_ver_curso(curso.pk)
+
+
+def curso_id_de(obj):
+    """
+    ID del curso al que pertenece obj (Curso, Inscripcion, progreso,
+    Evaluacion, Leccion, ForoConsulta, ForoRespuesta...), o None
+    """
+    if isinstance(obj, Curso):
+        return obj.pk
+    if getattr(obj, 'curso_id', None) is not None:
+        return obj.curso_id
+    for relacion in ('inscripcion', 'modulo', 'leccion', 'consulta'):
+        relacionado = getattr(obj, relacion, None)
+        if relacionado is not None:
+            return curso_id_de(relacionado)
+    return None
 
 
 # =====================================================
@@ -0,0 +1,124 @@
+# renderers.py
+# Renderer y parser JSON basados en orjson (reemplazan a los de DRF por defecto)
+# LMS JC Digital Training
+
+import datetime
+import decimal
+import uuid
+
+import orjson
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+# Serializados por _codificador() en vez de orjson, para usar los mismos
+# formatos que rest_framework.utils.encoders.JSONEncoder
+_OPCIONES = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def _codificador(obj):
+    """
+    Función `default` para orjson: tipos que orjson no serializa (o que
+    serializa distinto que el JSONEncoder de DRF)
+
+    Los valores sin serializar (Decimal y datetime armados a mano en la
+    vista) salen igual que con JSONRenderer: Decimal como float y datetime
+    en ISO 8601 sin convertir de zona, con 'Z' para UTC. Los campos de un
+    serializer ya llegan como texto según COERCE_DECIMAL_TO_STRING y
+    DATETIME_FORMAT.
+
+    Decimal y datetime se comparan por tipo exacto antes del resto: el
+    callback se ejecuta por cada valor y es lo que domina el tiempo en
+    payloads con muchas notas y fechas.
+    """
+    tipo = type(obj)
+    if tipo is decimal.Decimal:
+        return float(obj)
+    if tipo is datetime.datetime:
+        return _fecha_hora(obj)
+    return _otros_tipos(obj)
+
+
+def _fecha_hora(obj):
+    representacion = obj.isoformat()
+    if representacion.endswith('+00:00'):
+        representacion = representacion[:-6] + 'Z'
+    return representacion
+
+
+def _otros_tipos(obj):
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, datetime.datetime):
+        return _fecha_hora(obj)
+    if isinstance(obj, datetime.time) and timezone.is_aware(obj):
+        raise TypeError('JSON no puede representar horas con zona horaria')
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, QuerySet):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__getitem__') and hasattr(obj, 'keys'):
+        return dict(obj)
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f'Tipo no serializable a JSON: {type(obj).__name__}')
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Renderer JSON con orjson
+
+    Salida equivalente a JSONRenderer con la configuración del proyecto
+    (UNICODE_JSON y COMPACT_JSON): UTF-8 sin escapes y sin espacios.
+    Con ?indent o `; indent=N` en Accept se indenta a 2 espacios (único
+    ancho que soporta orjson).
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        opciones = _OPCIONES
+        renderer_context = renderer_context or {}
+        if renderer_context.get('indent') or (
+            accepted_media_type and 'indent=' in accepted_media_type
+        ):
+            opciones |= orjson.OPT_INDENT_2
+
+        contenido = orjson.dumps(data, default=_codificador, option=opciones)
+
+        # Igual que JSONRenderer: U+2028/U+2029 son válidos en JSON pero no en JavaScript
+        if b'\xe2\x80\xa8' in contenido or b'\xe2\x80\xa9' in contenido:
+            contenido = contenido.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return contenido
+
+
+class ORJSONParser(BaseParser):
+    """Parser JSON con orjson (rechaza NaN/Infinity, como JSONParser estricto)"""
+    media_type = 'application/json'
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
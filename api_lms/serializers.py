@@ -15,7 +15,7 @@ from .models import (
     Curso, CursoRelator, Modulo, Leccion,
     
     # Módulo 4: Materiales
-    Material, LeccionMaterial,
+    Material, LeccionMaterial, PaqueteScorm, RecursoScorm,
     
     # Módulo 5: Inscripciones
     Inscripcion, ProgresoModulo, ProgresoLeccion, ActividadEstudiante,
@@ -36,7 +36,7 @@ from .models import (
     Encuesta, RespuestaEncuesta,
     
     # Módulo 11: Diplomas
-    PlantillaDiploma,
+    PlantillaDiploma, DiplomaJob,
     
     # Módulo 12: Métricas
     MetricaHistorica,
@@ -44,23 +44,87 @@ from .models import (
     # Módulo 13: Auditoría
     AuditLog
 )
+from .services.avatares import urls_avatar
+from .filters import campos_solicitados
+
+
+class CamposDinamicosMixin:
+    """
+    Respuestas parciales: ?fields=id,nombre deja solo esos campos
+    (más las relaciones anidadas nombradas en ?expand=; ver filters.py)
+    
+    Solo aplica al serializer raíz de una lectura, que es el que recibe el
+    request en el contexto; los serializers anidados se entregan completos.
+    CamposDinamicosFilter reduce además las columnas leídas de la BD.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        campos = campos_solicitados(self.context.get('request'))
+        if campos is not None:
+            for nombre in set(self.fields) - campos:
+                self.fields.pop(nombre)
+
+
+class RelacionPrecargadaField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField que resuelve el ID desde un diccionario ya
+    cargado en vez de hacer un .get() por valor (operaciones masivas)
+    """
+
+    def __init__(self, objetos, **kwargs):
+        self.objetos = objetos
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return self.objetos[int(data)]
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+
+def precargar_relaciones(serializer, elementos):
+    """
+    Reemplaza las relaciones escribibles por PK del serializer por
+    RelacionPrecargadaField, con una consulta (in_bulk) por relación
+
+    Args:
+        serializer: Serializer que validará cada elemento de la lista
+        elementos: Lista de diccionarios a validar
+    """
+    for nombre, campo in list(serializer.fields.items()):
+        if campo.read_only or type(campo) is not serializers.PrimaryKeyRelatedField:
+            continue
+        ids = set()
+        for elemento in elementos:
+            try:
+                ids.add(int(elemento[nombre]))
+            except (KeyError, TypeError, ValueError):
+                pass
+        objetos = campo.get_queryset().in_bulk(ids) if ids else {}
+        serializer.fields[nombre] = RelacionPrecargadaField(objetos, **campo._kwargs)
 
 
 # =====================================================
 # SERIALIZERS MÓDULO 1: USUARIOS
 # =====================================================
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'date_joined']
         read_only_fields = ['id', 'date_joined']
 
 
-class UsuarioSerializer(serializers.ModelSerializer):
+class UsuarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     rut_completo = serializers.SerializerMethodField()
     nombre_completo = serializers.SerializerMethodField()
+    avatar_variantes = serializers.SerializerMethodField()
     
     class Meta:
         model = Usuario
@@ -72,9 +136,35 @@ class UsuarioSerializer(serializers.ModelSerializer):
     
     def get_nombre_completo(self, obj):
         return obj.nombre_completo()
+    
+    def get_avatar_variantes(self, obj):
+        """URLs por tamaño ('48', '128', '400'); los listados deberían usar '48'"""
+        return urls_avatar(obj)
 
 
-class PerfilRelatorSerializer(serializers.ModelSerializer):
+class UsuarioResumenSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """Versión para listados: solo identificación (requiere select_related('user'))"""
+    email = serializers.EmailField(source='user.email', read_only=True)
+    rut_completo = serializers.SerializerMethodField()
+    nombre_completo = serializers.SerializerMethodField()
+    avatar = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Usuario
+        fields = ['id', 'nombre_completo', 'rut_completo', 'email', 'tipo_usuario', 'avatar']
+        read_only_fields = fields
+    
+    def get_rut_completo(self, obj):
+        return obj.get_rut()
+    
+    def get_nombre_completo(self, obj):
+        return obj.nombre_completo()
+    
+    def get_avatar(self, obj):
+        return urls_avatar(obj).get('48')
+
+
+class PerfilRelatorSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     usuario_data = UsuarioSerializer(source='usuario', read_only=True)
     
     class Meta:
@@ -84,7 +174,7 @@ class PerfilRelatorSerializer(serializers.ModelSerializer):
                            'total_estudiantes_capacitados', 'calificacion_promedio']
 
 
-class ConfiguracionUsuarioSerializer(serializers.ModelSerializer):
+class ConfiguracionUsuarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = ConfiguracionUsuario
         fields = '__all__'
@@ -95,7 +185,7 @@ class ConfiguracionUsuarioSerializer(serializers.ModelSerializer):
 # SERIALIZERS MÓDULO 2: CÓDIGOS SENCE
 # =====================================================
 
-class CodigoSenceSerializer(serializers.ModelSerializer):
+class CodigoSenceSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     horas_disponibles = serializers.SerializerMethodField()
     
     class Meta:
@@ -111,7 +201,7 @@ class CodigoSenceSerializer(serializers.ModelSerializer):
 # SERIALIZERS MÓDULO 3: CURSOS
 # =====================================================
 
-class CursoRelatorSerializer(serializers.ModelSerializer):
+class CursoRelatorSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     relator_nombre = serializers.SerializerMethodField()
     curso_nombre = serializers.CharField(source='curso.nombre', read_only=True)
     
@@ -124,7 +214,7 @@ class CursoRelatorSerializer(serializers.ModelSerializer):
         return obj.relator.nombre_completo()
 
 
-class ModuloSerializer(serializers.ModelSerializer):
+class ModuloSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     curso_nombre = serializers.CharField(source='curso.nombre', read_only=True)
     
     class Meta:
@@ -133,7 +223,7 @@ class ModuloSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class LeccionSerializer(serializers.ModelSerializer):
+class LeccionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     modulo_nombre = serializers.CharField(source='modulo.nombre', read_only=True)
     
     class Meta:
@@ -142,7 +232,7 @@ class LeccionSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class CursoSerializer(serializers.ModelSerializer):
+class CursoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     codigo_sence_data = CodigoSenceSerializer(source='codigo_sence', read_only=True)
     modulos = ModuloSerializer(many=True, read_only=True)
     relatores = serializers.SerializerMethodField()
@@ -155,7 +245,10 @@ class CursoSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
     
     def get_relatores(self, obj):
-        asignaciones = obj.asignaciones_relator.filter(activo=True)
+        # relatores_activos viene precargado por cursos_para_serializar()
+        asignaciones = getattr(obj, 'relatores_activos', None)
+        if asignaciones is None:
+            asignaciones = obj.asignaciones_relator.filter(activo=True).select_related('relator')
         return CursoRelatorSerializer(asignaciones, many=True).data
     
     def get_total_inscritos(self, obj):
@@ -165,11 +258,24 @@ class CursoSerializer(serializers.ModelSerializer):
         return obj.cupos_disponibles
 
 
+class CursoResumenSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """Versión para listados: sin módulos, relatores ni conteos (requiere select_related('codigo_sence'))"""
+    codigo_sence_codigo = serializers.CharField(source='codigo_sence.codigo', read_only=True, default=None)
+    
+    class Meta:
+        model = Curso
+        fields = [
+            'id', 'nombre', 'codigo_sence', 'codigo_sence_codigo', 'codigo_sence_curso',
+            'estado', 'publicado', 'fecha_inicio', 'fecha_fin', 'horas_totales', 'imagen_portada',
+        ]
+        read_only_fields = fields
+
+
 # =====================================================
 # SERIALIZERS MÓDULO 4: MATERIALES
 # =====================================================
 
-class MaterialSerializer(serializers.ModelSerializer):
+class MaterialSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     #subido_por_nombre = serializers.SerializerMethodField()
     #relator_autor_nombre = serializers.SerializerMethodField()
     
@@ -185,7 +291,7 @@ class MaterialSerializer(serializers.ModelSerializer):
         #return obj.relator_autor.nombre_completo() if obj.relator_autor else None
 
 
-class LeccionMaterialSerializer(serializers.ModelSerializer):
+class LeccionMaterialSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     leccion_nombre = serializers.CharField(source='leccion.nombre', read_only=True)
     material_data = MaterialSerializer(source='material', read_only=True)
     
@@ -199,7 +305,7 @@ class LeccionMaterialSerializer(serializers.ModelSerializer):
 # SERIALIZERS MÓDULO 5: INSCRIPCIONES
 # =====================================================
 
-class InscripcionSerializer(serializers.ModelSerializer):
+class InscripcionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     estudiante_data = UsuarioSerializer(source='estudiante', read_only=True)
     curso_data = CursoSerializer(source='curso', read_only=True)
     puede_generar_diploma = serializers.SerializerMethodField()
@@ -213,7 +319,18 @@ class InscripcionSerializer(serializers.ModelSerializer):
         return obj.puede_generar_diploma
 
 
-class ProgresoModuloSerializer(serializers.ModelSerializer):
+class InscripcionListaSerializer(InscripcionSerializer):
+    """
+    Versión para listados de InscripcionSerializer: curso y estudiante resumidos
+    
+    La forma completa (CursoSerializer con módulos y relatores) queda para el
+    detalle o para ?expand=curso_data,estudiante_data
+    """
+    estudiante_data = UsuarioResumenSerializer(source='estudiante', read_only=True)
+    curso_data = CursoResumenSerializer(source='curso', read_only=True)
+
+
+class ProgresoModuloSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     estudiante_nombre = serializers.SerializerMethodField()
     modulo_data = ModuloSerializer(source='modulo', read_only=True)
     
@@ -226,7 +343,7 @@ class ProgresoModuloSerializer(serializers.ModelSerializer):
         return obj.inscripcion.estudiante.nombre_completo()
 
 
-class ProgresoLeccionSerializer(serializers.ModelSerializer):
+class ProgresoLeccionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     estudiante_nombre = serializers.SerializerMethodField()
     leccion_data = LeccionSerializer(source='leccion', read_only=True)
     
@@ -239,7 +356,7 @@ class ProgresoLeccionSerializer(serializers.ModelSerializer):
         return obj.inscripcion.estudiante.nombre_completo()
 
 
-class ActividadEstudianteSerializer(serializers.ModelSerializer):
+class ActividadEstudianteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     estudiante_nombre = serializers.SerializerMethodField()
     
     class Meta:
@@ -254,7 +371,7 @@ class ActividadEstudianteSerializer(serializers.ModelSerializer):
 # SERIALIZERS MÓDULO 6: EVALUACIONES
 # =====================================================
 
-class PreguntaSerializer(serializers.ModelSerializer):
+class PreguntaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     evaluacion_nombre = serializers.CharField(source='evaluacion.nombre', read_only=True)
     
     class Meta:
@@ -263,7 +380,7 @@ class PreguntaSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
-class EvaluacionSerializer(serializers.ModelSerializer):
+class EvaluacionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     preguntas = PreguntaSerializer(many=True, read_only=True)
     curso_nombre = serializers.SerializerMethodField()
     modulo_nombre = serializers.SerializerMethodField()
@@ -280,7 +397,7 @@ class EvaluacionSerializer(serializers.ModelSerializer):
         return obj.modulo.nombre if obj.modulo else None
 
 
-class RespuestaEstudianteSerializer(serializers.ModelSerializer):
+class RespuestaEstudianteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     pregunta_data = PreguntaSerializer(source='pregunta', read_only=True)
     
     class Meta:
@@ -289,7 +406,7 @@ class RespuestaEstudianteSerializer(serializers.ModelSerializer):
         read_only_fields = ['respondida_at']
 
 
-class IntentoEvaluacionSerializer(serializers.ModelSerializer):
+class IntentoEvaluacionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     estudiante_nombre = serializers.SerializerMethodField()
     evaluacion_nombre = serializers.CharField(source='evaluacion.nombre', read_only=True)
     respuestas = RespuestaEstudianteSerializer(many=True, read_only=True)
@@ -303,7 +420,7 @@ class IntentoEvaluacionSerializer(serializers.ModelSerializer):
         return obj.estudiante.nombre_completo()
 
 
-class SolicitudTercerIntentoSerializer(serializers.ModelSerializer):
+class SolicitudTercerIntentoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     estudiante_nombre = serializers.SerializerMethodField()
     evaluacion_nombre = serializers.CharField(source='evaluacion.nombre', read_only=True)
     revisado_por_nombre = serializers.SerializerMethodField()
@@ -324,7 +441,7 @@ class SolicitudTercerIntentoSerializer(serializers.ModelSerializer):
 # SERIALIZERS MÓDULO 7: INTEGRACIÓN SENCE
 # =====================================================
 
-class SesionSenceSerializer(serializers.ModelSerializer):
+class SesionSenceSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     estudiante_nombre = serializers.SerializerMethodField()
     curso_nombre = serializers.CharField(source='curso.nombre', read_only=True)
     
@@ -337,7 +454,7 @@ class SesionSenceSerializer(serializers.ModelSerializer):
         return obj.estudiante.nombre_completo()
 
 
-class LogEnvioSenceSerializer(serializers.ModelSerializer):
+class LogEnvioSenceSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     curso_nombre = serializers.CharField(source='curso.nombre', read_only=True)
     enviado_por_nombre = serializers.SerializerMethodField()
     
@@ -354,7 +471,7 @@ class LogEnvioSenceSerializer(serializers.ModelSerializer):
 # SERIALIZERS MÓDULO 8: FORO
 # =====================================================
 
-class ForoRespuestaSerializer(serializers.ModelSerializer):
+class ForoRespuestaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     autor_nombre = serializers.SerializerMethodField()
     
     class Meta:
@@ -366,7 +483,7 @@ class ForoRespuestaSerializer(serializers.ModelSerializer):
         return obj.autor.nombre_completo()
 
 
-class ForoConsultaSerializer(serializers.ModelSerializer):
+class ForoConsultaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     estudiante_nombre = serializers.SerializerMethodField()
     leccion_nombre = serializers.CharField(source='leccion.nombre', read_only=True)
     respuestas = ForoRespuestaSerializer(many=True, read_only=True)
@@ -388,7 +505,7 @@ class ForoConsultaSerializer(serializers.ModelSerializer):
 # SERIALIZERS MÓDULO 9: NOTIFICACIONES
 # =====================================================
 
-class NotificacionSerializer(serializers.ModelSerializer):
+class NotificacionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     usuario_nombre = serializers.SerializerMethodField()
     
     class Meta:
@@ -404,14 +521,14 @@ class NotificacionSerializer(serializers.ModelSerializer):
 # SERIALIZERS MÓDULO 10: ENCUESTAS
 # =====================================================
 
-class EncuestaSerializer(serializers.ModelSerializer):
+class EncuestaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Encuesta
         fields = '__all__'
         read_only_fields = ['created_at']
 
 
-class RespuestaEncuestaSerializer(serializers.ModelSerializer):
+class RespuestaEncuestaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     estudiante_nombre = serializers.SerializerMethodField()
     encuesta_nombre = serializers.CharField(source='encuesta.nombre', read_only=True)
     
@@ -428,7 +545,7 @@ class RespuestaEncuestaSerializer(serializers.ModelSerializer):
 # SERIALIZERS MÓDULO 11: DIPLOMAS
 # =====================================================
 
-class PlantillaDiplomaSerializer(serializers.ModelSerializer):
+class PlantillaDiplomaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = PlantillaDiploma
         fields = '__all__'
@@ -439,7 +556,7 @@ class PlantillaDiplomaSerializer(serializers.ModelSerializer):
 # SERIALIZERS MÓDULO 12: MÉTRICAS
 # =====================================================
 
-class MetricaHistoricaSerializer(serializers.ModelSerializer):
+class MetricaHistoricaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     estudiante_nombre = serializers.SerializerMethodField()
     curso_nombre = serializers.SerializerMethodField()
     relator_nombre = serializers.SerializerMethodField()
@@ -462,7 +579,7 @@ class MetricaHistoricaSerializer(serializers.ModelSerializer):
 # SERIALIZERS MÓDULO 13: AUDITORÍA
 # =====================================================
 
-class AuditLogSerializer(serializers.ModelSerializer):
+class AuditLogSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     usuario_nombre = serializers.SerializerMethodField()
     
     class Meta:
@@ -477,9 +594,7 @@ class AuditLogSerializer(serializers.ModelSerializer):
 # NOTIFICACIONES Y DIPLOMAS
 # ==========================================
 
-from api_lms.models import Notificacion, PlantillaDiploma
-
-class NotificacionSerializer(serializers.ModelSerializer):
+class NotificacionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para notificaciones"""
     
     tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
@@ -495,7 +610,7 @@ class NotificacionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'fecha_leida']
 
 
-class PlantillaDiplomaSerializer(serializers.ModelSerializer):
+class PlantillaDiplomaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para plantillas de diplomas"""
     
     class Meta:
@@ -506,4 +621,44 @@ class PlantillaDiplomaSerializer(serializers.ModelSerializer):
             'firma_relator_incluida', 'activa', 'predeterminada',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+
+class DiplomaJobSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """Serializer para el estado de trabajos de generación de diplomas"""
+    
+    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
+    
+    class Meta:
+        model = DiplomaJob
+        fields = [
+            'id', 'inscripcion', 'estado', 'estado_display', 'intentos',
+            'max_intentos', 'disponible_desde', 'resultado', 'ultimo_error',
+            'fecha_inicio', 'fecha_fin', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class RecursoScormSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """Serializer para recursos (SCOs/assets) de un paquete SCORM"""
+    
+    class Meta:
+        model = RecursoScorm
+        fields = ['id', 'identificador', 'tipo', 'href', 'parametros', 'titulo', 'orden']
+        read_only_fields = fields
+
+
+class PaqueteScormSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """Serializer para el índice de un paquete SCORM"""
+    
+    material_nombre = serializers.CharField(source='material.nombre', read_only=True)
+    recursos = RecursoScormSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = PaqueteScorm
+        fields = [
+            'id', 'material', 'material_nombre', 'identificador', 'version_scorm',
+            'titulo', 'estado', 'error', 'total_archivos', 'recursos',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,316 @@
+# almacenamiento.py
+# Backends de almacenamiento y etapa de subida concurrente con reintentos
+# LMS JC Digital Training
+
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import cloudinary.uploader
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================================
+# BACKENDS DE ALMACENAMIENTO
+# =====================================================
+
+class BackendAlmacenamiento:
+    """
+    Interfaz común de los backends de almacenamiento.
+
+    Todas las subidas usan un public_id determinístico: subir dos veces el
+    mismo archivo con el mismo public_id sobrescribe el anterior, por lo que
+    un reintento nunca genera duplicados.
+    """
+
+    def __init__(self, timeout=60, **opciones):
+        self.timeout = timeout
+        self.opciones = opciones
+
+    def subir(self, archivo, public_id, carpeta, resource_type='raw'):
+        """
+        Sube un archivo (file-like) al almacenamiento
+
+        Returns:
+            dict con 'url' y 'public_id'
+        """
+        raise NotImplementedError
+
+    def eliminar(self, public_id, resource_type='raw'):
+        """Elimina un archivo del almacenamiento"""
+        raise NotImplementedError
+
+
+class CloudinaryBackend(BackendAlmacenamiento):
+    """
+    Backend sobre Cloudinary.
+
+    Usa el conector HTTP del SDK tal cual (es compartido por todo el
+    proceso y no se modifica): el timeout va como opción de cada llamada.
+    El pool del SDK es no bloqueante, así que los hilos de la etapa de
+    subida nunca esperan una conexión; solo abren una nueva si no hay
+    libre.
+    """
+
+    def subir(self, archivo, public_id, carpeta, resource_type='raw'):
+        archivo.seek(0)
+        upload_result = cloudinary.uploader.upload(
+            archivo,
+            folder=carpeta,
+            public_id=public_id,
+            resource_type=resource_type,
+            overwrite=True,
+            timeout=self.timeout,
+        )
+        return {
+            'url': upload_result['secure_url'],
+            'public_id': upload_result['public_id'],
+        }
+
+    def eliminar(self, public_id, resource_type='raw'):
+        cloudinary.uploader.destroy(public_id, resource_type=resource_type, timeout=self.timeout)
+
+
+class LocalBackend(BackendAlmacenamiento):
+    """
+    Backend sobre el sistema de archivos local (MEDIA_ROOT).
+
+    Sirve como reemplazo de Cloudinary en desarrollo y pruebas, con la misma
+    semántica de public_id que un bucket tipo MinIO/S3.
+    """
+
+    def __init__(self, raiz=None, url_base=None, **kwargs):
+        super().__init__(**kwargs)
+        self.raiz = str(raiz or os.path.join(settings.MEDIA_ROOT, 'almacenamiento'))
+        self.url_base = url_base or f"{settings.MEDIA_URL}almacenamiento/"
+
+    def _ruta(self, public_id):
+        return os.path.join(self.raiz, *public_id.split('/'))
+
+    def subir(self, archivo, public_id, carpeta, resource_type='raw'):
+        public_id_completo = f"{carpeta}/{public_id}" if carpeta else public_id
+        ruta = self._ruta(public_id_completo)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+        # Escribir a un temporal y renombrar: una subida interrumpida nunca
+        # deja un archivo a medias con el public_id definitivo
+        ruta_tmp = f"{ruta}.{threading.get_ident()}.tmp"
+        archivo.seek(0)
+        with open(ruta_tmp, 'wb') as destino:
+            while True:
+                bloque = archivo.read(1024 * 1024)
+                if not bloque:
+                    break
+                destino.write(bloque)
+        os.replace(ruta_tmp, ruta)
+
+        return {
+            'url': f"{self.url_base}{public_id_completo}",
+            'public_id': public_id_completo,
+        }
+
+    def eliminar(self, public_id, resource_type='raw'):
+        ruta = self._ruta(public_id)
+        if os.path.exists(ruta):
+            os.unlink(ruta)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def obtener_backend(nombre='diplomas'):
+    """
+    Retorna la instancia (compartida por proceso) del backend configurado
+    en settings.ALMACENAMIENTO[nombre]
+    """
+    with _backends_lock:
+        if nombre not in _backends:
+            config = settings.ALMACENAMIENTO[nombre]
+            backend_class = import_string(config['BACKEND'])
+            _backends[nombre] = backend_class(
+                timeout=config.get('TIMEOUT', 60),
+                **config.get('OPCIONES', {})
+            )
+        return _backends[nombre]
+
+
+# =====================================================
+# LECTURA REMOTA POR RANGOS
+# =====================================================
+
+class ArchivoRemoto(io.RawIOBase):
+    """
+    Archivo de solo lectura sobre una URL HTTP(S), con seek() y read()
+    resueltos mediante requests con cabecera Range.
+
+    Permite leer cabeceras de contenedores (MP4, ZIP...) de archivos ya
+    almacenados sin descargarlos completos. Conviene envolverlo en
+    io.BufferedReader para agrupar lecturas pequeñas:
+
+        with io.BufferedReader(ArchivoRemoto(url), 64 * 1024) as f:
+            ...
+    """
+
+    def __init__(self, url, timeout=30, sesion=None):
+        super().__init__()
+        self.url = url
+        self.timeout = timeout
+        self.sesion = sesion or requests.Session()
+        self._posicion = 0
+        self._total_bytes = None
+
+    @property
+    def total_bytes(self):
+        if self._total_bytes is None:
+            respuesta = self.sesion.head(self.url, timeout=self.timeout, allow_redirects=True)
+            respuesta.raise_for_status()
+            self._total_bytes = int(respuesta.headers['Content-Length'])
+        return self._total_bytes
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._posicion
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._posicion = offset
+        elif whence == io.SEEK_CUR:
+            self._posicion += offset
+        elif whence == io.SEEK_END:
+            self._posicion = self.total_bytes + offset
+        else:
+            raise ValueError(f"whence inválido: {whence}")
+        return self._posicion
+
+    def readinto(self, buffer):
+        if not len(buffer) or (self._total_bytes is not None and self._posicion >= self._total_bytes):
+            return 0
+
+        fin = self._posicion + len(buffer) - 1
+        respuesta = self.sesion.get(
+            self.url,
+            headers={'Range': f'bytes={self._posicion}-{fin}'},
+            timeout=self.timeout,
+        )
+        if respuesta.status_code == 416:
+            return 0
+        respuesta.raise_for_status()
+        if respuesta.status_code != 206:
+            raise IOError(f"El servidor no soporta lectura por rangos: {self.url}")
+
+        rango = respuesta.headers.get('Content-Range', '')
+        if '/' in rango and rango.rsplit('/', 1)[1].isdigit():
+            self._total_bytes = int(rango.rsplit('/', 1)[1])
+
+        datos = respuesta.content[:len(buffer)]
+        buffer[:len(datos)] = datos
+        self._posicion += len(datos)
+        return len(datos)
+
+
+def descargar_a_temporal(url, sufijo='', timeout=60):
+    """
+    Descarga una URL a un archivo temporal en bloques (memoria constante)
+
+    Returns:
+        str con la ruta del temporal; quien llama debe eliminarlo
+    """
+    with requests.get(url, stream=True, timeout=timeout) as respuesta:
+        respuesta.raise_for_status()
+        with tempfile.NamedTemporaryFile(suffix=sufijo, delete=False) as destino:
+            for bloque in respuesta.iter_content(1024 * 1024):
+                destino.write(bloque)
+            return destino.name
+
+
+# =====================================================
+# SUBIDA CON REINTENTOS
+# =====================================================
+
+def subir_con_reintentos(backend, archivo, public_id, carpeta, resource_type='raw',
+                         reintentos=3, backoff_base=1.0):
+    """
+    Sube un archivo reintentando con backoff exponencial (1s, 2s, 4s...)
+
+    Como el public_id es determinístico, reintentar una subida que sí llegó
+    al almacenamiento simplemente la sobrescribe.
+
+    Raises:
+        La última excepción si se agotan los reintentos
+    """
+    intento = 0
+    while True:
+        try:
+            return backend.subir(archivo, public_id, carpeta, resource_type=resource_type)
+        except Exception as e:
+            if intento >= reintentos:
+                raise
+            espera = backoff_base * (2 ** intento)
+            logger.warning(
+                "Error subiendo %s (intento %s/%s): %s. Reintentando en %.1fs",
+                public_id, intento + 1, reintentos + 1, e, espera
+            )
+            time.sleep(espera)
+            intento += 1
+
+
+class EtapaSubida:
+    """
+    Etapa de subida respaldada por un pool acotado de hilos.
+
+    Uso:
+        with EtapaSubida() as etapa:
+            futuro = etapa.enviar(pdf_file, public_id, 'diplomas')
+            ...
+            resultado = futuro.result()
+
+    Los hilos solo hacen I/O de red: cualquier acceso a la base de datos
+    debe resolverse antes de enviar la tarea o después de obtener el resultado.
+    """
+
+    def __init__(self, nombre='diplomas', max_workers=None):
+        config = settings.ALMACENAMIENTO[nombre]
+        self.backend = obtener_backend(nombre)
+        self.reintentos = config.get('REINTENTOS', 3)
+        self.backoff_base = config.get('BACKOFF_BASE', 1.0)
+        self.max_workers = max_workers or config.get('MAX_WORKERS', 4)
+        self._executor = None
+
+    def __enter__(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='subida'
+        )
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        return False
+
+    def enviar(self, archivo, public_id, carpeta, resource_type='raw'):
+        """Encola una subida y retorna un Future con el dict de resultado"""
+        return self._executor.submit(
+            subir_con_reintentos,
+            self.backend,
+            archivo,
+            public_id,
+            carpeta,
+            resource_type,
+            self.reintentos,
+            self.backoff_base,
+        )
@@ -0,0 +1,133 @@
+# avatares.py
+# Procesamiento local de avatares: variantes WebP de tamaño fijo con nombre por contenido
+# LMS JC Digital Training
+
+import hashlib
+import logging
+import re
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from api_lms.services.almacenamiento import EtapaSubida, obtener_backend
+
+logger = logging.getLogger(__name__)
+
+# Lado en px de cada variante (cuadrada)
+LADOS_AVATAR = (48, 128, 400)
+CALIDAD_WEBP = 82
+
+# Tope de píxeles antes de decodificar. Pillow solo rechaza por sobre el
+# doble de Image.MAX_IMAGE_PIXELS (~179 MP) y entre medio decodifica igual;
+# una foto de perfil nunca necesita más que esto
+MAX_PIXELES_AVATAR = 50_000_000
+
+# URLs de Cloudinary: .../upload/[transformaciones/]v123/carpeta/archivo.ext
+_RE_PUBLIC_ID_CLOUDINARY = re.compile(r'/upload/(?:.*?/)?v\d+/(.+?)(?:\.[A-Za-z0-9]+)?$')
+
+
+def generar_variantes_avatar(archivo):
+    """
+    Genera las variantes WebP cuadradas de un avatar
+
+    Se respeta la orientación EXIF y el recorte se centra un poco por encima
+    del centro (donde suele estar la cara en una foto de perfil).
+
+    Args:
+        archivo: Imagen subida (UploadedFile o file-like)
+
+    Returns:
+        list de (lado_px, BytesIO, hash_contenido)
+
+    Raises:
+        Image.DecompressionBombError si las dimensiones declaradas superan
+            MAX_PIXELES_AVATAR (se verifica antes de decodificar)
+    """
+    archivo.seek(0)
+    with Image.open(archivo) as original:
+        ancho, alto = original.size
+        if ancho * alto > MAX_PIXELES_AVATAR:
+            raise Image.DecompressionBombError(
+                f'La imagen tiene {ancho}x{alto} px; máximo {MAX_PIXELES_AVATAR} píxeles'
+            )
+        imagen = ImageOps.exif_transpose(original)
+        modo = 'RGBA' if 'A' in imagen.getbands() else 'RGB'
+        imagen = imagen.convert(modo)
+
+        variantes = []
+        for lado in LADOS_AVATAR:
+            recorte = ImageOps.fit(
+                imagen,
+                (lado, lado),
+                method=Image.Resampling.LANCZOS,
+                centering=(0.5, 0.4)
+            )
+            buffer = BytesIO()
+            recorte.save(buffer, 'WEBP', quality=CALIDAD_WEBP, method=4)
+            buffer.seek(0)
+            hash_contenido = hashlib.sha256(buffer.getbuffer()).hexdigest()[:16]
+            variantes.append((lado, buffer, hash_contenido))
+
+    return variantes
+
+
+def subir_variantes_avatar(usuario_id, variantes):
+    """
+    Sube las variantes en paralelo al backend ALMACENAMIENTO['avatares']
+
+    El public_id incluye el hash del contenido: una misma imagen siempre
+    produce la misma URL y una nueva imagen produce una URL distinta, así
+    que las URLs son inmutables y se pueden cachear indefinidamente.
+
+    Returns:
+        dict {'48': {'url', 'public_id'}, '128': {...}, '400': {...}}
+    """
+    carpeta = settings.ALMACENAMIENTO['avatares']['CARPETA']
+
+    with EtapaSubida('avatares', max_workers=len(variantes)) as etapa:
+        futuros = {
+            str(lado): etapa.enviar(
+                buffer, f"{usuario_id}/{lado}-{hash_contenido}", carpeta, resource_type='image'
+            )
+            for lado, buffer, hash_contenido in variantes
+        }
+        return {lado: futuro.result() for lado, futuro in futuros.items()}
+
+
+def eliminar_variantes_avatar(variantes):
+    """Elimina del almacenamiento las variantes registradas (errores solo se registran)"""
+    backend = obtener_backend('avatares')
+    for variante in (variantes or {}).values():
+        try:
+            backend.eliminar(variante['public_id'], resource_type='image')
+        except Exception as e:
+            logger.warning("No se pudo eliminar la variante %s: %s", variante.get('public_id'), e)
+
+
+def public_id_desde_url(url):
+    """
+    public_id de una URL de Cloudinary (avatares anteriores a las variantes)
+
+    Returns:
+        str o None si la URL no tiene el formato esperado
+    """
+    m = _RE_PUBLIC_ID_CLOUDINARY.search(url or '')
+    return m.group(1) if m else None
+
+
+def urls_avatar(usuario):
+    """
+    URL de cada variante del avatar, para serializers y respuestas de login
+
+    Los avatares sin variantes (anteriores o subidos directamente a
+    Cloudinary) usan avatar_url en todos los tamaños.
+
+    Returns:
+        dict {'48': url, '128': url, '400': url}, o {} si no hay avatar
+    """
+    if usuario.avatar_variantes:
+        return {lado: variante['url'] for lado, variante in usuario.avatar_variantes.items()}
+    if usuario.avatar_url:
+        return {str(lado): usuario.avatar_url for lado in LADOS_AVATAR}
+    return {}
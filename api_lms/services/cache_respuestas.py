@@ -0,0 +1,76 @@
+# cache_respuestas.py
+# Versiones por modelo para el cache de respuestas de los endpoints de catálogo
+# LMS JC Digital Training
+
+import hashlib
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def cache_compartido():
+    """
+    True si se pueden usar los tokens de versión (CACHE_RESPUESTAS['ACTIVO'])
+
+    Con un cache por proceso (LocMemCache) la invalidación solo llega al
+    worker que atendió la escritura y los demás seguirían entregando datos
+    viejos: los mixins y estructura_curso consultan la BD en su lugar.
+    """
+    return settings.CACHE_RESPUESTAS['ACTIVO']
+
+
+def clave_version_modelo(modelo):
+    return f"version:modelo:{modelo._meta.label_lower}"
+
+
+def versiones_modelos(modelos):
+    """
+    Tokens de versión vigentes de los modelos (se crean los que falten)
+
+    Returns:
+        str con los tokens concatenados, en el orden recibido
+    """
+    claves = [clave_version_modelo(modelo) for modelo in modelos]
+    versiones = cache.get_many(claves)
+
+    faltantes = [clave for clave in claves if clave not in versiones]
+    if faltantes:
+        for clave in faltantes:
+            cache.add(clave, uuid.uuid4().hex[:12], None)
+        versiones.update(cache.get_many(faltantes))
+
+    return '.'.join(versiones.get(clave, '') for clave in claves)
+
+
+def invalidar_modelos(*modelos):
+    """
+    Reemplaza el token de versión de los modelos al confirmar la transacción,
+    con lo que toda respuesta cacheada que dependa de ellos deja de usarse
+    """
+    def reemplazar_versiones():
+        cache.set_many(
+            {clave_version_modelo(modelo): uuid.uuid4().hex[:12] for modelo in modelos},
+            None
+        )
+
+    transaction.on_commit(reemplazar_versiones)
+
+
+def clave_respuesta(request, nombre, alcance, versiones):
+    """
+    Clave de una respuesta cacheada
+
+    Args:
+        request: Request de DRF (se usan host, ruta y parámetros ordenados)
+        nombre: Identificador del endpoint (basename + acción)
+        alcance: Rol, o rol e ID de usuario si los datos dependen del usuario
+        versiones: Tokens retornados por versiones_modelos()
+    """
+    parametros = urlencode(sorted(request.query_params.lists()), doseq=True)
+    firma = hashlib.sha1(
+        f"{request.get_host()}{request.path}?{parametros}".encode()
+    ).hexdigest()
+    return f"respuesta:{nombre}:{alcance}:{firma}:{versiones}"
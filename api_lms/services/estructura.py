@@ -0,0 +1,180 @@
+# estructura.py
+# Árbol módulos → lecciones → materiales de un curso, cacheado por versión
+# LMS JC Digital Training
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+from api_lms.models import Modulo, Leccion, LeccionMaterial, ProgresoLeccion
+from api_lms.services.cache_respuestas import cache_compartido
+
+
+# =====================================================
+# VERSIÓN DEL CURSO
+# =====================================================
+# Cada curso tiene un token de versión en el cache. Las entradas cacheadas
+# incluyen el token en su clave: al cambiar cualquier parte del curso se
+# reemplaza el token (signals) y las entradas anteriores simplemente dejan
+# de leerse hasta expirar. Si el cache pierde el token, se genera uno nuevo
+# y el efecto es el mismo que una invalidación.
+
+def clave_version_curso(curso_id):
+    return f"curso:{curso_id}:version"
+
+
+def version_curso(curso_id):
+    """Token de versión vigente del curso (se crea si no existe)"""
+    clave = clave_version_curso(curso_id)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, uuid.uuid4().hex[:12], None)
+        version = cache.get(clave)
+    return version
+
+
+def invalidar_curso(*cursos_ids):
+    """
+    Cambia la versión de los cursos indicados
+
+    Se ejecuta al confirmar la transacción: antes de eso, otro request
+    podría volver a cachear los datos viejos con la versión nueva.
+    """
+    cursos_ids = {curso_id for curso_id in cursos_ids if curso_id}
+    if not cursos_ids:
+        return
+
+    def reemplazar_versiones():
+        cache.set_many(
+            {clave_version_curso(curso_id): uuid.uuid4().hex[:12] for curso_id in cursos_ids},
+            None
+        )
+
+    transaction.on_commit(reemplazar_versiones)
+
+
+# =====================================================
+# ESTRUCTURA
+# =====================================================
+
+def _consultar_estructura(curso_id, solo_publicado):
+    """
+    Arma el árbol con tres consultas (módulos, lecciones, materiales asignados)
+    """
+    lecciones = Leccion.objects.order_by('orden', 'id')
+    asignaciones = LeccionMaterial.objects.select_related('material').order_by('orden', 'id')
+    modulos = Modulo.objects.filter(curso_id=curso_id).order_by('orden', 'id')
+
+    if solo_publicado:
+        modulos = modulos.filter(publicado=True)
+        lecciones = lecciones.filter(publicado=True)
+        asignaciones = asignaciones.filter(material__estado='aprobado')
+
+    modulos = modulos.prefetch_related(
+        Prefetch(
+            'lecciones',
+            queryset=lecciones.prefetch_related(
+                Prefetch('materiales_asignados', queryset=asignaciones)
+            )
+        )
+    )
+
+    return [
+        {
+            'id': modulo.id,
+            'nombre': modulo.nombre,
+            'orden': modulo.orden,
+            'codigo_modulo': modulo.codigo_modulo,
+            'horas_estimadas': modulo.horas_estimadas,
+            'publicado': modulo.publicado,
+            'lecciones': [
+                {
+                    'id': leccion.id,
+                    'nombre': leccion.nombre,
+                    'orden': leccion.orden,
+                    'tipo': leccion.tipo,
+                    'duracion_minutos': leccion.duracion_minutos,
+                    'obligatoria': leccion.obligatoria,
+                    'publicado': leccion.publicado,
+                    'materiales': [
+                        {
+                            'id': asignacion.id,
+                            'orden': asignacion.orden,
+                            'proposito': asignacion.proposito,
+                            'obligatorio': asignacion.obligatorio,
+                            'material': {
+                                'id': asignacion.material.id,
+                                'nombre': asignacion.material.nombre,
+                                'tipo': asignacion.material.tipo,
+                                'archivo_url': asignacion.material.archivo_url,
+                                'duracion_segundos': asignacion.material.duracion_segundos,
+                                'total_paginas': asignacion.material.total_paginas,
+                                'estado': asignacion.material.estado,
+                            },
+                        }
+                        for asignacion in leccion.materiales_asignados.all()
+                    ],
+                }
+                for leccion in modulo.lecciones.all()
+            ],
+        }
+        for modulo in modulos
+    ]
+
+
+def estructura_curso(curso_id, solo_publicado=True):
+    """
+    Módulos → lecciones → materiales del curso, desde el cache si la
+    versión del curso no cambió
+
+    Args:
+        curso_id: ID del curso
+        solo_publicado: True para estudiantes (solo módulos y lecciones
+            publicados y materiales aprobados)
+
+    Returns:
+        dict con 'version' y 'modulos'. Sin cache compartido (ver
+        cache_compartido) se consulta siempre y la versión es un hash del
+        contenido
+    """
+    if not cache_compartido():
+        modulos = _consultar_estructura(curso_id, solo_publicado)
+        return {
+            'version': hashlib.sha1(repr(modulos).encode()).hexdigest()[:12],
+            'modulos': modulos,
+        }
+
+    version = version_curso(curso_id)
+    variante = 'publicado' if solo_publicado else 'completo'
+    clave = f"curso:{curso_id}:estructura:{variante}:{version}"
+
+    estructura = cache.get(clave)
+    if estructura is None:
+        estructura = {
+            'version': version,
+            'modulos': _consultar_estructura(curso_id, solo_publicado),
+        }
+        cache.set(clave, estructura, settings.ESTRUCTURA_CURSOS['CACHE_TTL'])
+    return estructura
+
+
+def progreso_lecciones(curso_id, usuario):
+    """
+    Estado de cada lección del curso para el usuario (una consulta; no se cachea)
+
+    Returns:
+        dict {leccion_id: {'completada', 'porcentaje_avance', 'ultima_actividad'}}
+    """
+    progresos = ProgresoLeccion.objects.filter(
+        inscripcion__curso_id=curso_id,
+        inscripcion__estudiante=usuario
+    ).values('leccion_id', 'completada', 'porcentaje_avance', 'ultima_actividad')
+
+    return {
+        progreso.pop('leccion_id'): progreso
+        for progreso in progresos
+    }
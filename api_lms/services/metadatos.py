@@ -0,0 +1,338 @@
+# metadatos.py
+# Extracción local de metadatos de archivos (páginas, dimensiones, duración)
+# LMS JC Digital Training
+
+import io
+import logging
+import mmap
+import re
+import struct
+import zipfile
+import zlib
+from contextlib import contextmanager
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def extraer_metadatos(archivo, tipo):
+    """
+    Extrae los metadatos de un archivo leyendo solo sus cabeceras/estructura
+
+    Args:
+        archivo: Ruta local, UploadedFile o file-like binario con seek()
+        tipo: Tipo de material ('pdf', 'video', 'imagen', 'documento', 'presentacion')
+
+    Returns:
+        dict con las claves que apliquen: 'total_paginas', 'duracion_segundos',
+        'metadata'. Nunca lanza excepción: un formato no reconocido o dañado
+        simplemente retorna lo que se pudo extraer.
+    """
+    extractor = EXTRACTORES.get(tipo)
+    if not extractor:
+        return {}
+
+    try:
+        with abrir_binario(archivo) as f:
+            return extractor(f)
+    except Exception as e:
+        logger.warning("No se pudieron extraer metadatos (%s): %s", tipo, e)
+        return {}
+
+
+@contextmanager
+def abrir_binario(archivo):
+    """Entrega un file-like binario; los UploadedFile quedan rebobinados"""
+    if isinstance(archivo, str):
+        with open(archivo, 'rb') as f:
+            yield f
+    elif hasattr(archivo, 'temporary_file_path'):
+        with open(archivo.temporary_file_path(), 'rb') as f:
+            yield f
+    else:
+        archivo.seek(0)
+        try:
+            yield archivo
+        finally:
+            archivo.seek(0)
+
+
+@contextmanager
+def _leer_completo(f):
+    """mmap si el archivo está en disco (no se copia a memoria); read() si no"""
+    try:
+        mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, io.UnsupportedOperation, OSError, ValueError):
+        f.seek(0)
+        yield f.read()
+        return
+
+    try:
+        yield mapa
+    finally:
+        mapa.close()
+
+
+# =====================================================
+# PDF
+# =====================================================
+# El total de páginas es el /Count del nodo raíz del árbol de páginas:
+# /Root del último trailer (clásico o dentro de un /XRef stream) apunta al
+# catálogo y su /Pages a ese nodo. En PDF 1.5+ los objetos suelen venir
+# comprimidos dentro de object streams (/ObjStm).
+#
+# Los objetos se indexan por número sin leer la tabla xref: con
+# actualizaciones incrementales gana la última definición en el archivo.
+# Si la raíz no se puede resolver (trailer dañado o ausente) se usa el
+# mayor /Count entre los nodos /Type /Pages, que puede sobrestimar el
+# total si una revisión posterior eliminó páginas.
+
+_RE_OBJETO = re.compile(rb'(\d+)\s+\d+\s+obj\b(.*?)endobj', re.S)
+_RE_TRAILER = re.compile(rb'trailer(.*?)startxref', re.S)
+_RE_TIPO_PAGES = re.compile(rb'/Type\s*/Pages(?![A-Za-z])')
+_RE_TIPO_OBJSTM = re.compile(rb'/Type\s*/ObjStm(?![A-Za-z])')
+_RE_TIPO_XREF = re.compile(rb'/Type\s*/XRef(?![A-Za-z])')
+_RE_ROOT = re.compile(rb'/Root\s+(\d+)\s+\d+\s+R')
+_RE_REF_PAGES = re.compile(rb'/Pages\s+(\d+)\s+\d+\s+R')
+_RE_COUNT = re.compile(rb'/Count\s+(\d+)')
+_RE_FIRST = re.compile(rb'/First\s+(\d+)')
+_RE_INICIO_STREAM = re.compile(rb'stream\r?\n')
+
+# Tope de bytes descomprimidos por /ObjStm: un stream de pocos KB puede
+# inflarse a GB (zip bomb); uno legítimo rara vez pasa de unos cientos de KB
+MAX_BYTES_OBJSTM = 8 * 1024 * 1024
+
+
+def _conteo_pages(diccionario):
+    if diccionario is not None and _RE_TIPO_PAGES.search(diccionario):
+        m = _RE_COUNT.search(diccionario)
+        if m:
+            return int(m.group(1))
+    return None
+
+
+def _objetos_comprimidos(cuerpo):
+    """
+    Objetos contenidos en un /ObjStm comprimido con FlateDecode
+
+    Returns:
+        dict {número de objeto: bytes}; vacío si el stream está dañado o
+        supera MAX_BYTES_OBJSTM al descomprimirse
+    """
+    diccionario = cuerpo.split(b'stream', 1)[0]
+    m_first = _RE_FIRST.search(diccionario)
+    if b'/FlateDecode' not in diccionario or not m_first:
+        return {}
+
+    m_stream = _RE_INICIO_STREAM.search(cuerpo)
+    if m_stream is None:
+        return {}  # stream mal formado: se omite este objeto, no el PDF
+
+    fin = cuerpo.rfind(b'endstream')
+    descompresor = zlib.decompressobj()
+    try:
+        datos = descompresor.decompress(cuerpo[m_stream.end():fin], MAX_BYTES_OBJSTM)
+    except zlib.error:
+        return {}
+    if descompresor.unconsumed_tail:
+        logger.warning("Object stream de PDF omitido: supera %s bytes descomprimido", MAX_BYTES_OBJSTM)
+        return {}
+
+    first = int(m_first.group(1))
+    try:
+        cabecera = [int(n) for n in datos[:first].split()]
+    except ValueError:
+        return {}
+    numeros = cabecera[0::2]
+    offsets = [first + off for off in cabecera[1::2]] + [len(datos)]
+    return {numeros[i]: datos[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)}
+
+
+def _paginas_pdf(f):
+    objetos = {}
+    raices = []  # (posición, número del catálogo) de cada trailer
+
+    with _leer_completo(f) as datos:
+        for m in _RE_OBJETO.finditer(datos):
+            cuerpo = m.group(2)
+            diccionario = cuerpo.split(b'stream', 1)[0]
+            if _RE_TIPO_OBJSTM.search(diccionario):
+                objetos.update(_objetos_comprimidos(cuerpo))
+                continue
+            objetos[int(m.group(1))] = diccionario
+            if _RE_TIPO_XREF.search(diccionario):
+                m_root = _RE_ROOT.search(diccionario)
+                if m_root:
+                    raices.append((m.start(), int(m_root.group(1))))
+
+        for m in _RE_TRAILER.finditer(datos):
+            m_root = _RE_ROOT.search(m.group(1))
+            if m_root:
+                raices.append((m.start(), int(m_root.group(1))))
+
+    if raices:
+        catalogo = objetos.get(max(raices)[1])
+        m_pages = _RE_REF_PAGES.search(catalogo) if catalogo is not None else None
+        total = _conteo_pages(objetos.get(int(m_pages.group(1)))) if m_pages else None
+        if total is not None:
+            return {'total_paginas': total}
+
+    conteos = [conteo for conteo in map(_conteo_pages, objetos.values()) if conteo is not None]
+    return {'total_paginas': max(conteos)} if conteos else {}
+
+
+# =====================================================
+# IMÁGENES Y DOCUMENTOS OFFICE
+# =====================================================
+
+def _metadatos_imagen(f):
+    # Image.open solo lee la cabecera; los píxeles no se decodifican
+    with Image.open(f) as imagen:
+        return {
+            'metadata': {
+                'ancho': imagen.width,
+                'alto': imagen.height,
+                'formato': imagen.format,
+            }
+        }
+
+
+_RE_PAGINAS_OFFICE = re.compile(rb'<(?:\w+:)?(?:Pages|Slides)>(\d+)<')
+
+
+def _paginas_office(f):
+    """Páginas (docx) o diapositivas (pptx) declaradas en docProps/app.xml"""
+    if not zipfile.is_zipfile(f):
+        return {}  # .doc/.ppt binarios o texto plano
+
+    f.seek(0)
+    with zipfile.ZipFile(f) as zip_file:
+        try:
+            app = zip_file.read('docProps/app.xml')
+        except KeyError:
+            return {}
+
+    m = _RE_PAGINAS_OFFICE.search(app)
+    return {'total_paginas': int(m.group(1))} if m else {}
+
+
+# =====================================================
+# VIDEO (cabeceras de contenedor)
+# =====================================================
+
+def _cajas_mp4(f, inicio, fin):
+    """Itera las cajas ISO BMFF entre inicio y fin: (tipo, inicio_datos, fin_caja)"""
+    posicion = inicio
+    while fin is None or posicion + 8 <= fin:
+        f.seek(posicion)
+        cabecera = f.read(8)
+        if len(cabecera) < 8:
+            return
+
+        largo, tipo = struct.unpack('>I4s', cabecera)
+        largo_cabecera = 8
+        if largo == 1:
+            largo = struct.unpack('>Q', f.read(8))[0]
+            largo_cabecera = 16
+        elif largo == 0:
+            # La caja se extiende hasta el final del archivo
+            yield tipo, posicion + largo_cabecera, fin
+            return
+
+        if largo < largo_cabecera:
+            return
+        yield tipo, posicion + largo_cabecera, posicion + largo
+        posicion += largo
+
+
+def _duracion_mp4(f):
+    for tipo, inicio, fin in _cajas_mp4(f, 0, None):
+        if tipo != b'moov':
+            continue  # mdat se salta con un seek, sin leerlo
+        for subtipo, sub_inicio, _ in _cajas_mp4(f, inicio, fin):
+            if subtipo == b'mvhd':
+                f.seek(sub_inicio)
+                version = f.read(4)[0]
+                if version == 1:
+                    f.seek(16, io.SEEK_CUR)
+                    escala, duracion = struct.unpack('>IQ', f.read(12))
+                else:
+                    f.seek(8, io.SEEK_CUR)
+                    escala, duracion = struct.unpack('>II', f.read(8))
+                return duracion / escala if escala else None
+        return None
+    return None
+
+
+def _duracion_avi(f):
+    """Duración desde avih (LIST hdrl): microsegundos por frame × frames totales"""
+    f.seek(12)
+    while True:
+        cabecera = f.read(8)
+        if len(cabecera) < 8:
+            return None
+        fourcc, largo = struct.unpack('<4sI', cabecera)
+        relleno = largo & 1
+
+        if fourcc == b'LIST' and f.read(4) == b'hdrl':
+            sub_fourcc, sub_largo = struct.unpack('<4sI', f.read(8))
+            if sub_fourcc != b'avih':
+                return None
+            avih = f.read(min(sub_largo, 56))
+            microseg_por_frame = struct.unpack_from('<I', avih, 0)[0]
+            total_frames = struct.unpack_from('<I', avih, 16)[0]
+            return microseg_por_frame * total_frames / 1_000_000
+
+        saltar = largo - 4 if fourcc == b'LIST' else largo
+        f.seek(saltar + relleno, io.SEEK_CUR)
+
+
+_GUID_ASF_HEADER = bytes.fromhex('3026B2758E66CF11A6D900AA0062CE6C')
+_GUID_ASF_FILE_PROPERTIES = bytes.fromhex('A1DCAB8C47A9CF118EE400C00C205365')
+
+
+def _duracion_asf(f):
+    """Duración (WMV/ASF) desde el File Properties Object de la cabecera"""
+    f.seek(24)
+    total_objetos = struct.unpack('<I', f.read(4))[0]
+    posicion = 30
+
+    for _ in range(total_objetos):
+        f.seek(posicion)
+        guid = f.read(16)
+        largo = struct.unpack('<Q', f.read(8))[0]
+        if guid == _GUID_ASF_FILE_PROPERTIES:
+            datos = f.read(64)
+            duracion = struct.unpack_from('<Q', datos, 40)[0]  # unidades de 100 ns
+            preroll = struct.unpack_from('<Q', datos, 56)[0]  # milisegundos
+            return max(duracion / 10_000_000 - preroll / 1000, 0)
+        if largo < 24:
+            return None
+        posicion += largo
+    return None
+
+
+def _duracion_video(f):
+    cabecera = f.read(16)
+    f.seek(0)
+
+    if cabecera[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'wide', b'skip'):
+        duracion = _duracion_mp4(f)
+    elif cabecera[:4] == b'RIFF' and cabecera[8:12] == b'AVI ':
+        duracion = _duracion_avi(f)
+    elif cabecera == _GUID_ASF_HEADER:
+        duracion = _duracion_asf(f)
+    else:
+        duracion = None
+
+    return {'duracion_segundos': int(round(duracion))} if duracion is not None else {}
+
+
+EXTRACTORES = {
+    'pdf': _paginas_pdf,
+    'video': _duracion_video,
+    'imagen': _metadatos_imagen,
+    'documento': _paginas_office,
+    'presentacion': _paginas_office,
+}
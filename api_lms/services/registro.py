@@ -0,0 +1,256 @@
+# registro.py
+# Alta de usuarios (User + Usuario) en una transacción, individual y masiva
+# LMS JC Digital Training
+
+"""
+Los duplicados (username, email, RUT) los detectan las restricciones
+únicas de la BD y no consultas previas: el INSERT que choca lanza
+IntegrityError y campo_duplicado() lo traduce al campo afectado. Así no
+hay carrera entre la verificación y el INSERT, y el alta completa
+(User, Usuario, ConfiguracionUsuario) se confirma o se descarta entera.
+
+El email es único sin distinguir mayúsculas gracias al índice
+auth_user_email_unico (migración 0011).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from api_lms.models import Usuario, ConfiguracionUsuario, PerfilRelator
+
+INDICE_EMAIL_UNICO = 'auth_user_email_unico'
+
+# (campo, mensaje, fragmentos que identifican la restricción en el error
+# de PostgreSQL o SQLite)
+RESTRICCIONES_UNICAS = (
+    ('username', 'El nombre de usuario ya existe', ('auth_user_username_key', 'auth_user.username')),
+    ('email', 'El email ya está registrado', (INDICE_EMAIL_UNICO,)),
+    ('rut', 'El RUT ya está registrado', ('rut_numero',)),
+)
+
+CAMPOS_OBLIGATORIOS = (
+    'username', 'email', 'rut_numero', 'rut_dv', 'nombres', 'apellido_paterno', 'apellido_materno'
+)
+
+TIPOS_USUARIO = {tipo for tipo, _ in Usuario.TIPO_USUARIO_CHOICES}
+
+
+def campo_duplicado(error):
+    """
+    Campo cuya restricción única violó un INSERT
+
+    Args:
+        error: IntegrityError lanzado al crear el User o el Usuario
+
+    Returns:
+        (campo, mensaje) o (None, None) si no es una restricción conocida
+    """
+    texto = str(error)
+    for campo, mensaje, fragmentos in RESTRICCIONES_UNICAS:
+        if any(fragmento in texto for fragmento in fragmentos):
+            return campo, mensaje
+    return None, None
+
+
+def _perfil_desde_datos(datos, user, tipo_usuario):
+    """
+    Usuario sin guardar con los datos del body de registro
+
+    El tipo de usuario lo decide quien llama, nunca el body: el registro
+    público no debe poder crear administradores ni relatores
+    """
+    return Usuario(
+        user=user,
+        rut_numero=datos.get('rut_numero'),
+        rut_dv=datos.get('rut_dv'),
+        nombres=datos.get('nombres'),
+        apellido_paterno=datos.get('apellido_paterno'),
+        apellido_materno=datos.get('apellido_materno'),
+        tipo_usuario=tipo_usuario,
+        telefono=datos.get('telefono', ''),
+        region=datos.get('region', ''),
+        comuna=datos.get('comuna', ''),
+        nivel_educacional=datos.get('nivel_educacional', ''),
+        profesion=datos.get('profesion', ''),
+        empresa_actual=datos.get('empresa_actual', ''),
+        cargo_actual=datos.get('cargo_actual', ''),
+        activo=True
+    )
+
+
+def registrar_usuario(datos, password):
+    """
+    Crea User y Usuario en una transacción (la configuración la agrega el
+    signal crear_configuracion_usuario dentro de la misma transacción)
+
+    Es el registro público: el usuario siempre es estudiante, aunque el
+    body traiga otro tipo_usuario
+
+    Raises:
+        IntegrityError si el username, email o RUT ya existen
+            (ver campo_duplicado)
+    """
+    with transaction.atomic():
+        user = User.objects.create_user(
+            username=datos.get('username'),
+            email=datos.get('email'),
+            password=password,
+            first_name=datos.get('nombres', ''),
+            last_name=datos.get('apellido_paterno', '')
+        )
+        usuario = _perfil_desde_datos(datos, user, 'estudiante')
+        usuario.save(force_insert=True)
+    return usuario
+
+
+# =====================================================
+# REGISTRO MASIVO (COHORTES CORPORATIVAS)
+# =====================================================
+
+def hashear_passwords(passwords):
+    """
+    Hashea contraseñas en paralelo
+
+    PBKDF2 (hashlib) libera el GIL mientras itera, así que los hilos
+    reparten el costo entre núcleos. None da una contraseña inutilizable
+    (el usuario la define con el flujo de recuperación).
+    """
+    hilos = settings.REGISTRO_MASIVO['HILOS_HASH']
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        return list(pool.map(make_password, passwords))
+
+
+def validar_registros(registros, tipo_usuario):
+    """
+    Valida los registros del lote sin tocar la BD salvo tres consultas IN
+    (usernames, emails y RUTs existentes)
+
+    Returns:
+        list de errores {'indice', 'campo', 'error'} (vacía si todo es válido)
+    """
+    errores = []
+    vistos = {'username': {}, 'email': {}, 'rut': {}}
+
+    for indice, datos in enumerate(registros):
+        if not isinstance(datos, dict):
+            errores.append({'indice': indice, 'campo': None, 'error': 'El registro debe ser un objeto'})
+            continue
+
+        faltantes = [campo for campo in CAMPOS_OBLIGATORIOS if datos.get(campo) in (None, '')]
+        if faltantes:
+            errores.append({
+                'indice': indice, 'campo': faltantes[0],
+                'error': f"Campos obligatorios: {', '.join(faltantes)}"
+            })
+            continue
+
+        if datos.get('tipo_usuario', tipo_usuario) not in TIPOS_USUARIO:
+            errores.append({'indice': indice, 'campo': 'tipo_usuario', 'error': 'Tipo de usuario inválido'})
+
+        try:
+            rut_numero = int(datos['rut_numero'])
+        except (TypeError, ValueError):
+            errores.append({'indice': indice, 'campo': 'rut', 'error': 'RUT inválido'})
+            continue
+
+        if datos.get('password'):
+            try:
+                validate_password(datos['password'])
+            except ValidationError as e:
+                errores.append({'indice': indice, 'campo': 'password', 'error': list(e.messages)})
+
+        # Duplicados dentro del mismo lote
+        claves = {
+            'username': str(datos['username']),
+            'email': str(datos['email']).lower(),
+            'rut': (rut_numero, str(datos['rut_dv']).upper()),
+        }
+        for campo, clave in claves.items():
+            if clave in vistos[campo]:
+                errores.append({
+                    'indice': indice, 'campo': campo,
+                    'error': f'Repetido en el lote (registro {vistos[campo][clave]})'
+                })
+            else:
+                vistos[campo][clave] = indice
+
+    # Duplicados contra la BD: una consulta por restricción para todo el lote
+    existentes = {
+        'username': set(User.objects.filter(
+            username__in=list(vistos['username'])
+        ).values_list('username', flat=True)),
+        'email': set(User.objects.annotate(email_normalizado=Lower('email')).filter(
+            email_normalizado__in=list(vistos['email'])
+        ).values_list('email_normalizado', flat=True)),
+        'rut': {
+            (numero, dv.upper()) for numero, dv in Usuario.objects.filter(
+                rut_numero__in=[numero for numero, _ in vistos['rut']]
+            ).values_list('rut_numero', 'rut_dv')
+        },
+    }
+    mensajes = {campo: mensaje for campo, mensaje, _ in RESTRICCIONES_UNICAS}
+    for campo, indices in vistos.items():
+        for clave, indice in indices.items():
+            if clave in existentes[campo]:
+                errores.append({'indice': indice, 'campo': campo, 'error': mensajes[campo]})
+
+    return sorted(errores, key=lambda error: error['indice'])
+
+
+def registrar_masivo(registros, tipo_usuario='estudiante'):
+    """
+    Crea un lote de usuarios con bulk_create, todo o nada
+
+    Solo para administradores (register_masivo): cada registro puede
+    indicar su tipo_usuario; si no, se usa el del lote.
+
+    Los registros deben venir validados (validar_registros). bulk_create no
+    dispara post_save, así que ConfiguracionUsuario y PerfilRelator se
+    crean aquí igual que en el signal crear_configuracion_usuario.
+
+    Returns:
+        list de Usuario creados (con su user)
+
+    Raises:
+        IntegrityError si otro proceso registró un username/email/RUT del
+            lote entre la validación y el INSERT
+    """
+    batch_size = settings.REGISTRO_MASIVO['BATCH_SIZE']
+    hashes = hashear_passwords([datos.get('password') or None for datos in registros])
+
+    users = [
+        User(
+            username=datos['username'],
+            email=User.objects.normalize_email(datos['email']),
+            password=hash_password,
+            first_name=datos.get('nombres', ''),
+            last_name=datos.get('apellido_paterno', ''),
+        )
+        for datos, hash_password in zip(registros, hashes)
+    ]
+
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=batch_size)
+        usuarios = Usuario.objects.bulk_create(
+            [
+                _perfil_desde_datos(datos, user, datos.get('tipo_usuario', tipo_usuario))
+                for datos, user in zip(registros, users)
+            ],
+            batch_size=batch_size
+        )
+        ConfiguracionUsuario.objects.bulk_create(
+            [ConfiguracionUsuario(usuario=usuario) for usuario in usuarios],
+            batch_size=batch_size
+        )
+        PerfilRelator.objects.bulk_create(
+            [PerfilRelator(usuario=usuario) for usuario in usuarios if usuario.tipo_usuario == 'relator'],
+            batch_size=batch_size
+        )
+    return usuarios
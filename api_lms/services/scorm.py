@@ -0,0 +1,298 @@
+# scorm.py
+# Ingesta de paquetes SCORM: índice del ZIP, manifiesto y entrega de archivos por rango
+# LMS JC Digital Training
+
+import struct
+import zipfile
+import zlib
+
+import requests
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from lxml import etree
+
+from api_lms.models import PaqueteScorm, RecursoScorm, ArchivoScorm
+from api_lms.services.metadatos import abrir_binario
+
+_SALT_LANZAMIENTO = 'api_lms.scorm.lanzamiento'
+_XML_BASE = '{http://www.w3.org/XML/1998/namespace}base'
+
+
+# =====================================================
+# LECTURA DEL PAQUETE
+# =====================================================
+
+def leer_paquete_scorm(origen):
+    """
+    Lee el directorio central del ZIP y el imsmanifest.xml, sin extraer el paquete
+
+    Solo se leen el directorio central, la cabecera local de cada entrada
+    (30 bytes + nombre) y el manifiesto; el resto del contenido no se toca.
+
+    Args:
+        origen: Ruta local, UploadedFile o file-like binario con seek()
+
+    Returns:
+        dict con 'success' y, si es válido, 'manifiesto' y 'archivos'; o 'error'
+    """
+    with abrir_binario(origen) as f:
+        try:
+            zip_file = zipfile.ZipFile(f)
+        except zipfile.BadZipFile:
+            return {'success': False, 'error': 'El archivo no es un ZIP válido'}
+
+        with zip_file:
+            archivos = []
+            for info in zip_file.infolist():
+                if info.is_dir():
+                    continue
+                if info.flag_bits & 0x1:
+                    return {'success': False, 'error': 'El paquete contiene archivos cifrados'}
+                if info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                    return {
+                        'success': False,
+                        'error': f'Compresión no soportada en {info.filename}'
+                    }
+
+                # El offset de los datos depende de la cabecera local, cuyo
+                # campo extra puede diferir del registrado en el directorio central
+                f.seek(info.header_offset)
+                cabecera = f.read(30)
+                if cabecera[:4] != b'PK\x03\x04':
+                    return {'success': False, 'error': f'Cabecera local inválida en {info.filename}'}
+                largo_nombre, largo_extra = struct.unpack('<HH', cabecera[26:30])
+
+                archivos.append({
+                    'ruta': info.filename,
+                    'offset_datos': info.header_offset + 30 + largo_nombre + largo_extra,
+                    'bytes_comprimidos': info.compress_size,
+                    'bytes_descomprimidos': info.file_size,
+                    'metodo_compresion': info.compress_type,
+                    'crc32': info.CRC,
+                })
+
+            try:
+                info_manifiesto = zip_file.getinfo('imsmanifest.xml')
+            except KeyError:
+                return {'success': False, 'error': 'El paquete no contiene imsmanifest.xml en la raíz'}
+
+            if info_manifiesto.file_size > settings.SCORM['MAX_MANIFIESTO']:
+                return {'success': False, 'error': 'imsmanifest.xml excede el tamaño permitido'}
+
+            try:
+                with zip_file.open(info_manifiesto) as manifiesto:
+                    datos_manifiesto = parsear_manifiesto(manifiesto)
+            except etree.XMLSyntaxError as e:
+                return {'success': False, 'error': f'imsmanifest.xml inválido: {e}'}
+
+    return {
+        'success': True,
+        'manifiesto': datos_manifiesto,
+        'archivos': archivos,
+    }
+
+
+def _nombre_local(nodo):
+    return etree.QName(nodo).localname if isinstance(nodo.tag, str) else None
+
+
+def _hijos(nodo, nombre):
+    return [hijo for hijo in nodo if _nombre_local(hijo) == nombre]
+
+
+def _atributo(nodo, nombre):
+    """Atributo por nombre local, sin importar namespace ni mayúsculas (scormtype/scormType)"""
+    for clave, valor in nodo.attrib.items():
+        if etree.QName(clave).localname.lower() == nombre.lower():
+            return valor
+    return ''
+
+
+def _texto(nodo, *ruta):
+    for nombre in ruta:
+        encontrados = _hijos(nodo, nombre)
+        if not encontrados:
+            return ''
+        nodo = encontrados[0]
+    return (nodo.text or '').strip()
+
+
+def parsear_manifiesto(archivo):
+    """
+    Parsea imsmanifest.xml (SCORM 1.2 y 2004)
+
+    Returns:
+        dict con 'identificador', 'version_scorm', 'titulo' y 'recursos'
+        (cada uno con identificador, tipo, href, parametros, titulo, orden)
+    """
+    parser = etree.XMLParser(resolve_entities=False, no_network=True)
+    raiz = etree.parse(archivo, parser).getroot()
+
+    # Ítems de la organización por defecto, en orden de recorrido del árbol
+    titulo = ''
+    items = {}
+    organizaciones = _hijos(raiz, 'organizations')
+    if organizaciones:
+        por_defecto = _atributo(organizaciones[0], 'default')
+        candidatas = _hijos(organizaciones[0], 'organization')
+        organizacion = next(
+            (org for org in candidatas if _atributo(org, 'identifier') == por_defecto),
+            candidatas[0] if candidatas else None
+        )
+        if organizacion is not None:
+            titulo = _texto(organizacion, 'title')
+            orden = 0
+            for item in organizacion.iter():
+                if _nombre_local(item) != 'item':
+                    continue
+                referencia = _atributo(item, 'identifierref')
+                if referencia and referencia not in items:
+                    items[referencia] = {
+                        'titulo': _texto(item, 'title'),
+                        'orden': orden,
+                        'parametros': _atributo(item, 'parameters'),
+                    }
+                orden += 1
+
+    recursos = []
+    for contenedor in _hijos(raiz, 'resources'):
+        base_contenedor = contenedor.get(_XML_BASE, '')
+        for recurso in _hijos(contenedor, 'resource'):
+            identificador = _atributo(recurso, 'identifier')
+            href = _atributo(recurso, 'href')
+            if href:
+                href = base_contenedor + recurso.get(_XML_BASE, '') + href
+            item = items.get(identificador, {})
+            recursos.append({
+                'identificador': identificador[:255],
+                'tipo': 'sco' if _atributo(recurso, 'scormtype').lower() == 'sco' else 'asset',
+                'href': href[:500],
+                'parametros': item.get('parametros', '')[:500],
+                'titulo': item.get('titulo', '')[:300],
+                'orden': item.get('orden'),
+            })
+
+    return {
+        'identificador': _atributo(raiz, 'identifier')[:255],
+        'version_scorm': _texto(raiz, 'metadata', 'schemaversion')[:50],
+        'titulo': titulo[:300],
+        'recursos': recursos,
+    }
+
+
+# =====================================================
+# PERSISTENCIA DEL ÍNDICE
+# =====================================================
+
+def guardar_paquete_scorm(material, datos):
+    """
+    Guarda (o reemplaza) el índice de un paquete leído con leer_paquete_scorm
+
+    Returns:
+        PaqueteScorm
+    """
+    manifiesto = datos['manifiesto']
+
+    with transaction.atomic():
+        PaqueteScorm.objects.filter(material=material).delete()
+        paquete = PaqueteScorm.objects.create(
+            material=material,
+            identificador=manifiesto['identificador'],
+            version_scorm=manifiesto['version_scorm'],
+            titulo=manifiesto['titulo'],
+            estado='indexado',
+            total_archivos=len(datos['archivos']),
+        )
+        RecursoScorm.objects.bulk_create(
+            [RecursoScorm(paquete=paquete, **recurso) for recurso in manifiesto['recursos']],
+            batch_size=500,
+            ignore_conflicts=True,  # identificadores duplicados en manifiestos mal formados
+        )
+        ArchivoScorm.objects.bulk_create(
+            [ArchivoScorm(paquete=paquete, **archivo) for archivo in datos['archivos']],
+            batch_size=1000,
+        )
+
+    return paquete
+
+
+def registrar_error_scorm(material, error):
+    """Deja constancia de un paquete que no se pudo indexar"""
+    with transaction.atomic():
+        PaqueteScorm.objects.filter(material=material).delete()
+        return PaqueteScorm.objects.create(material=material, estado='error', error=error)
+
+
+# =====================================================
+# LANZAMIENTO Y ENTREGA DE ARCHIVOS
+# =====================================================
+# El contenido SCORM se carga en un iframe: el navegador pide los archivos
+# relativos sin cabecera Authorization. Por eso el lanzamiento entrega un
+# token firmado de corta duración que forma parte de la ruta, y todas las
+# URLs relativas del paquete quedan bajo ese mismo prefijo.
+
+def firmar_lanzamiento(paquete_id, usuario_id):
+    """Token de acceso a los archivos de un paquete para un usuario"""
+    return signing.dumps(
+        {'paquete_id': paquete_id, 'usuario_id': usuario_id},
+        salt=_SALT_LANZAMIENTO
+    )
+
+
+def verificar_lanzamiento(token):
+    """Returns: dict con 'paquete_id' y 'usuario_id', o None si es inválido o expiró"""
+    try:
+        return signing.loads(
+            token,
+            salt=_SALT_LANZAMIENTO,
+            max_age=settings.SCORM['TOKEN_EXPIRACION']
+        )
+    except signing.BadSignature:
+        return None
+
+
+def abrir_archivo_scorm(url_paquete, archivo, bloque=64 * 1024):
+    """
+    Pide al almacenamiento solo los bytes de una entrada del paquete
+    (Range) y los descomprime en streaming
+
+    La petición se hace antes de retornar, así los errores de red se
+    reportan al llamador y no a mitad de la respuesta.
+
+    Returns:
+        iterador de bloques de bytes descomprimidos
+
+    Raises:
+        requests.RequestException, IOError
+    """
+    if archivo.bytes_comprimidos == 0:
+        return iter(())
+
+    fin = archivo.offset_datos + archivo.bytes_comprimidos - 1
+    respuesta = requests.get(
+        url_paquete,
+        headers={'Range': f'bytes={archivo.offset_datos}-{fin}'},
+        stream=True,
+        timeout=settings.SCORM['TIMEOUT'],
+    )
+    try:
+        respuesta.raise_for_status()
+        if respuesta.status_code != 206:
+            raise IOError('El almacenamiento no soporta lectura por rangos')
+    except Exception:
+        respuesta.close()
+        raise
+
+    def contenido():
+        descompresor = (
+            zlib.decompressobj(-zlib.MAX_WBITS)
+            if archivo.metodo_compresion == zipfile.ZIP_DEFLATED else None
+        )
+        with respuesta:
+            for datos in respuesta.iter_content(bloque):
+                yield descompresor.decompress(datos) if descompresor else datos
+            if descompresor:
+                yield descompresor.flush()
+
+    return contenido()
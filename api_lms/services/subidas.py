@@ -0,0 +1,343 @@
+# subidas.py
+# Subidas de archivos: streaming por partes, sesiones resumibles y subidas directas firmadas
+# LMS JC Digital Training
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+
+import cloudinary
+import cloudinary.api
+import cloudinary.uploader
+from cloudinary import utils as cloudinary_utils
+from django.conf import settings
+from django.core import signing
+
+_PATRON_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+_SALT_SUBIDA_DIRECTA = 'api_lms.subidas.directa'
+
+# Transformación entrante de avatares (la misma que aplicaba upload_avatar)
+TRANSFORMACION_AVATAR = 'c_fill,g_face,h_400,w_400/q_auto:good'
+
+
+def subir_archivo_streaming(archivo, carpeta, resource_type='auto', nombre_archivo=None, **opciones):
+    """
+    Sube un archivo a Cloudinary en partes de tamaño fijo (upload_large).
+
+    Nunca se carga el archivo completo en memoria: se leen y envían bloques de
+    SUBIDAS['CHUNK_CLOUDINARY'] bytes, por lo que la memoria por subida queda
+    acotada sin importar el tamaño del video.
+
+    Args:
+        archivo: Ruta local o file-like (UploadedFile, archivo abierto)
+        carpeta: Carpeta destino en Cloudinary
+        resource_type: 'auto', 'video', 'image' o 'raw'
+        nombre_archivo: Nombre original (para use_filename)
+
+    Returns:
+        dict con el resultado de Cloudinary
+    """
+    if nombre_archivo is None and hasattr(archivo, 'name'):
+        nombre_archivo = os.path.basename(archivo.name)
+    if nombre_archivo:
+        opciones['filename'] = nombre_archivo
+
+    return cloudinary.uploader.upload_large(
+        archivo,
+        folder=carpeta,
+        resource_type=resource_type,
+        chunk_size=settings.SUBIDAS['CHUNK_CLOUDINARY'],
+        **opciones
+    )
+
+
+def calcular_sha256(archivo, bloque_bytes=1024 * 1024):
+    """
+    SHA-256 del contenido, leído por bloques (memoria constante)
+
+    Args:
+        archivo: Ruta local o UploadedFile; el UploadedFile queda rebobinado
+
+    Returns:
+        str hexadecimal de 64 caracteres
+    """
+    digest = hashlib.sha256()
+
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, 'rb') as f:
+            for bloque in iter(lambda: f.read(bloque_bytes), b''):
+                digest.update(bloque)
+    else:
+        for bloque in archivo.chunks(bloque_bytes):
+            digest.update(bloque)
+        archivo.seek(0)
+
+    return digest.hexdigest()
+
+
+# =====================================================
+# SESIONES DE SUBIDA RESUMIBLE
+# =====================================================
+# Cada sesión son dos archivos en SUBIDAS['DIRECTORIO']:
+#   <upload_id>.json  metadatos (dueño, nombre, tamaño esperado, tipo)
+#   <upload_id>.part  bytes recibidos hasta ahora
+# El offset actual es el tamaño del .part, así que un cliente que pierde la
+# conexión solo consulta la sesión y continúa desde ese byte.
+
+def _directorio():
+    directorio = settings.SUBIDAS['DIRECTORIO']
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+
+def _rutas(upload_id):
+    base = os.path.join(_directorio(), upload_id)
+    return f"{base}.json", f"{base}.part"
+
+
+def ruta_datos_subida(upload_id):
+    """Ruta del archivo con los bytes recibidos de una sesión"""
+    return _rutas(upload_id)[1]
+
+
+def iniciar_subida(usuario_id, nombre_archivo, total_bytes, tipo):
+    """
+    Crea una sesión de subida resumible
+
+    Returns:
+        dict con los metadatos de la sesión
+    """
+    limpiar_subidas_expiradas()
+
+    sesion = {
+        'upload_id': uuid.uuid4().hex,
+        'usuario_id': usuario_id,
+        'nombre_archivo': os.path.basename(nombre_archivo),
+        'total_bytes': total_bytes,
+        'tipo': tipo,
+        'creado': time.time(),
+    }
+    ruta_meta, ruta_datos = _rutas(sesion['upload_id'])
+    open(ruta_datos, 'wb').close()
+    with open(ruta_meta, 'w') as f:
+        json.dump(sesion, f)
+
+    sesion['recibido_bytes'] = 0
+    return sesion
+
+
+def obtener_subida(upload_id, usuario_id):
+    """
+    Retorna la sesión con 'recibido_bytes', o None si no existe,
+    expiró o pertenece a otro usuario
+    """
+    if not _PATRON_UPLOAD_ID.match(upload_id or ''):
+        return None
+
+    ruta_meta, ruta_datos = _rutas(upload_id)
+    try:
+        with open(ruta_meta) as f:
+            sesion = json.load(f)
+        sesion['recibido_bytes'] = os.path.getsize(ruta_datos)
+    except (OSError, ValueError):
+        return None
+
+    if sesion['usuario_id'] != usuario_id:
+        return None
+    if time.time() - sesion['creado'] > settings.SUBIDAS['EXPIRACION']:
+        descartar_subida(upload_id)
+        return None
+
+    return sesion
+
+
+def agregar_chunk(sesion, offset, chunk):
+    """
+    Agrega un chunk a la sesión, escribiéndolo a disco por bloques
+
+    El chunk debe empezar exactamente en el byte recibido hasta ahora; si no
+    (reintento duplicado, chunk fuera de orden) se rechaza y se informa el
+    offset correcto para que el cliente continúe desde ahí.
+
+    Args:
+        sesion: dict retornado por obtener_subida
+        offset: Byte inicial del chunk
+        chunk: UploadedFile con los datos
+
+    Returns:
+        dict con 'success', 'recibido_bytes', 'completo' o 'error'
+    """
+    ruta_datos = ruta_datos_subida(sesion['upload_id'])
+
+    with open(ruta_datos, 'ab') as destino:
+        # Serializar escrituras concurrentes sobre la misma sesión
+        fcntl.flock(destino, fcntl.LOCK_EX)
+        try:
+            recibido = os.fstat(destino.fileno()).st_size
+            if offset != recibido:
+                return {
+                    'success': False,
+                    'error': f'Offset inválido: se esperaba {recibido}',
+                    'recibido_bytes': recibido,
+                }
+            if recibido + chunk.size > sesion['total_bytes']:
+                return {
+                    'success': False,
+                    'error': 'El chunk excede el tamaño declarado del archivo',
+                    'recibido_bytes': recibido,
+                }
+
+            for bloque in chunk.chunks():
+                destino.write(bloque)
+            destino.flush()
+            recibido += chunk.size
+        finally:
+            fcntl.flock(destino, fcntl.LOCK_UN)
+
+    return {
+        'success': True,
+        'recibido_bytes': recibido,
+        'completo': recibido == sesion['total_bytes'],
+    }
+
+
+def descartar_subida(upload_id):
+    """Elimina los archivos de una sesión"""
+    for ruta in _rutas(upload_id):
+        try:
+            os.unlink(ruta)
+        except FileNotFoundError:
+            pass
+
+
+def limpiar_subidas_expiradas():
+    """Elimina las sesiones abandonadas más antiguas que SUBIDAS['EXPIRACION']"""
+    limite = time.time() - settings.SUBIDAS['EXPIRACION']
+    directorio = _directorio()
+
+    for nombre in os.listdir(directorio):
+        upload_id, ext = os.path.splitext(nombre)
+        if ext != '.json' or not _PATRON_UPLOAD_ID.match(upload_id):
+            continue
+        try:
+            if os.path.getmtime(os.path.join(directorio, nombre)) < limite:
+                descartar_subida(upload_id)
+        except OSError:
+            continue
+
+
+# =====================================================
+# SUBIDAS DIRECTAS FIRMADAS (navegador → Cloudinary)
+# =====================================================
+# El servidor solo firma los parámetros; los bytes van directo del navegador
+# a Cloudinary. La carpeta, el public_id y los formatos permitidos quedan
+# dentro de la firma, así que el cliente no puede cambiarlos. El tamaño no es
+# firmable en la API de subida: se verifica al completar contra los datos
+# reales del recurso, y si excede el límite el recurso se elimina.
+
+def configuracion_subida(tipo):
+    """Configuración de CLOUDINARY_SETTINGS para un tipo de material o 'avatar'"""
+    if tipo == 'avatar':
+        return settings.CLOUDINARY_SETTINGS['avatares']
+    return settings.CLOUDINARY_SETTINGS['materiales'].get(tipo)
+
+
+def generar_firma_subida(usuario_id, tipo):
+    """
+    Genera los parámetros firmados para una subida directa a Cloudinary
+
+    Args:
+        usuario_id: ID del Usuario que sube
+        tipo: Tipo de material o 'avatar'
+
+    Returns:
+        dict con 'upload_url', 'params' (a enviar tal cual en el POST
+        multipart junto al archivo), límites y 'token' para completar
+    """
+    config = configuracion_subida(tipo)
+    credenciales = cloudinary.config()
+    expiracion = settings.SUBIDAS['FIRMA_EXPIRACION']
+
+    params = {
+        'timestamp': int(time.time()),
+        'folder': config['folder'],
+        'public_id': uuid.uuid4().hex,
+        'allowed_formats': ','.join(ext.lstrip('.') for ext in config['extensions']),
+    }
+    if tipo == 'avatar':
+        params['transformation'] = TRANSFORMACION_AVATAR
+
+    params['signature'] = cloudinary_utils.api_sign_request(params, credenciales.api_secret)
+    params['api_key'] = credenciales.api_key
+
+    token = signing.dumps(
+        {
+            'usuario_id': usuario_id,
+            'tipo': tipo,
+            'public_id': f"{config['folder']}/{params['public_id']}",
+        },
+        salt=_SALT_SUBIDA_DIRECTA,
+        compress=True
+    )
+
+    return {
+        'upload_url': cloudinary_utils.cloudinary_api_url('upload', resource_type='auto'),
+        'params': params,
+        'max_bytes': config['max_size'],
+        'extensiones': config['extensions'],
+        'expira_en': expiracion,
+        'token': token,
+    }
+
+
+def verificar_subida_directa(usuario_id, token, public_id, version, firma_respuesta, resource_type):
+    """
+    Verifica una subida directa antes de registrarla
+
+    Comprueba el token emitido por generar_firma_subida, la firma de la
+    respuesta de Cloudinary (prueba que el recurso existe y no fue inventado
+    por el cliente) y el tamaño/formato reales del recurso.
+
+    Returns:
+        dict con 'success' y, si es válida, 'tipo' y 'upload_result'
+        (formato de cloudinary.uploader.upload); o 'error'
+    """
+    try:
+        datos = signing.loads(
+            token,
+            salt=_SALT_SUBIDA_DIRECTA,
+            max_age=settings.SUBIDAS['FIRMA_EXPIRACION']
+        )
+    except signing.SignatureExpired:
+        return {'success': False, 'error': 'La autorización de subida expiró'}
+    except signing.BadSignature:
+        return {'success': False, 'error': 'Token de subida inválido'}
+
+    if datos['usuario_id'] != usuario_id or datos['public_id'] != public_id:
+        return {'success': False, 'error': 'El token no corresponde a esta subida'}
+
+    if resource_type not in ('image', 'video', 'raw'):
+        return {'success': False, 'error': 'resource_type inválido'}
+
+    if not cloudinary_utils.verify_api_response_signature(public_id, version, firma_respuesta):
+        return {'success': False, 'error': 'Firma de respuesta de Cloudinary inválida'}
+
+    recurso = cloudinary.api.resource(public_id, resource_type=resource_type)
+    config = configuracion_subida(datos['tipo'])
+
+    error = None
+    if recurso['bytes'] > config['max_size']:
+        max_mb = config['max_size'] / (1024 * 1024)
+        error = f"El archivo excede el tamaño máximo de {max_mb:.0f} MB"
+    elif recurso.get('format') and f".{recurso['format'].lower()}" not in config['extensions']:
+        error = f"Extensión no permitida. Use: {', '.join(config['extensions'])}"
+
+    if error:
+        cloudinary.uploader.destroy(public_id, resource_type=resource_type)
+        return {'success': False, 'error': error}
+
+    return {'success': True, 'tipo': datos['tipo'], 'upload_result': recurso}
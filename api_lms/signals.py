@@ -2,9 +2,16 @@
 # Signals para generación automática de notificaciones
 # LMS JC Digital Training
 
-from django.db.models.signals import post_save, pre_save
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from api_lms.models import Material, ForoRespuesta, IntentoEvaluacion, Inscripcion
+from api_lms.models import (
+    Material, ForoRespuesta, IntentoEvaluacion, Inscripcion,
+    Curso, Modulo, Leccion, LeccionMaterial,
+    CodigoSence, CursoRelator, Encuesta, Usuario,
+)
+from api_lms.services.cache_respuestas import invalidar_modelos
+from api_lms.services.estructura import invalidar_curso
 from .notificaciones_utils import (
     notificar_material_subido,
     notificar_material_aprobado,
@@ -94,8 +101,6 @@ def notificar_respuesta_foro(sender, instance, created, **kwargs):
         if consulta.estudiante != instance.autor:
             notificar_mensaje_foro(consulta, instance)
 
-from api_lms.models import IntentoEvaluacion, Inscripcion
-
 
 @receiver(post_save, sender=IntentoEvaluacion)
 def notificar_intento_completado(sender, instance, created, **kwargs):
@@ -157,4 +162,104 @@ def notificar_cambio_estado_inscripcion(sender, instance, created, **kwargs):
         notificar_curso_completado(instance)
         delattr(instance, '_notificar_completado')
     else:
-        print("✗ No notificar")
\ No newline at end of file
+        print("✗ No notificar")
+
+# =====================================================
+# INVALIDACIÓN DE LA ESTRUCTURA CACHEADA DE CURSOS
+# =====================================================
+
+
+@receiver(post_save, sender=Curso)
+def invalidar_estructura_curso(sender, instance, **kwargs):
+    invalidar_curso(instance.pk)
+
+
+@receiver(post_save, sender=Modulo)
+@receiver(post_delete, sender=Modulo)
+def invalidar_estructura_modulo(sender, instance, **kwargs):
+    invalidar_curso(instance.curso_id)
+
+
+@receiver(post_save, sender=Leccion)
+@receiver(post_delete, sender=Leccion)
+def invalidar_estructura_leccion(sender, instance, **kwargs):
+    invalidar_curso(*Modulo.objects.filter(pk=instance.modulo_id).values_list('curso_id', flat=True))
+
+
+@receiver(post_save, sender=LeccionMaterial)
+@receiver(post_delete, sender=LeccionMaterial)
+def invalidar_estructura_leccion_material(sender, instance, **kwargs):
+    invalidar_curso(*Leccion.objects.filter(pk=instance.leccion_id).values_list('modulo__curso_id', flat=True))
+
+
+@receiver(post_save, sender=Material)
+def invalidar_estructura_material(sender, instance, created, **kwargs):
+    """Nombre, URL o estado del material aparecen en la estructura de los cursos que lo usan"""
+    if created:
+        return
+    invalidar_curso(*LeccionMaterial.objects.filter(material=instance).values_list(
+        'leccion__modulo__curso_id', flat=True
+    ).distinct())
+
+
+# =====================================================
+# INVALIDACIÓN DEL CACHE DE RESPUESTAS DE CATÁLOGO
+# =====================================================
+
+# Modelos usados en cache_modelos de los ViewSets con RespuestaCacheadaMixin.
+# Usuario y User se versionan aparte (ver más abajo)
+MODELOS_VERSIONADOS = (
+    Curso, Modulo, Leccion, CursoRelator, CodigoSence, Encuesta,
+)
+
+# Datos de Usuario que muestra el catálogo (relator_nombre en CursoSerializer)
+CAMPOS_NOMBRE_USUARIO = ('nombres', 'apellido_paterno', 'apellido_materno')
+
+
+def invalidar_respuestas_modelo(sender, **kwargs):
+    invalidar_modelos(sender)
+
+
+for modelo in MODELOS_VERSIONADOS:
+    post_save.connect(invalidar_respuestas_modelo, sender=modelo, dispatch_uid=f'cache_respuestas_{modelo.__name__}')
+    post_delete.connect(invalidar_respuestas_modelo, sender=modelo, dispatch_uid=f'cache_respuestas_{modelo.__name__}')
+
+
+@receiver(pre_save, sender=Usuario)
+def detectar_cambio_nombre_relator(sender, instance, update_fields=None, **kwargs):
+    """
+    Cada guardado de Usuario cambia ultima_actualizacion; solo el nombre de
+    un relator aparece en el catálogo de cursos, así que solo eso lo invalida
+    """
+    instance._nombre_relator_cambiado = False
+    if instance.pk is None:
+        return  # un usuario nuevo aún no está asignado a cursos
+    if update_fields is not None and not set(update_fields) & set(CAMPOS_NOMBRE_USUARIO):
+        return
+
+    anterior = Usuario.objects.filter(
+        pk=instance.pk, tipo_usuario='relator'
+    ).values(*CAMPOS_NOMBRE_USUARIO).first()
+    if anterior is None and instance.tipo_usuario != 'relator':
+        return
+    instance._nombre_relator_cambiado = anterior is None or any(
+        anterior[campo] != getattr(instance, campo) for campo in CAMPOS_NOMBRE_USUARIO
+    )
+
+
+@receiver(post_save, sender=Usuario)
+def invalidar_catalogo_nombre_relator(sender, instance, **kwargs):
+    if getattr(instance, '_nombre_relator_cambiado', False):
+        invalidar_modelos(Usuario)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_respuestas_user(sender, instance, update_fields=None, **kwargs):
+    """
+    El User va anidado en UsuarioSerializer; el último login (que se guarda
+    en cada autenticación) no se muestra, así que no invalida
+    """
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidar_modelos(User)
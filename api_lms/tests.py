@@ -1,3 +1,807 @@
-from django.test import TestCase
+# tests.py
+# Pruebas de la API
+# LMS JC Digital Training
 
-# Create your tests here.
+import datetime
+import io
+import uuid
+import zlib
+from decimal import Decimal
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.exceptions import AuthenticationFailed, ParseError
+from rest_framework.generics import GenericAPIView
+from rest_framework.renderers import JSONRenderer
+
+from api_lms.auth_views import CustomTokenObtainPairSerializer
+from api_lms.authentication import UsuarioToken
+from api_lms.instrumentacion import presupuesto_consultas
+from api_lms.mixins import RespuestaCacheadaMixin
+from api_lms.models import (
+    ArchivoScorm, CodigoSence, Curso, CursoRelator, DiplomaJob, Inscripcion, Leccion, LeccionMaterial, Material,
+    Modulo, PaqueteScorm, Usuario,
+)
+from api_lms.renderers import ORJSONParser, ORJSONRenderer
+from api_lms.services.metadatos import extraer_metadatos
+from api_lms.services.registro import INDICE_EMAIL_UNICO, campo_duplicado
+from api_lms.services.scorm import firmar_lanzamiento
+from api_lms.views import CursoViewSet, InscripcionViewSet, ModuloViewSet
+
+
+# =====================================================
+# RENDERER JSON (PARIDAD CON DRF)
+# =====================================================
+
+class ORJSONRendererTests(SimpleTestCase):
+    """ORJSONRenderer debe producir los mismos bytes que JSONRenderer de DRF"""
+
+    def assertMismaSalida(self, datos):
+        self.assertEqual(ORJSONRenderer().render(datos), JSONRenderer().render(datos))
+
+    def test_decimal_sin_serializar_como_float(self):
+        self.assertMismaSalida({'nota': Decimal('1.50'), 'notas': [Decimal('6.25'), Decimal('0')]})
+        self.assertEqual(ORJSONRenderer().render({'nota': Decimal('1.50')}), b'{"nota":1.5}')
+
+    def test_decimal_ya_serializado_se_mantiene(self):
+        # DecimalField entrega texto (COERCE_DECIMAL_TO_STRING): no se toca
+        self.assertMismaSalida({'nota_aprobacion': '4.00'})
+
+    def test_fechas_sin_serializar(self):
+        utc = datetime.datetime(2025, 3, 1, 13, 0, 0, 123456, tzinfo=datetime.timezone.utc)
+        self.assertMismaSalida({
+            'utc': utc,
+            'santiago': utc.astimezone(ZoneInfo('America/Santiago')),
+            'ingenua': datetime.datetime(2025, 3, 1, 10, 0),
+            'fecha': datetime.date(2025, 3, 1),
+            'hora': datetime.time(10, 30, 15),
+            'duracion': datetime.timedelta(minutes=90),
+        })
+        self.assertEqual(ORJSONRenderer().render({'utc': utc}), b'{"utc":"2025-03-01T13:00:00.123456Z"}')
+
+    def test_otros_tipos(self):
+        self.assertMismaSalida({
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'texto': gettext_lazy('Curso'),
+            'bytes': b'abc',
+            'tupla': (1, 2),
+            'anidado': {'lista': [{'a': None, 'b': True, 'c': 1.25}]},
+        })
+
+    def test_unicode_y_separadores_js(self):
+        self.assertMismaSalida({'nombre': 'Módulo ñandú', 'texto': 'línea otra fin'})
+
+    def test_none_es_cuerpo_vacio(self):
+        self.assertEqual(ORJSONRenderer().render(None), JSONRenderer().render(None))
+
+    def test_indentacion(self):
+        contenido = ORJSONRenderer().render({'a': [1]}, renderer_context={'indent': 2})
+        self.assertEqual(contenido, b'{\n  "a": [\n    1\n  ]\n}')
+
+
+class ORJSONParserTests(SimpleTestCase):
+
+    def test_parse(self):
+        self.assertEqual(ORJSONParser().parse(io.BytesIO(b'{"a":[1,"\xc3\xb1"]}')), {'a': [1, 'ñ']})
+
+    def test_rechaza_json_invalido(self):
+        for cuerpo in (b'{"a":', b'{"a":NaN}'):
+            with self.assertRaises(ParseError):
+                ORJSONParser().parse(io.BytesIO(cuerpo))
+
+
+# =====================================================
+# CURSOS: PRESUPUESTOS DE CONSULTAS Y CACHE DE RESPUESTAS
+# =====================================================
+
+def crear_usuario(numero, tipo_usuario):
+    user = User.objects.create_user(f'usuario{numero}', f'usuario{numero}@ejemplo.cl', 'clave-prueba')
+    return Usuario.objects.create(
+        user=user, rut_numero=10000000 + numero, rut_dv='K', nombres=f'Nombre {numero}',
+        apellido_paterno='Paterno', apellido_materno='Materno', tipo_usuario=tipo_usuario
+    )
+
+
+class CursosTestCase(TestCase):
+    """Administrador, relator, estudiantes y tres cursos con módulos, lecciones e inscripciones"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.administrador = crear_usuario(1, 'administrador')
+        cls.relator = crear_usuario(2, 'relator')
+        cls.estudiantes = [crear_usuario(numero, 'estudiante') for numero in range(10, 16)]
+        cls.codigo_sence = CodigoSence.objects.create(
+            codigo='1237654321', nombre_curso='Curso SENCE', horas_totales=20,
+            fecha_inicio_vigencia=datetime.date(2025, 1, 1), fecha_fin_vigencia=datetime.date(2030, 1, 1)
+        )
+        cls.cursos = [cls.crear_curso(numero) for numero in range(3)]
+
+    @classmethod
+    def crear_curso(cls, numero):
+        curso = Curso.objects.create(
+            nombre=f'Curso {numero}', codigo_sence=cls.codigo_sence, codigo_sence_curso=f'SC-{numero}',
+            horas_totales=20, cupo_maximo=30, creado_por=cls.administrador
+        )
+        CursoRelator.objects.create(curso=curso, relator=cls.relator)
+        for orden in range(3):
+            modulo = Modulo.objects.create(curso=curso, nombre=f'Módulo {orden}', orden=orden, horas_estimadas=2)
+            for orden_leccion in range(3):
+                Leccion.objects.create(
+                    modulo=modulo, nombre=f'Lección {orden_leccion}', orden=orden_leccion, duracion_minutos=15
+                )
+        for estudiante in cls.estudiantes:
+            Inscripcion.objects.create(curso=curso, estudiante=estudiante)
+        return curso
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, usuario, url):
+        token = CustomTokenObtainPairSerializer.get_token(usuario.user).access_token
+        return self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+
+@override_settings(CACHE_RESPUESTAS={'TTL': 600, 'ACTIVO': True})
+class PresupuestoConsultasTests(CursosTestCase):
+    """
+    Los endpoints con `presupuesto_consultas` no lo exceden con el cache
+    vacío (peor caso), y sus consultas no crecen con la cantidad de datos
+    """
+
+    def assertDentroDelPresupuesto(self, maximo, usuario, url):
+        """Returns: consultas ejecutadas por el request"""
+        with presupuesto_consultas(maximo) as contexto:
+            response = self.get(usuario, url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(contexto)
+
+    def assertConsultasConstantes(self, maximo, usuario, url):
+        """Mismo número de consultas antes y después de duplicar los cursos"""
+        antes = self.assertDentroDelPresupuesto(maximo, usuario, url)
+        for numero in range(3, 6):
+            self.crear_curso(numero)
+        cache.clear()
+        despues = self.assertDentroDelPresupuesto(maximo, usuario, url)
+        self.assertEqual(antes, despues)
+
+    def test_listado_cursos(self):
+        for usuario in (self.administrador, self.relator, self.estudiantes[0]):
+            with self.subTest(rol=usuario.tipo_usuario):
+                cache.clear()
+                self.assertDentroDelPresupuesto(CursoViewSet.presupuesto_consultas, usuario, '/api/cursos/')
+
+    def test_listado_cursos_no_crece_con_los_datos(self):
+        self.assertConsultasConstantes(CursoViewSet.presupuesto_consultas, self.administrador, '/api/cursos/')
+
+    def test_detalle_curso(self):
+        url = f'/api/cursos/{self.cursos[0].id}/'
+        for usuario in (self.administrador, self.relator, self.estudiantes[0]):
+            with self.subTest(rol=usuario.tipo_usuario):
+                cache.clear()
+                self.assertDentroDelPresupuesto(CursoViewSet.presupuesto_consultas, usuario, url)
+
+    def test_estructura_curso(self):
+        url = f'/api/cursos/{self.cursos[0].id}/estructura/'
+        for usuario in (self.administrador, self.estudiantes[0]):
+            with self.subTest(rol=usuario.tipo_usuario):
+                cache.clear()
+                self.assertDentroDelPresupuesto(CursoViewSet.presupuesto_consultas, usuario, url)
+
+    def test_listado_inscripciones(self):
+        for usuario in (self.administrador, self.relator, self.estudiantes[0]):
+            with self.subTest(rol=usuario.tipo_usuario):
+                self.assertDentroDelPresupuesto(InscripcionViewSet.presupuesto_consultas, usuario, '/api/inscripciones/')
+
+    def test_listado_inscripciones_no_crece_con_los_datos(self):
+        self.assertConsultasConstantes(
+            InscripcionViewSet.presupuesto_consultas, self.administrador, '/api/inscripciones/'
+        )
+
+
+class CacheRespuestasTests(CursosTestCase):
+    """El cache de respuestas y los ETags con tokens solo se usan con cache compartido"""
+
+    @override_settings(CACHE_RESPUESTAS={'TTL': 600, 'ACTIVO': True})
+    def test_cache_compartido(self):
+        self.assertEqual(self.get(self.administrador, '/api/cursos/')['X-Cache'], 'MISS')
+        response = self.get(self.administrador, '/api/cursos/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertIn('ETag', response)
+
+    @override_settings(CACHE_RESPUESTAS={'TTL': 600, 'ACTIVO': False})
+    def test_cache_por_proceso_no_cachea(self):
+        for _ in range(2):
+            response = self.get(self.administrador, '/api/cursos/')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-Cache', response)
+            self.assertNotIn('ETag', response)
+
+    def test_campos_en_vivo_sin_completar_en_vivo(self):
+        with self.assertRaises(ImproperlyConfigured):
+            class SinCompletar(RespuestaCacheadaMixin):
+                campos_en_vivo = ('total_inscritos',)
+
+
+@override_settings(CACHE_RESPUESTAS={'TTL': 600, 'ACTIVO': True})
+class ValidadoresCondicionalesTests(CursosTestCase):
+    """ETag/304 con los filtros del request aplicados una sola vez"""
+
+    def contar_filtrados(self, url):
+        with mock.patch.object(
+            GenericAPIView, 'filter_queryset', autospec=True, side_effect=GenericAPIView.filter_queryset
+        ) as filter_queryset:
+            response = self.get(self.administrador, url)
+        self.assertEqual(response.status_code, 200)
+        return filter_queryset.call_count
+
+    def test_list_filtra_una_vez(self):
+        self.assertEqual(self.contar_filtrados('/api/cursos/?search=Curso'), 1)
+
+    def test_retrieve_filtra_una_vez(self):
+        self.assertEqual(self.contar_filtrados(f'/api/cursos/{self.cursos[0].id}/'), 1)
+
+    def test_if_none_match(self):
+        url = f'/api/cursos/{self.cursos[0].id}/'
+        etag = self.get(self.administrador, url)['ETag']
+        token = CustomTokenObtainPairSerializer.get_token(self.administrador.user).access_token
+
+        response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class CamposParcialesTests(CursosTestCase):
+    """?fields= y ?expand= (definidos en filters.py) en el listado de inscripciones"""
+
+    def primera(self, parametros):
+        response = self.get(self.administrador, f'/api/inscripciones/{parametros}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'][0]
+
+    def test_listado_resumido(self):
+        self.assertNotIn('modulos', self.primera('')['curso_data'])
+
+    def test_expand_entrega_la_relacion_completa(self):
+        self.assertIn('modulos', self.primera('?expand=curso_data')['curso_data'])
+
+    def test_expand_se_suma_a_fields(self):
+        inscripcion = self.primera('?fields=id&expand=curso_data')
+        self.assertEqual(set(inscripcion), {'id', 'curso_data'})
+        self.assertIn('modulos', inscripcion['curso_data'])
+
+    def test_fields_sin_expand(self):
+        self.assertEqual(set(self.primera('?fields=id,curso')), {'id', 'curso'})
+
+
+# =====================================================
+# AUTORIZACIÓN POR ROL (PermisoPorRol / permisos_vista)
+# =====================================================
+
+class AutorizacionPorRolTests(CursosTestCase):
+    """
+    Matriz rol × acción: anónimos reciben 401, los roles sin permiso 403.
+    Con permiso basta que la respuesta no sea 401/403 (un 400 por datos
+    incompletos significa que la autorización pasó).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.estudiante = cls.estudiantes[0]
+        cls.material = Material.objects.create(
+            nombre='Guía', tipo='pdf', subido_por=cls.relator, relator_autor=cls.relator, estado='pendiente'
+        )
+
+    def peticion(self, metodo, usuario, url, datos=None):
+        extra = {'HTTP_AUTHORIZATION': token_acceso(usuario)} if usuario else {}
+        return getattr(self.client, metodo)(url, datos, content_type='application/json', **extra).status_code
+
+    def assertMatriz(self, metodo, url, permitidos, datos=None):
+        """permitidos: roles que pasan la autorización; el resto debe recibir 403 y los anónimos 401"""
+        self.assertEqual(self.peticion(metodo, None, url, datos), 401, f'anónimo {metodo} {url}')
+        for usuario in (self.administrador, self.relator, self.estudiante):
+            estado = self.peticion(metodo, usuario, url, datos)
+            with self.subTest(metodo=metodo, url=url, rol=usuario.tipo_usuario):
+                if usuario.tipo_usuario in permitidos:
+                    self.assertNotIn(estado, (401, 403))
+                else:
+                    self.assertEqual(estado, 403)
+
+    def test_cursos(self):
+        todos = ('administrador', 'relator', 'estudiante')
+        curso = f'/api/cursos/{self.cursos[0].id}/'
+        self.assertMatriz('get', '/api/cursos/', todos)
+        self.assertMatriz('get', curso, todos)
+        self.assertMatriz('post', '/api/cursos/', ('administrador',), {})
+        self.assertMatriz('patch', curso, ('administrador',), {})
+        self.assertMatriz('delete', f'/api/cursos/{self.cursos[2].id}/', ('administrador',))
+
+    def test_inscripciones(self):
+        self.assertMatriz('get', '/api/inscripciones/', ('administrador', 'relator', 'estudiante'))
+        self.assertMatriz('post', '/api/inscripciones/', ('administrador',), {})
+        inscripcion = Inscripcion.objects.filter(estudiante=self.estudiante).first()
+        self.assertMatriz('delete', f'/api/inscripciones/{inscripcion.id}/', ('administrador',))
+
+    def test_estudiante_solo_ve_sus_inscripciones(self):
+        response = self.client.get('/api/inscripciones/', HTTP_AUTHORIZATION=token_acceso(self.estudiante))
+        ids = {inscripcion['estudiante'] for inscripcion in response.json()['results']}
+        self.assertEqual(ids, {self.estudiante.id})
+
+    def test_aprobar_material(self):
+        url = f'/api/materiales/{self.material.id}/aprobar/'
+        self.assertMatriz('post', url, ('administrador',))
+        self.material.refresh_from_db()
+        self.assertEqual(self.material.estado, 'aprobado')
+
+    def test_subida_de_materiales(self):
+        self.assertMatriz('post', '/api/upload/material/', ('administrador', 'relator'), {})
+        self.assertMatriz('post', '/api/upload/material/sesiones/', ('administrador', 'relator'), {})
+        self.assertMatriz('get', '/api/upload/material/sesiones/inexistente/', ('administrador', 'relator'))
+
+    def test_avatar_y_subida_directa(self):
+        todos = ('administrador', 'relator', 'estudiante')
+        self.assertMatriz('post', '/api/upload/avatar/', todos, {})
+        self.assertMatriz('post', '/api/upload/directa/completar/', todos, {})
+        # El estudiante puede firmar avatares pero no materiales
+        self.assertEqual(
+            self.peticion('post', self.estudiante, '/api/upload/directa/firmar/', {'tipo': 'pdf'}), 403
+        )
+
+    def test_registro_masivo(self):
+        self.assertMatriz('post', '/api/auth/register/masivo/', ('administrador',), {'usuarios': []})
+
+
+# =====================================================
+# OPERACIONES MASIVAS (masivo / reordenar)
+# =====================================================
+
+class OperacionesMasivasTests(CursosTestCase):
+    """OperacionesMasivasMixin sobre /api/modulos/: unicidad de (curso, orden) y todo o nada"""
+
+    def setUp(self):
+        super().setUp()
+        self.curso = self.cursos[0]
+        self.modulos = list(Modulo.objects.filter(curso=self.curso).order_by('orden'))
+
+    def enviar(self, metodo, url, datos):
+        return getattr(self.client, metodo)(
+            url, datos, content_type='application/json', HTTP_AUTHORIZATION=token_acceso(self.administrador)
+        )
+
+    def nuevo_modulo(self, orden):
+        return {'curso': self.curso.id, 'nombre': f'Nuevo {orden}', 'orden': orden, 'horas_estimadas': 1}
+
+    def ordenes(self):
+        return dict(Modulo.objects.filter(curso=self.curso).values_list('id', 'orden'))
+
+    def test_intercambiar_posiciones(self):
+        primero, segundo, _ = self.modulos
+        response = self.enviar('patch', '/api/modulos/masivo/', [
+            {'id': primero.id, 'orden': segundo.orden},
+            {'id': segundo.id, 'orden': primero.orden},
+        ])
+
+        self.assertEqual(response.status_code, 200, response.content)
+        ordenes = self.ordenes()
+        self.assertEqual((ordenes[primero.id], ordenes[segundo.id]), (segundo.orden, primero.orden))
+
+    def test_orden_duplicado_dentro_del_lote(self):
+        response = self.enviar('post', '/api/modulos/masivo/', [self.nuevo_modulo(10), self.nuevo_modulo(10)])
+
+        self.assertEqual(response.status_code, 400)
+        errores = response.json()
+        self.assertEqual(errores[0], {})
+        self.assertIn('non_field_errors', errores[1])
+        self.assertEqual(Modulo.objects.filter(curso=self.curso).count(), 3)
+
+    def test_choque_con_fila_fuera_del_lote(self):
+        response = self.enviar('post', '/api/modulos/masivo/', [self.nuevo_modulo(10), self.nuevo_modulo(1)])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0], {})
+        self.assertIn('non_field_errors', response.json()[1])
+        self.assertEqual(Modulo.objects.filter(curso=self.curso).count(), 3)
+
+    def test_choque_concurrente_devuelve_409(self):
+        # Otra escritura ocupó la posición después de la validación en memoria
+        with mock.patch.object(ModuloViewSet, '_validar_unicidad', return_value=[{}, {}]):
+            response = self.enviar('post', '/api/modulos/masivo/', [self.nuevo_modulo(10), self.nuevo_modulo(1)])
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Modulo.objects.filter(curso=self.curso).count(), 3)
+
+    def test_id_inexistente_no_aplica_ningun_cambio(self):
+        antes = self.ordenes()
+        response = self.enviar('patch', '/api/modulos/masivo/', [
+            {'id': self.modulos[0].id, 'orden': 20},
+            {'id': 999999, 'orden': 21},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[1], {'id': ['Se requiere el ID de un registro existente']})
+        self.assertEqual(self.ordenes(), antes)
+
+    def test_reordenar(self):
+        ids = [modulo.id for modulo in reversed(self.modulos)]
+        response = self.enviar('post', '/api/modulos/reordenar/', {'curso': self.curso.id, 'orden': ids})
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([modulo['id'] for modulo in response.json()], ids)
+        self.assertEqual(self.ordenes(), {pk: posicion for posicion, pk in enumerate(ids, start=1)})
+
+    def test_reordenar_con_lista_parcial(self):
+        antes = self.ordenes()
+        response = self.enviar('post', '/api/modulos/reordenar/', {
+            'curso': self.curso.id, 'orden': [self.modulos[1].id, self.modulos[0].id],
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['ids'], sorted(antes))
+        self.assertEqual(self.ordenes(), antes)
+
+    def test_reordenar_con_ids_repetidos(self):
+        ids = [modulo.id for modulo in self.modulos]
+        response = self.enviar('post', '/api/modulos/reordenar/', {'curso': self.curso.id, 'orden': ids + ids[:1]})
+
+        self.assertEqual(response.status_code, 400)
+
+
+# =====================================================
+# USUARIO DESDE LOS CLAIMS DEL TOKEN
+# =====================================================
+
+class UsuarioTokenTests(TestCase):
+
+    def setUp(self):
+        self.usuario = crear_usuario(1, 'estudiante')
+
+    def token(self, user_id, usuario_id):
+        return UsuarioToken({'user_id': user_id, 'rol': 'estudiante', 'usuario_id': usuario_id})
+
+    def test_delega_al_user_del_perfil(self):
+        token = self.token(self.usuario.user_id, self.usuario.pk)
+        self.assertEqual(token.perfil, self.usuario)
+        self.assertEqual(token.email, self.usuario.user.email)
+
+    def test_perfil_eliminado(self):
+        token = self.token(self.usuario.user_id, self.usuario.pk)
+        self.usuario.delete()
+        self.assertFalse(hasattr(token, 'perfil'))
+        self.assertEqual(token.username, 'usuario1')
+
+    def test_user_eliminado(self):
+        token = self.token(self.usuario.user_id, self.usuario.pk)
+        self.usuario.user.delete()
+        self.assertFalse(hasattr(token, 'perfil'))
+        with self.assertRaises(AuthenticationFailed):
+            token.email
+
+    def test_verify_token_sin_user_es_401(self):
+        access = CustomTokenObtainPairSerializer.get_token(self.usuario.user).access_token
+        self.usuario.user.delete()
+        response = self.client.get('/api/auth/verify/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, 401)
+
+
+# =====================================================
+# SUBIDA DIRECTA A CLOUDINARY
+# =====================================================
+
+def token_acceso(usuario):
+    return f'Bearer {CustomTokenObtainPairSerializer.get_token(usuario.user).access_token}'
+
+
+class SubidaDirectaTests(TestCase):
+
+    def setUp(self):
+        self.relator = crear_usuario(2, 'relator')
+        self.datos = {
+            'token': 't', 'public_id': 'materiales/pdf/abc', 'version': '1',
+            'signature': 'f', 'resource_type': 'raw', 'nombre': 'Guía',
+        }
+
+    def completar(self, tipo='pdf'):
+        verificacion = {
+            'success': True, 'tipo': tipo,
+            'upload_result': {
+                'public_id': 'materiales/pdf/abc', 'secure_url': 'https://res.cloudinary.com/x/raw/upload/abc.pdf',
+                'bytes': 1024, 'format': 'pdf',
+            },
+        }
+        with mock.patch('api_lms.views_upload.verificar_subida_directa', return_value=verificacion):
+            return self.client.post(
+                '/api/upload/directa/completar/', self.datos, HTTP_AUTHORIZATION=token_acceso(self.relator)
+            )
+
+    def test_scorm_no_se_firma(self):
+        response = self.client.post(
+            '/api/upload/directa/firmar/', {'tipo': 'scorm'}, HTTP_AUTHORIZATION=token_acceso(self.relator)
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_scorm_no_se_registra(self):
+        self.assertEqual(self.completar(tipo='scorm').status_code, 400)
+        self.assertFalse(Material.objects.exists())
+
+    def test_token_de_un_solo_uso(self):
+        self.assertEqual(self.completar().status_code, 201)
+        self.assertEqual(self.completar().status_code, 409)
+        self.assertEqual(Material.objects.count(), 1)
+
+
+
+class SubidaAvatarTests(TestCase):
+    """Las dimensiones se verifican antes de decodificar la imagen"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.estudiante = crear_usuario(10, 'estudiante')
+
+    def subir(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), 'white').save(buffer, 'PNG')
+        archivo = SimpleUploadedFile('foto.png', buffer.getvalue(), content_type='image/png')
+        return self.client.post(
+            '/api/upload/avatar/', {'file': archivo}, HTTP_AUTHORIZATION=token_acceso(self.estudiante)
+        )
+
+    def test_imagen_con_demasiados_pixeles(self):
+        with mock.patch('api_lms.services.avatares.MAX_PIXELES_AVATAR', 64 * 64 - 1), \
+                mock.patch('api_lms.views_upload.subir_variantes_avatar') as subir_variantes:
+            response = self.subir()
+
+        self.assertEqual(response.status_code, 400)
+        subir_variantes.assert_not_called()
+
+    def test_imagen_dentro_del_limite(self):
+        variantes = {
+            str(lado): {'url': f'https://cdn/{lado}.webp', 'public_id': f'avatares/{lado}'} for lado in (48, 128, 400)
+        }
+        with mock.patch('api_lms.views_upload.subir_variantes_avatar', return_value=variantes):
+            response = self.subir()
+
+        self.assertEqual(response.status_code, 200, response.content)
+
+# =====================================================
+# DIPLOMAS: ESTADO DE LOS TRABAJOS DE GENERACIÓN
+# =====================================================
+
+class EstadoDiplomaJobTests(CursosTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        inscripcion = Inscripcion.objects.get(curso=cls.cursos[0], estudiante=cls.estudiantes[0])
+        cls.job = DiplomaJob.objects.create(inscripcion=inscripcion, solicitado_por=cls.relator)
+        cls.url = f'/api/diplomas/jobs/{cls.job.id}/'
+
+    def test_visibilidad(self):
+        esperados = (
+            (self.administrador, 200),
+            (self.estudiantes[0], 200),
+            (self.relator, 200),
+            (self.estudiantes[1], 403),
+        )
+        for usuario, estado in esperados:
+            with self.subTest(usuario=usuario.user.username):
+                self.assertEqual(self.get(usuario, self.url).status_code, estado)
+
+    def test_trabajo_inexistente(self):
+        self.assertEqual(self.get(self.administrador, '/api/diplomas/jobs/999999/').status_code, 404)
+
+
+# =====================================================
+# SCORM: ARCHIVOS DEL PAQUETE CON TOKEN DE LANZAMIENTO
+# =====================================================
+
+@mock.patch('api_lms.views_scorm.abrir_archivo_scorm', side_effect=lambda url, archivo: iter([b'<html></html>']))
+class ArchivoScormTests(CursosTestCase):
+    """El token se valida contra el usuario firmado en él, no solo su firma"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        material = Material.objects.create(
+            nombre='Paquete', tipo='scorm', archivo_url='https://cdn/paquete.zip',
+            subido_por=cls.relator, relator_autor=cls.relator, estado='aprobado'
+        )
+        cls.paquete = PaqueteScorm.objects.create(material=material, estado='indexado')
+        ArchivoScorm.objects.create(
+            paquete=cls.paquete, ruta='index.html', offset_datos=0, bytes_comprimidos=13,
+            bytes_descomprimidos=13, metodo_compresion=0, crc32=0
+        )
+        leccion = Leccion.objects.filter(modulo__curso=cls.cursos[0]).first()
+        LeccionMaterial.objects.create(leccion=leccion, material=material, orden=0)
+        cls.ajeno = crear_usuario(40, 'estudiante')
+
+    def abrir(self, usuario):
+        token = firmar_lanzamiento(self.paquete.id, usuario.id)
+        return self.client.get(f'/api/scorm/contenido/{token}/index.html')
+
+    def test_estudiante_inscrito(self, _abrir):
+        response = self.abrir(self.estudiantes[0])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'<html></html>')
+        self.assertEqual(response['Content-Security-Policy'], 'sandbox allow-scripts')
+        self.assertFalse(response.has_header('Content-Length'))
+
+    def test_relator(self, _abrir):
+        self.assertEqual(self.abrir(self.relator).status_code, 200)
+
+    def test_estudiante_no_inscrito(self, _abrir):
+        self.assertEqual(self.abrir(self.ajeno).status_code, 403)
+
+    def test_desinscrito_despues_del_lanzamiento(self, _abrir):
+        token = firmar_lanzamiento(self.paquete.id, self.estudiantes[0].id)
+        Inscripcion.objects.filter(estudiante=self.estudiantes[0]).delete()
+
+        response = self.client.get(f'/api/scorm/contenido/{token}/index.html')
+        self.assertEqual(response.status_code, 403)
+
+    def test_usuario_inactivo(self, _abrir):
+        Usuario.objects.filter(id=self.relator.id).update(activo=False)
+        self.assertEqual(self.abrir(self.relator).status_code, 403)
+
+
+# =====================================================
+# METADATOS: PÁGINAS DE PDF
+# =====================================================
+
+def pdf_con_objetos(*revisiones):
+    """
+    PDF mínimo: cada revisión es (objetos, trailer), objetos un dict
+    {número: cuerpo}. Las revisiones se anexan como actualizaciones
+    incrementales (sin tabla xref válida, que el extractor no lee)
+    """
+    partes = [b'%PDF-1.7\n']
+    for objetos, trailer in revisiones:
+        for numero, cuerpo in objetos.items():
+            partes.append(b'%d 0 obj\n%s\nendobj\n' % (numero, cuerpo))
+        if trailer is not None:
+            partes.append(b'trailer\n%s\nstartxref\n0\n%%%%EOF\n' % trailer)
+    return io.BytesIO(b''.join(partes))
+
+
+def object_stream(objetos):
+    """/ObjStm FlateDecode con los objetos {número: cuerpo}"""
+    cabecera, cuerpo = [], b''
+    for numero, contenido in objetos.items():
+        cabecera.append(b'%d %d' % (numero, len(cuerpo)))
+        cuerpo += contenido + b' '
+    cabecera = b' '.join(cabecera) + b' '
+    datos = zlib.compress(cabecera + cuerpo)
+    return (
+        b'<< /Type /ObjStm /N %d /First %d /Filter /FlateDecode /Length %d >>\nstream\n%s\nendstream'
+        % (len(objetos), len(cabecera), len(datos), datos)
+    )
+
+
+class PaginasPdfTests(SimpleTestCase):
+
+    def test_revision_posterior_que_elimina_paginas(self):
+        archivo = pdf_con_objetos(
+            ({1: b'<< /Type /Catalog /Pages 2 0 R >>', 2: b'<< /Type /Pages /Kids [3 0 R 4 0 R 5 0 R] /Count 3 >>'},
+             b'<< /Root 1 0 R /Size 6 >>'),
+            ({2: b'<< /Type /Pages /Kids [3 0 R 4 0 R] /Count 2 >>'}, b'<< /Root 1 0 R /Size 6 /Prev 0 >>'),
+        )
+        self.assertEqual(extraer_metadatos(archivo, 'pdf'), {'total_paginas': 2})
+
+    def test_raiz_dentro_de_object_stream_y_xref_stream(self):
+        comprimidos = object_stream({
+            1: b'<< /Type /Catalog /Pages 2 0 R >>',
+            2: b'<< /Type /Pages /Kids [4 0 R 5 0 R 6 0 R 7 0 R] /Count 4 >>',
+            8: b'<< /Type /Pages /Parent 2 0 R /Kids [4 0 R] /Count 9 >>',
+        })
+        archivo = pdf_con_objetos(({
+            3: comprimidos,
+            9: b'<< /Type /XRef /Root 1 0 R /Size 10 /Length 0 >>\nstream\n\nendstream',
+        }, None))
+        self.assertEqual(extraer_metadatos(archivo, 'pdf'), {'total_paginas': 4})
+
+    def test_sin_trailer_usa_el_mayor_count(self):
+        archivo = pdf_con_objetos(({
+            2: b'<< /Type /Pages /Kids [3 0 R] /Count 7 >>',
+            3: b'<< /Type /Pages /Parent 2 0 R /Count 5 >>',
+        }, None))
+        self.assertEqual(extraer_metadatos(archivo, 'pdf'), {'total_paginas': 7})
+
+    def test_object_stream_que_supera_el_tope(self):
+        comprimidos = object_stream({2: b'<< /Type /Pages /Count 3 >>' + b' ' * 4096})
+        archivo = pdf_con_objetos(({3: comprimidos}, None))
+        with mock.patch('api_lms.services.metadatos.MAX_BYTES_OBJSTM', 1024):
+            self.assertEqual(extraer_metadatos(archivo, 'pdf'), {})
+
+
+# =====================================================
+# REGISTRO: DUPLICADOS DESDE LAS RESTRICCIONES ÚNICAS
+# =====================================================
+
+class RegistroDuplicadosTests(TestCase):
+    """
+    campo_duplicado traduce el IntegrityError real de cada restricción, y
+    el registro masivo que choca a mitad del lote no deja nada creado
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # Índice de la migración 0011; IF NOT EXISTS por si la BD de
+        # pruebas se creó sin migraciones
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE UNIQUE INDEX IF NOT EXISTS {INDICE_EMAIL_UNICO} '
+                "ON auth_user (LOWER(email)) WHERE email <> ''"
+            )
+        cls.administrador = crear_usuario(1, 'administrador')
+        cls.existente = crear_usuario(10, 'estudiante')
+
+    def datos(self, numero, **cambios):
+        datos = {
+            'username': f'nuevo{numero}', 'email': f'nuevo{numero}@ejemplo.cl',
+            'password': 'Clave-Segura-2025', 'password2': 'Clave-Segura-2025',
+            'rut_numero': 20000000 + numero, 'rut_dv': '5',
+            'nombres': 'Nuevo', 'apellido_paterno': 'Paterno', 'apellido_materno': 'Materno',
+        }
+        datos.update(cambios)
+        return datos
+
+    def registrar(self, **cambios):
+        return self.client.post('/api/auth/register/', self.datos(1, **cambios), content_type='application/json')
+
+    def assertDuplicado(self, response, campo):
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(response.json()['campo'], campo)
+        self.assertEqual(User.objects.count(), 2)
+
+    def test_username_duplicado(self):
+        self.assertDuplicado(self.registrar(username=self.existente.user.username), 'username')
+
+    def test_email_duplicado_con_otras_mayusculas(self):
+        self.assertDuplicado(self.registrar(email='USUARIO10@Ejemplo.CL'), 'email')
+
+    def test_rut_duplicado(self):
+        # El User se crea antes que el Usuario: la transacción lo descarta
+        self.assertDuplicado(self.registrar(rut_numero=self.existente.rut_numero, rut_dv='K'), 'rut')
+
+    def test_restriccion_desconocida(self):
+        self.assertEqual(campo_duplicado(IntegrityError('NOT NULL constraint failed: x')), (None, None))
+
+    def test_masivo_falla_a_mitad_del_lote(self):
+        # Simula otro registro que tomó el RUT del segundo elemento entre
+        # la validación y el INSERT: los Users del lote ya se insertaron
+        # cuando falla el bulk_create de Usuario
+        registros = [
+            self.datos(1),
+            self.datos(2, rut_numero=self.existente.rut_numero, rut_dv='K'),
+            self.datos(3),
+        ]
+        with mock.patch('api_lms.auth_views.validar_registros', return_value=[]):
+            response = self.client.post(
+                '/api/auth/register/masivo/', {'usuarios': registros}, content_type='application/json',
+                HTTP_AUTHORIZATION=token_acceso(self.administrador)
+            )
+
+        self.assertEqual(response.status_code, 409, response.content)
+        self.assertEqual(response.json()['campo'], 'rut')
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Usuario.objects.count(), 2)
+
+    def test_masivo_valida_todo_el_lote_antes_de_escribir(self):
+        registros = [self.datos(1), self.datos(2, email='Usuario10@EJEMPLO.cl'), self.datos(3)]
+        response = self.client.post(
+            '/api/auth/register/masivo/', {'usuarios': registros}, content_type='application/json',
+            HTTP_AUTHORIZATION=token_acceso(self.administrador)
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errores'], [
+            {'indice': 1, 'campo': 'email', 'error': 'El email ya está registrado'}
+        ])
+        self.assertEqual(User.objects.count(), 2)
@@ -0,0 +1,64 @@
+# throttling.py
+# Limitación de tasa (rate limiting) para endpoints públicos
+# LMS JC Digital Training
+
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle por IP con algoritmo token bucket, sobre el cache de Django.
+
+    Cada IP dispone de `capacidad` tokens (ráfaga permitida) que se recargan
+    a razón de `recarga` tokens por segundo. Cada request consume uno.
+
+    El estado vive en el cache compartido, por lo que el límite aplica a todos
+    los workers si el backend es Redis. La lectura/escritura no es atómica:
+    bajo mucha concurrencia el límite es aproximado, lo cual es suficiente
+    para frenar barridos de bots.
+    """
+    scope = 'default'
+    capacidad = 30
+    recarga = 0.5
+
+    def __init__(self):
+        self._espera = None
+
+    def get_cache_key(self, request):
+        return f"throttle:{self.scope}:{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        clave = self.get_cache_key(request)
+        ahora = time.time()
+
+        tokens, ultimo = cache.get(clave, (self.capacidad, ahora))
+        tokens = min(self.capacidad, tokens + (ahora - ultimo) * self.recarga)
+
+        # Tiempo para que un bucket vacío vuelva a estar lleno
+        ttl = math.ceil(self.capacidad / self.recarga)
+
+        if tokens < 1:
+            self._espera = (1 - tokens) / self.recarga
+            cache.set(clave, (tokens, ahora), ttl)
+            return False
+
+        cache.set(clave, (tokens - 1, ahora), ttl)
+        return True
+
+    def wait(self):
+        return self._espera
+
+
+class ValidacionDiplomaThrottle(TokenBucketThrottle):
+    """Throttle del endpoint público de validación de diplomas"""
+    scope = 'validacion_diploma'
+
+    def __init__(self):
+        super().__init__()
+        self.capacidad = settings.DIPLOMAS_VALIDACION['THROTTLE_CAPACIDAD']
+        self.recarga = settings.DIPLOMAS_VALIDACION['THROTTLE_RECARGA']
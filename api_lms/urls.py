@@ -6,6 +6,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views_notificaciones import NotificacionViewSet
 from .views_diplomas import PlantillaDiplomaViewSet, DiplomaViewSet
+from .views_scorm import PaqueteScormViewSet, archivo_scorm
 
 from .views import (
     UserViewSet, UsuarioViewSet, PerfilRelatorViewSet, ConfiguracionUsuarioViewSet,
@@ -26,7 +27,11 @@ from .views import (
 
 
 # Importar views de upload
-from .views_upload import upload_material, upload_avatar, delete_avatar
+from .views_upload import (
+    upload_material, avatar,
+    iniciar_subida_material, estado_subida_material, subir_chunk_material, completar_subida_material,
+    firmar_subida_directa, completar_subida_directa
+)
 
 router = DefaultRouter()
 
@@ -50,6 +55,7 @@ router.register(r'lecciones', LeccionViewSet, basename='leccion')
 # Módulo 4: Materiales
 router.register(r'materiales', MaterialViewSet, basename='material')
 router.register(r'leccion-material', LeccionMaterialViewSet, basename='leccion-material')
+router.register(r'paquetes-scorm', PaqueteScormViewSet, basename='paquete-scorm')
 
 # Módulo 5: Inscripciones
 router.register(r'inscripciones', InscripcionViewSet, basename='inscripcion')
@@ -94,8 +100,14 @@ urlpatterns = [
     
     # Módulo 14: Upload de archivos
     path('upload/material/', upload_material, name='upload-material'),
-    path('upload/avatar/', upload_avatar, name='upload-avatar'),
-    path('upload/avatar/', delete_avatar, name='delete-avatar'),  # DELETE method
+    path('upload/material/sesiones/', iniciar_subida_material, name='upload-material-sesion'),
+    path('upload/material/sesiones/<str:upload_id>/', estado_subida_material, name='upload-material-sesion-estado'),
+    path('upload/material/sesiones/<str:upload_id>/chunks/', subir_chunk_material, name='upload-material-chunk'),
+    path('upload/material/sesiones/<str:upload_id>/completar/', completar_subida_material, name='upload-material-completar'),
+    path('upload/directa/firmar/', firmar_subida_directa, name='upload-directa-firmar'),
+    path('upload/directa/completar/', completar_subida_directa, name='upload-directa-completar'),
+    path('upload/avatar/', avatar, name='upload-avatar'),
+    path('scorm/contenido/<str:token>/<path:ruta>', archivo_scorm, name='scorm-archivo'),
     path('diplomas/validar/<str:codigo>/', 
      DiplomaViewSet.as_view({'get': 'validar'}), 
      name='validar-diploma'),
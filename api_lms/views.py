@@ -2,10 +2,14 @@
 # Views para LMS JC Digital Training
 # Basado en models.py real del proyecto
 
-from rest_framework import viewsets, permissions, status
+import hashlib
+
+from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.auth.models import User
+from django.db.models import Count, Max, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from .models import (
@@ -54,7 +58,7 @@ from .serializers import (
     CodigoSenceSerializer,
     CursoSerializer, CursoRelatorSerializer, ModuloSerializer, LeccionSerializer,
     MaterialSerializer, LeccionMaterialSerializer,
-    InscripcionSerializer, ProgresoModuloSerializer, ProgresoLeccionSerializer, ActividadEstudianteSerializer,
+    InscripcionSerializer, InscripcionListaSerializer, ProgresoModuloSerializer, ProgresoLeccionSerializer, ActividadEstudianteSerializer,
     EvaluacionSerializer, PreguntaSerializer, IntentoEvaluacionSerializer, 
     RespuestaEstudianteSerializer, SolicitudTercerIntentoSerializer,
     SesionSenceSerializer, LogEnvioSenceSerializer,
@@ -65,42 +69,15 @@ from .serializers import (
     MetricaHistoricaSerializer,
     AuditLogSerializer
 )
-
-
-# =====================================================
-# PERMISOS PERSONALIZADOS
-# =====================================================
-
-class IsAdministrador(permissions.BasePermission):
-    def has_permission(self, request, view):
-        return (request.user.is_authenticated and hasattr(request.user, 'perfil') and 
-                request.user.perfil.tipo_usuario == 'administrador')
-
-
-class IsRelator(permissions.BasePermission):
-    def has_permission(self, request, view):
-        return (request.user.is_authenticated and hasattr(request.user, 'perfil') and 
-                request.user.perfil.tipo_usuario == 'relator')
-
-
-class IsEstudiante(permissions.BasePermission):
-    def has_permission(self, request, view):
-        return (request.user.is_authenticated and hasattr(request.user, 'perfil') and 
-                request.user.perfil.tipo_usuario == 'estudiante')
-
-
-class IsAdminOrRelator(permissions.BasePermission):
-    def has_permission(self, request, view):
-        return (request.user.is_authenticated and hasattr(request.user, 'perfil') and 
-                request.user.perfil.tipo_usuario in ['administrador', 'relator'])
-
-
-class ReadOnlyOrAdmin(permissions.BasePermission):
-    def has_permission(self, request, view):
-        if request.method in permissions.SAFE_METHODS:
-            return request.user.is_authenticated
-        return (request.user.is_authenticated and hasattr(request.user, 'perfil') and 
-                request.user.perfil.tipo_usuario == 'administrador')
+from .services.estructura import estructura_curso, progreso_lecciones
+from .mixins import OperacionesMasivasMixin, RespuestaCacheadaMixin, ValidadoresCondicionalesMixin
+from .visibilidad import filtrar_por_cursos_relator, cursos_estudiante
+from .filters import relaciones_expandidas
+from .authentication import rol_usuario, perfil_id
+from .permissions import (
+    PermisoPorRol, CATALOGO, ESCRITURA,
+    ADMINISTRADOR, RELATOR_O_ADMINISTRADOR, ESTUDIANTE, AUTENTICADOS,
+)
 
 
 # =====================================================
@@ -110,139 +87,243 @@ class ReadOnlyOrAdmin(permissions.BasePermission):
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    permission_classes = [IsAdministrador]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'*': ADMINISTRADOR}
 
 
-class UsuarioViewSet(viewsets.ModelViewSet):
+class UsuarioViewSet(ValidadoresCondicionalesMixin, viewsets.ModelViewSet):
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
-    
-    def get_permissions(self):
-        if self.action in ['list', 'create', 'update', 'partial_update', 'destroy']:
-            return [IsAdministrador()]
-        return [permissions.IsAuthenticated()]
+    campo_actualizacion = 'ultima_actualizacion'
+    # El User anidado (email, nombres, is_active) no cambia ultima_actualizacion
+    cache_modelos = (User,)
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {('list',) + ESCRITURA: ADMINISTRADOR, '*': AUTENTICADOS}
     
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'perfil'):
-            if user.perfil.tipo_usuario == 'administrador':
+        if rol_usuario(user):
+            if rol_usuario(user) == 'administrador':
                 return Usuario.objects.all()
-            return Usuario.objects.filter(user=user)
+            return Usuario.objects.filter(pk=perfil_id(user))
         return Usuario.objects.none()
     
     @action(detail=False, methods=['get'])
     def me(self, request):
-        if hasattr(request.user, 'perfil'):
-            serializer = self.get_serializer(request.user.perfil)
-            return Response(serializer.data)
+        if rol_usuario(request.user):
+            return self.respuesta_condicional(
+                self._me, Usuario.objects.filter(pk=perfil_id(request.user)), request
+            )
         return Response({'error': 'Usuario sin perfil'}, status=status.HTTP_404_NOT_FOUND)
+    
+    def _me(self, request):
+        serializer = self.get_serializer(request.user.perfil)
+        return Response(serializer.data)
 
 
 class PerfilRelatorViewSet(viewsets.ModelViewSet):
     queryset = PerfilRelator.objects.all()
     serializer_class = PerfilRelatorSerializer
-    
-    def get_permissions(self):
-        if self.action in ['list', 'create', 'update', 'partial_update', 'destroy']:
-            return [IsAdministrador()]
-        return [IsAdminOrRelator()]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {('list',) + ESCRITURA: ADMINISTRADOR, '*': RELATOR_O_ADMINISTRADOR}
     
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'perfil'):
-            if user.perfil.tipo_usuario == 'administrador':
+        if rol_usuario(user):
+            if rol_usuario(user) == 'administrador':
                 return PerfilRelator.objects.all()
-            elif user.perfil.tipo_usuario == 'relator':
-                return PerfilRelator.objects.filter(usuario=user.perfil)
+            elif rol_usuario(user) == 'relator':
+                return PerfilRelator.objects.filter(usuario_id=perfil_id(user))
         return PerfilRelator.objects.none()
 
 
 class ConfiguracionUsuarioViewSet(viewsets.ModelViewSet):
     queryset = ConfiguracionUsuario.objects.all()
     serializer_class = ConfiguracionUsuarioSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'*': AUTENTICADOS}
     
     def get_queryset(self):
-        if hasattr(self.request.user, 'perfil'):
-            return ConfiguracionUsuario.objects.filter(usuario=self.request.user.perfil)
+        if rol_usuario(self.request.user):
+            return ConfiguracionUsuario.objects.filter(usuario_id=perfil_id(self.request.user))
         return ConfiguracionUsuario.objects.none()
 
 
-class CodigoSenceViewSet(viewsets.ModelViewSet):
+class CodigoSenceViewSet(ValidadoresCondicionalesMixin, RespuestaCacheadaMixin, viewsets.ModelViewSet):
     queryset = CodigoSence.objects.all()
+    cache_modelos = (CodigoSence,)
     serializer_class = CodigoSenceSerializer
-    permission_classes = [ReadOnlyOrAdmin]
-
-
-class CursoViewSet(viewsets.ModelViewSet):
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = CATALOGO
+
+
+def num_inscritos():
+    """Conteo de inscripciones del curso por subconsulta (para annotate)"""
+    inscritos = Inscripcion.objects.filter(
+        curso=OuterRef('pk')
+    ).order_by().values('curso').annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(inscritos), 0)
+
+
+def cursos_para_serializar(queryset):
+    """
+    Agrega al queryset de cursos lo que CursoSerializer necesita, para que
+    una página de cursos se resuelva con un número fijo de consultas
+
+    - num_inscritos: conteo por subconsulta (no se ve afectado por los
+      joins de los filtros por relator o estudiante)
+    - relatores_activos: asignaciones activas con su relator
+    - modulos y codigo_sence precargados
+    """
+    return queryset.select_related('codigo_sence').annotate(
+        num_inscritos=num_inscritos()
+    ).prefetch_related(
+        'modulos',
+        Prefetch(
+            'asignaciones_relator',
+            queryset=CursoRelator.objects.filter(activo=True).select_related('relator'),
+            to_attr='relatores_activos'
+        ),
+    )
+
+
+class CursoViewSet(ValidadoresCondicionalesMixin, RespuestaCacheadaMixin, viewsets.ModelViewSet):
     queryset = Curso.objects.all()
     serializer_class = CursoSerializer
-    
-    def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
-            return [IsAdministrador()]
-        return [permissions.IsAuthenticated()]
+    # Inscripcion no versiona el catálogo: los conteos van en campos_en_vivo.
+    # Usuario solo se invalida al cambiar el nombre de un relator (signals.py)
+    cache_modelos = (Curso, Modulo, CursoRelator, CodigoSence, Usuario)
+    cache_por_usuario = ('relator', 'estudiante')  # ven solo sus cursos
+    campos_en_vivo = ('total_inscritos', 'cupos_disponibles')
+    presupuesto_consultas = 10  # ver api_lms/instrumentacion.py
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {ESCRITURA: ADMINISTRADOR, '*': AUTENTICADOS}
     
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'perfil'):
-            if user.perfil.tipo_usuario == 'administrador':
-                return Curso.objects.all()
-            elif user.perfil.tipo_usuario == 'relator':
-                return Curso.objects.filter(asignaciones_relator__relator=user.perfil, asignaciones_relator__activo=True)
+        if rol_usuario(user):
+            if rol_usuario(user) == 'administrador':
+                queryset = Curso.objects.all()
+            elif rol_usuario(user) == 'relator':
+                queryset = filtrar_por_cursos_relator(Curso.objects.all(), self.request, 'id', solo_activos=True)
             else:
-                return Curso.objects.filter(inscripciones__estudiante=user.perfil)
+                queryset = Curso.objects.filter(id__in=cursos_estudiante(self.request))
+            if self.action == 'estructura':
+                return queryset
+            return cursos_para_serializar(queryset)
         return Curso.objects.none()
+    
+    def alcance_cache(self):
+        alcance = super().alcance_cache()
+        if rol_usuario(self.request.user) == 'estudiante':
+            # Los cursos visibles dependen de sus inscripciones, que no
+            # versionan el catálogo: el conjunto entra al alcance
+            cursos = ','.join(map(str, sorted(cursos_estudiante(self.request))))
+            alcance = f"{alcance}:{hashlib.sha1(cursos.encode()).hexdigest()[:12]}"
+        return alcance
+    
+    def completar_en_vivo(self, elementos):
+        ids = [elemento['id'] for elemento in elementos if 'id' in elemento]
+        cursos = {
+            curso.id: curso for curso in
+            Curso.objects.filter(id__in=ids).only('id', 'cupo_maximo').annotate(num_inscritos=num_inscritos())
+        }
+        for elemento in elementos:
+            curso = cursos.get(elemento.get('id'))
+            if curso is None:
+                continue
+            for campo in self.campos_en_vivo:
+                if campo in elemento:
+                    elemento[campo] = getattr(curso, campo)
+    
+    def version_en_vivo(self, queryset):
+        inscripciones = Inscripcion.objects.filter(
+            curso_id__in=queryset.order_by().values('pk')
+        ).aggregate(total=Count('pk'), ultima=Max('pk'))
+        return f"{inscripciones['total']}:{inscripciones['ultima']}"
+    
+    @action(detail=True, methods=['get'])
+    def estructura(self, request, pk=None):
+        """
+        Módulos → lecciones → materiales del curso y el progreso del usuario
+        GET /cursos/{id}/estructura/
+        
+        El árbol se arma con tres consultas y se cachea por versión del
+        curso (cualquier cambio en módulos, lecciones o materiales la
+        renueva). Los estudiantes solo ven lo publicado y aprobado.
+        """
+        curso = self.get_object()
+        estructura = estructura_curso(
+            curso.id,
+            solo_publicado=rol_usuario(request.user) == 'estudiante'
+        )
+        
+        return Response({
+            'curso': {'id': curso.id, 'nombre': curso.nombre},
+            'version': estructura['version'],
+            'modulos': estructura['modulos'],
+            'progreso': progreso_lecciones(curso.id, perfil_id(request.user)),
+        })
 
 
 class CursoRelatorViewSet(viewsets.ModelViewSet):
     queryset = CursoRelator.objects.all()
     serializer_class = CursoRelatorSerializer
-    permission_classes = [IsAdministrador]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'*': ADMINISTRADOR}
 
 
-class ModuloViewSet(viewsets.ModelViewSet):
-    queryset = Modulo.objects.all()
+class ModuloViewSet(OperacionesMasivasMixin, ValidadoresCondicionalesMixin, RespuestaCacheadaMixin, viewsets.ModelViewSet):
+    queryset = Modulo.objects.select_related('curso')
+    cache_modelos = (Modulo, Curso)
+    campo_padre = 'curso'
+    ruta_curso = 'curso'
     serializer_class = ModuloSerializer
-    permission_classes = [ReadOnlyOrAdmin]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = CATALOGO
+    filterset_fields = ['curso', 'publicado']
 
 
-class LeccionViewSet(viewsets.ModelViewSet):
-    queryset = Leccion.objects.all()
+class LeccionViewSet(OperacionesMasivasMixin, ValidadoresCondicionalesMixin, RespuestaCacheadaMixin, viewsets.ModelViewSet):
+    queryset = Leccion.objects.select_related('modulo')
+    cache_modelos = (Leccion, Modulo)
+    campo_padre = 'modulo'
+    ruta_curso = 'modulo__curso'
     serializer_class = LeccionSerializer
-    permission_classes = [ReadOnlyOrAdmin]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = CATALOGO
+    filterset_fields = ['modulo', 'modulo__curso', 'publicado']
 
 
 class MaterialViewSet(viewsets.ModelViewSet):
     queryset = Material.objects.all()
     serializer_class = MaterialSerializer
-    
-    def get_permissions(self):
-        if self.action == 'create':
-            return [IsAdminOrRelator()]
-        elif self.action in ['update', 'partial_update', 'destroy']:
-            return [IsAdministrador()]
-        return [permissions.IsAuthenticated()]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {
+        'create': RELATOR_O_ADMINISTRADOR,
+        ('update', 'partial_update', 'destroy', 'aprobar', 'rechazar'): ADMINISTRADOR,
+        '*': AUTENTICADOS,
+    }
     
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'perfil'):
-            if user.perfil.tipo_usuario == 'administrador':
+        if rol_usuario(user):
+            if rol_usuario(user) == 'administrador':
                 return Material.objects.all()
-            elif user.perfil.tipo_usuario == 'relator':
-                return Material.objects.filter(relator_autor=user.perfil)
+            elif rol_usuario(user) == 'relator':
+                return Material.objects.filter(relator_autor_id=perfil_id(user))
             else:
                 return Material.objects.filter(estado='aprobado')
         return Material.objects.none()
     
     def perform_create(self, serializer):
         user = self.request.user
-        if hasattr(user, 'perfil') and user.perfil.tipo_usuario == 'relator':
+        if rol_usuario(user) == 'relator':
             serializer.save(estado='pendiente', subido_por=user.perfil, relator_autor=user.perfil)
         else:
             serializer.save()
     
-    @action(detail=True, methods=['post'], permission_classes=[IsAdministrador])
+    @action(detail=True, methods=['post'])
     def aprobar(self, request, pk=None):
         material = self.get_object()
         material.estado = 'aprobado'
@@ -251,7 +332,7 @@ class MaterialViewSet(viewsets.ModelViewSet):
         material.save()
         return Response({'status': 'Material aprobado'})
     
-    @action(detail=True, methods=['post'], permission_classes=[IsAdministrador])
+    @action(detail=True, methods=['post'])
     def rechazar(self, request, pk=None):
         material = self.get_object()
         material.estado = 'rechazado'
@@ -262,74 +343,100 @@ class MaterialViewSet(viewsets.ModelViewSet):
         return Response({'status': 'Material rechazado'})
 
 
-class LeccionMaterialViewSet(viewsets.ModelViewSet):
-    queryset = LeccionMaterial.objects.all()
+class LeccionMaterialViewSet(OperacionesMasivasMixin, viewsets.ModelViewSet):
+    queryset = LeccionMaterial.objects.select_related('leccion', 'material')
+    campo_padre = 'leccion'
+    ruta_curso = 'leccion__modulo__curso'
     serializer_class = LeccionMaterialSerializer
-    permission_classes = [ReadOnlyOrAdmin]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = CATALOGO
+    filterset_fields = ['leccion', 'leccion__modulo__curso', 'material']
 
 
 class InscripcionViewSet(viewsets.ModelViewSet):
+    """
+    Inscripciones
+    
+    El listado entrega curso y estudiante resumidos; el detalle y
+    ?expand=curso_data (o estudiante_data) entregan la forma anidada
+    completa (ver filters.py).
+    """
     queryset = Inscripcion.objects.all()
     serializer_class = InscripcionSerializer
+    presupuesto_consultas = 8
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {ESCRITURA: ADMINISTRADOR, '*': AUTENTICADOS}
     
-    def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
-            return [IsAdministrador()]
-        return [permissions.IsAuthenticated()]
+    relaciones_completas = {'curso_data', 'estudiante_data'}
+    
+    def usa_forma_completa(self):
+        if self.action != 'list':
+            return True
+        return bool(self.relaciones_completas & relaciones_expandidas(self.request))
+    
+    def get_serializer_class(self):
+        if self.usa_forma_completa():
+            return InscripcionSerializer
+        return InscripcionListaSerializer
     
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'perfil'):
-            if user.perfil.tipo_usuario == 'administrador':
-                return Inscripcion.objects.all()
-            elif user.perfil.tipo_usuario == 'relator':
-                return Inscripcion.objects.filter(curso__asignaciones_relator__relator=user.perfil)
+        if rol_usuario(user):
+            if rol_usuario(user) == 'administrador':
+                queryset = Inscripcion.objects.all()
+            elif rol_usuario(user) == 'relator':
+                queryset = filtrar_por_cursos_relator(Inscripcion.objects.all(), self.request, 'curso')
             else:
-                return Inscripcion.objects.filter(estudiante=user.perfil)
+                queryset = Inscripcion.objects.filter(estudiante_id=perfil_id(user))
+            
+            if self.usa_forma_completa():
+                # El curso se precarga con las anotaciones de CursoSerializer
+                return queryset.select_related('estudiante__user').prefetch_related(
+                    Prefetch('curso', queryset=cursos_para_serializar(Curso.objects.all()))
+                )
+            return queryset.select_related('curso__codigo_sence', 'estudiante__user')
         return Inscripcion.objects.none()
 
 
 class ProgresoModuloViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = ProgresoModulo.objects.all()
     serializer_class = ProgresoModuloSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'*': AUTENTICADOS}
     
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'perfil'):
-            if user.perfil.tipo_usuario == 'administrador':
+        if rol_usuario(user):
+            if rol_usuario(user) == 'administrador':
                 return ProgresoModulo.objects.all()
-            elif user.perfil.tipo_usuario == 'relator':
-                return ProgresoModulo.objects.filter(inscripcion__curso__asignaciones_relator__relator=user.perfil)
+            elif rol_usuario(user) == 'relator':
+                return filtrar_por_cursos_relator(ProgresoModulo.objects.all(), self.request, 'inscripcion__curso')
             else:
-                return ProgresoModulo.objects.filter(inscripcion__estudiante=user.perfil)
+                return ProgresoModulo.objects.filter(inscripcion__estudiante_id=perfil_id(user))
         return ProgresoModulo.objects.none()
 
 
 class ProgresoLeccionViewSet(viewsets.ModelViewSet):
     queryset = ProgresoLeccion.objects.all()
     serializer_class = ProgresoLeccionSerializer
-    
-    def get_permissions(self):
-        if self.action in ['create', 'destroy']:
-            return [IsAdministrador()]
-        return [permissions.IsAuthenticated()]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {('create', 'destroy'): ADMINISTRADOR, '*': AUTENTICADOS}
     
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'perfil'):
-            if user.perfil.tipo_usuario == 'administrador':
+        if rol_usuario(user):
+            if rol_usuario(user) == 'administrador':
                 return ProgresoLeccion.objects.all()
-            elif user.perfil.tipo_usuario == 'relator':
-                return ProgresoLeccion.objects.filter(inscripcion__curso__asignaciones_relator__relator=user.perfil)
+            elif rol_usuario(user) == 'relator':
+                return filtrar_por_cursos_relator(ProgresoLeccion.objects.all(), self.request, 'inscripcion__curso')
             else:
-                return ProgresoLeccion.objects.filter(inscripcion__estudiante=user.perfil)
+                return ProgresoLeccion.objects.filter(inscripcion__estudiante_id=perfil_id(user))
         return ProgresoLeccion.objects.none()
     
     @action(detail=True, methods=['post'])
     def completar(self, request, pk=None):
         progreso = self.get_object()
-        if request.user.perfil != progreso.inscripcion.estudiante:
+        if progreso.inscripcion.estudiante_id != perfil_id(request.user):
             return Response({'error': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
         progreso.completada = True
         progreso.fecha_completado = timezone.now()
@@ -340,71 +447,70 @@ class ProgresoLeccionViewSet(viewsets.ModelViewSet):
 class ActividadEstudianteViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = ActividadEstudiante.objects.all()
     serializer_class = ActividadEstudianteSerializer
-    permission_classes = [IsAdminOrRelator]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'*': RELATOR_O_ADMINISTRADOR}
 
 
 class EvaluacionViewSet(viewsets.ModelViewSet):
     queryset = Evaluacion.objects.all()
     serializer_class = EvaluacionSerializer
-    permission_classes = [ReadOnlyOrAdmin]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = CATALOGO
 
 
-class PreguntaViewSet(viewsets.ModelViewSet):
-    queryset = Pregunta.objects.all()
+class PreguntaViewSet(OperacionesMasivasMixin, viewsets.ModelViewSet):
+    queryset = Pregunta.objects.select_related('evaluacion')
+    campo_padre = 'evaluacion'
     serializer_class = PreguntaSerializer
-    permission_classes = [ReadOnlyOrAdmin]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = CATALOGO
 
 
 class IntentoEvaluacionViewSet(viewsets.ModelViewSet):
     queryset = IntentoEvaluacion.objects.all()
     serializer_class = IntentoEvaluacionSerializer
-    
-    def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update']:
-            return [permissions.IsAuthenticated()]
-        elif self.action == 'destroy':
-            return [IsAdministrador()]
-        return [permissions.IsAuthenticated()]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'destroy': ADMINISTRADOR, '*': AUTENTICADOS}
     
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'perfil'):
-            if user.perfil.tipo_usuario == 'administrador':
+        if rol_usuario(user):
+            if rol_usuario(user) == 'administrador':
                 return IntentoEvaluacion.objects.all()
-            elif user.perfil.tipo_usuario == 'relator':
-                return IntentoEvaluacion.objects.filter(evaluacion__curso__asignaciones_relator__relator=user.perfil)
+            elif rol_usuario(user) == 'relator':
+                return filtrar_por_cursos_relator(IntentoEvaluacion.objects.all(), self.request, 'evaluacion__curso')
             else:
-                return IntentoEvaluacion.objects.filter(estudiante=user.perfil)
+                return IntentoEvaluacion.objects.filter(estudiante_id=perfil_id(user))
         return IntentoEvaluacion.objects.none()
 
 
 class RespuestaEstudianteViewSet(viewsets.ModelViewSet):
     queryset = RespuestaEstudiante.objects.all()
     serializer_class = RespuestaEstudianteSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'*': AUTENTICADOS}
 
 
 class SolicitudTercerIntentoViewSet(viewsets.ModelViewSet):
     queryset = SolicitudTercerIntento.objects.all()
     serializer_class = SolicitudTercerIntentoSerializer
-    
-    def get_permissions(self):
-        if self.action == 'create':
-            return [IsEstudiante()]
-        elif self.action in ['update', 'partial_update', 'destroy']:
-            return [IsAdministrador()]
-        return [permissions.IsAuthenticated()]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {
+        'create': ESTUDIANTE,
+        ('update', 'partial_update', 'destroy', 'aprobar', 'rechazar'): ADMINISTRADOR,
+        '*': AUTENTICADOS,
+    }
     
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'perfil'):
-            if user.perfil.tipo_usuario == 'administrador':
+        if rol_usuario(user):
+            if rol_usuario(user) == 'administrador':
                 return SolicitudTercerIntento.objects.all()
             else:
-                return SolicitudTercerIntento.objects.filter(estudiante=user.perfil)
+                return SolicitudTercerIntento.objects.filter(estudiante_id=perfil_id(user))
         return SolicitudTercerIntento.objects.none()
     
-    @action(detail=True, methods=['post'], permission_classes=[IsAdministrador])
+    @action(detail=True, methods=['post'])
     def aprobar(self, request, pk=None):
         solicitud = self.get_object()
         solicitud.estado = 'aprobada'
@@ -414,7 +520,7 @@ class SolicitudTercerIntentoViewSet(viewsets.ModelViewSet):
         solicitud.save()
         return Response({'status': 'Solicitud aprobada'})
     
-    @action(detail=True, methods=['post'], permission_classes=[IsAdministrador])
+    @action(detail=True, methods=['post'])
     def rechazar(self, request, pk=None):
         solicitud = self.get_object()
         solicitud.estado = 'rechazada'
@@ -428,44 +534,49 @@ class SolicitudTercerIntentoViewSet(viewsets.ModelViewSet):
 class SesionSenceViewSet(viewsets.ModelViewSet):
     queryset = SesionSence.objects.all()
     serializer_class = SesionSenceSerializer
-    permission_classes = [IsAdministrador]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'*': ADMINISTRADOR}
 
 
 class LogEnvioSenceViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = LogEnvioSence.objects.all()
     serializer_class = LogEnvioSenceSerializer
-    permission_classes = [IsAdministrador]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'*': ADMINISTRADOR}
 
 
 class ForoConsultaViewSet(viewsets.ModelViewSet):
     queryset = ForoConsulta.objects.all()
     serializer_class = ForoConsultaSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'*': AUTENTICADOS}
     
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'perfil'):
-            if user.perfil.tipo_usuario in ['administrador', 'relator']:
+        if rol_usuario(user):
+            if rol_usuario(user) in ['administrador', 'relator']:
                 return ForoConsulta.objects.all()
             else:
-                return ForoConsulta.objects.filter(estudiante=user.perfil)
+                return ForoConsulta.objects.filter(estudiante_id=perfil_id(user))
         return ForoConsulta.objects.none()
 
 
 class ForoRespuestaViewSet(viewsets.ModelViewSet):
     queryset = ForoRespuesta.objects.all()
     serializer_class = ForoRespuestaSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'*': AUTENTICADOS}
 
 
 class NotificacionViewSet(viewsets.ModelViewSet):
     queryset = Notificacion.objects.all()
     serializer_class = NotificacionSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'*': AUTENTICADOS}
     
     def get_queryset(self):
-        if hasattr(self.request.user, 'perfil'):
-            return Notificacion.objects.filter(usuario=self.request.user.perfil)
+        if rol_usuario(self.request.user):
+            return Notificacion.objects.filter(usuario_id=perfil_id(self.request.user))
         return Notificacion.objects.none()
     
     @action(detail=True, methods=['post'])
@@ -475,46 +586,51 @@ class NotificacionViewSet(viewsets.ModelViewSet):
         return Response({'status': 'Notificación marcada como leída'})
 
 
-class EncuestaViewSet(viewsets.ModelViewSet):
+class EncuestaViewSet(ValidadoresCondicionalesMixin, RespuestaCacheadaMixin, viewsets.ModelViewSet):
     queryset = Encuesta.objects.all()
+    cache_modelos = (Encuesta,)
+    campo_actualizacion = None  # sin fecha de modificación: ETag por versión y conteo
     serializer_class = EncuestaSerializer
-    permission_classes = [ReadOnlyOrAdmin]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = CATALOGO
 
 
 class RespuestaEncuestaViewSet(viewsets.ModelViewSet):
     queryset = RespuestaEncuesta.objects.all()
     serializer_class = RespuestaEncuestaSerializer
-    
-    def get_permissions(self):
-        if self.action == 'create':
-            return [IsEstudiante()]
-        elif self.action in ['update', 'partial_update', 'destroy']:
-            return [IsAdministrador()]
-        return [permissions.IsAuthenticated()]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {
+        'create': ESTUDIANTE,
+        ('update', 'partial_update', 'destroy'): ADMINISTRADOR,
+        '*': AUTENTICADOS,
+    }
     
     def get_queryset(self):
         user = self.request.user
-        if hasattr(user, 'perfil'):
-            if user.perfil.tipo_usuario in ['administrador', 'relator']:
+        if rol_usuario(user):
+            if rol_usuario(user) in ['administrador', 'relator']:
                 return RespuestaEncuesta.objects.all()
             else:
-                return RespuestaEncuesta.objects.filter(estudiante=user.perfil)
+                return RespuestaEncuesta.objects.filter(estudiante_id=perfil_id(user))
         return RespuestaEncuesta.objects.none()
 
 
 class PlantillaDiplomaViewSet(viewsets.ModelViewSet):
     queryset = PlantillaDiploma.objects.all()
     serializer_class = PlantillaDiplomaSerializer
-    permission_classes = [IsAdministrador]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'*': ADMINISTRADOR}
 
 
 class MetricaHistoricaViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = MetricaHistorica.objects.all()
     serializer_class = MetricaHistoricaSerializer
-    permission_classes = [IsAdminOrRelator]
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'*': RELATOR_O_ADMINISTRADOR}
 
 
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = AuditLog.objects.all()
     serializer_class = AuditLogSerializer
-    permission_classes = [IsAdministrador]
\ No newline at end of file
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'*': ADMINISTRADOR}
@@ -11,6 +11,7 @@ from django.core.exceptions import ValidationError
 
 from api_lms.models import Inscripcion, IntentoEvaluacion, Evaluacion
 from api_lms.serializers import InscripcionSerializer
+from api_lms.visibilidad import contexto_autorizacion
 from api_lms.servicios_calificacion import (
     calcular_nota,
     calcular_nota_final_curso,
@@ -26,43 +27,6 @@ from api_lms.servicios_calificacion import (
 # ENDPOINT: CALCULAR NOTA DE INTENTO
 # =====================================================
 
-def obtener_rol_usuario(user):
-    """
-    Obtiene el rol del usuario de forma segura.
-    Maneja tanto Usuario personalizado como User de Django con relación.
-    """
-    # Si el user tiene directamente el atributo tipo_usuario
-    if hasattr(user, 'tipo_usuario'):
-        return user.tipo_usuario
-    
-    # Si el user tiene directamente el atributo rol
-    if hasattr(user, 'rol'):
-        return user.rol
-    
-    # Si el user tiene una relación 'perfil' con Usuario (TU CASO)
-    if hasattr(user, 'perfil'):
-        perfil = user.perfil
-        # Intentar tipo_usuario primero
-        if hasattr(perfil, 'tipo_usuario'):
-            return perfil.tipo_usuario
-        # Si no, intentar rol
-        if hasattr(perfil, 'rol'):
-            return perfil.rol
-    
-    # Si el user tiene una relación 'usuario' (otro nombre posible)
-    if hasattr(user, 'usuario'):
-        usuario = user.usuario
-        # Intentar tipo_usuario primero
-        if hasattr(usuario, 'tipo_usuario'):
-            return usuario.tipo_usuario
-        # Si no, intentar rol
-        if hasattr(usuario, 'rol'):
-            return usuario.rol
-    
-    # Si no se encuentra rol, asumir sin permisos
-    return None
-
-
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def calcular_nota_intento(request, intento_id):
@@ -80,7 +44,7 @@ def calcular_nota_intento(request, intento_id):
     }
     """
     # Verificar permisos: admin o relator
-    rol_usuario = obtener_rol_usuario(request.user)
+    rol_usuario = contexto_autorizacion(request).rol
     if rol_usuario not in ['administrador', 'relator']:
         return Response(
             {'error': 'No tiene permisos para calcular notas'},
@@ -169,7 +133,7 @@ def calcular_nota_final_inscripcion(request, inscripcion_id):
     4. Cambia estado a 'pendiente_revision' si corresponde
     """
     # Verificar permisos: admin o relator
-    rol_usuario = obtener_rol_usuario(request.user)
+    rol_usuario = contexto_autorizacion(request).rol
     if rol_usuario not in ['administrador', 'relator']:
         return Response(
             {'error': 'No tiene permisos para calcular notas finales'},
@@ -226,7 +190,7 @@ def aprobar_inscripcion(request, inscripcion_id):
     - Si cumple requisitos → justificación es OPCIONAL
     """
     # Verificar permisos: solo administrador
-    rol_usuario = obtener_rol_usuario(request.user)
+    rol_usuario = contexto_autorizacion(request).rol
     if rol_usuario != 'administrador':
         return Response(
             {'error': 'Solo administradores pueden aprobar inscripciones'},
@@ -292,7 +256,7 @@ def reprobar_inscripcion(request, inscripcion_id):
     - Si NO cumple requisitos → justificación es OPCIONAL
     """
     # Verificar permisos: solo administrador
-    rol_usuario = obtener_rol_usuario(request.user)
+    rol_usuario = contexto_autorizacion(request).rol
     if rol_usuario != 'administrador':
         return Response(
             {'error': 'Solo administradores pueden reprobar inscripciones'},
@@ -359,16 +323,8 @@ def detalle_calificaciones_inscripcion(request, inscripcion_id):
     
     
     # Verificar permisos: el estudiante solo ve sus propias calificaciones
-    rol_usuario = obtener_rol_usuario(request.user)
-    # Obtener el usuario correcto (puede ser Usuario directo o relacionado)
-    if hasattr(request.user, 'perfil'):
-        usuario_actual = request.user.perfil
-    elif hasattr(request.user, 'tipo_usuario'):
-        usuario_actual = request.user
-    else:
-        usuario_actual = request.user
-    
-    if rol_usuario == 'estudiante' and inscripcion.estudiante != usuario_actual:
+    rol_usuario = contexto_autorizacion(request).rol
+    if rol_usuario == 'estudiante' and inscripcion.estudiante_id != contexto_autorizacion(request).perfil_id:
         return Response(
             {'error': 'No tiene permisos para ver estas calificaciones'},
             status=status.HTTP_403_FORBIDDEN
@@ -465,7 +421,7 @@ def validar_configuracion_evaluaciones(request, curso_id):
     - Que todas las evaluaciones tengan configuración válida
     """
     # Verificar permisos: admin o relator
-    rol_usuario = obtener_rol_usuario(request.user)
+    rol_usuario = contexto_autorizacion(request).rol
     if rol_usuario not in ['administrador', 'relator']:
         return Response(
             {'error': 'No tiene permisos para validar configuraciones'},
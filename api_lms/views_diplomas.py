@@ -2,13 +2,22 @@
 # ViewSet para generación y validación de diplomas
 # LMS JC Digital Training
 
-from rest_framework import viewsets, permissions, status
+import hashlib
+import json
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from api_lms.models import PlantillaDiploma, Inscripcion
-from api_lms.serializers import PlantillaDiplomaSerializer
+from api_lms.models import PlantillaDiploma, Inscripcion, DiplomaJob
+from api_lms.serializers import PlantillaDiplomaSerializer, DiplomaJobSerializer
+from .permissions import PermisoPorRol, ESCRITURA, ADMINISTRADOR, AUTENTICADOS, TODOS
+from .throttling import ValidacionDiplomaThrottle
+from .visibilidad import contexto_autorizacion
 from .diplomas_utils import (
-    generar_diploma_completo,
+    encolar_diploma,
     validar_codigo_diploma
 )
 
@@ -19,14 +28,10 @@ class PlantillaDiplomaViewSet(viewsets.ModelViewSet):
     Solo accesible por administradores
     """
     serializer_class = PlantillaDiplomaSerializer
-    permission_classes = [permissions.IsAuthenticated]
     queryset = PlantillaDiploma.objects.all()
-    
-    def get_permissions(self):
-        """Solo administradores pueden crear/editar/eliminar plantillas"""
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
-            return [permissions.IsAuthenticated(), permissions.IsAdminUser()]
-        return super().get_permissions()
+    permission_classes = [PermisoPorRol]
+    # Solo administradores crean/editan/eliminan plantillas
+    permisos_por_rol = {ESCRITURA + ('marcar_predeterminada',): ADMINISTRADOR, '*': AUTENTICADOS}
     
     @action(detail=True, methods=['post'])
     def marcar_predeterminada(self, request, pk=None):
@@ -54,19 +59,31 @@ class DiplomaViewSet(viewsets.ViewSet):
     ViewSet para operaciones relacionadas con diplomas de estudiantes
     
     Endpoints:
-    - POST /diplomas/generar/ - Generar diploma para inscripción
+    - POST /diplomas/generar/ - Encolar generación de diploma para inscripción
+    - GET /diplomas/jobs/{id}/ - Estado de un trabajo de generación
     - GET /diplomas/validar/{codigo}/ - Validar código de diploma
     - GET /diplomas/mis-diplomas/ - Diplomas del usuario actual
     """
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [PermisoPorRol]
+    # La validación de diplomas es pública (la usan empleadores)
+    permisos_por_rol = {'validar': TODOS, '*': AUTENTICADOS}
+    
+    def get_throttles(self):
+        if self.action == 'validar':
+            return [ValidacionDiplomaThrottle()]
+        return super().get_throttles()
     
     @action(detail=False, methods=['post'])
     def generar(self, request):
         """
-        Genera el diploma para una inscripción completada
+        Encola la generación del diploma para una inscripción completada
         POST /diplomas/generar/
         Body: { "inscripcion_id": 123 }
         
+        Responde 202 con el ID del trabajo; el render y la subida corren en
+        el worker (manage.py procesar_diplomas). Consultar el estado en
+        GET /diplomas/jobs/{id}/
+        
         Solo administradores o el propio estudiante pueden generar su diploma
         """
         inscripcion_id = request.data.get('inscripcion_id')
@@ -95,30 +112,55 @@ class DiplomaViewSet(viewsets.ViewSet):
         
         # Solo admin o el propio estudiante
         es_admin = usuario.tipo_usuario == 'administrador'
-        es_el_estudiante = inscripcion.estudiante == usuario
+        es_el_estudiante = inscripcion.estudiante_id == usuario.id
         
         if not (es_admin or es_el_estudiante):
             return Response({
                 'error': 'No tienes permiso para generar este diploma'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        # Generar diploma
-        resultado = generar_diploma_completo(inscripcion_id)
-        
-        if not resultado.get('success'):
+        # Errores permanentes se informan de inmediato, sin pasar por la cola
+        if inscripcion.estado != 'completado':
             return Response({
-                'error': resultado.get('error', 'Error al generar diploma')
+                'error': 'El estudiante no ha completado el curso'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        job, creado = encolar_diploma(inscripcion, solicitado_por=usuario)
+        
         return Response({
-            'mensaje': 'Diploma generado exitosamente',
-            'diploma': {
-                'url': resultado['diploma_url'],
-                'codigo_validacion': resultado['codigo_validacion'],
-                'estudiante': resultado['estudiante'],
-                'curso': resultado['curso']
-            }
-        }, status=status.HTTP_201_CREATED)
+            'mensaje': 'Generación de diploma encolada' if creado else 'Ya existe una generación en curso',
+            'job': DiplomaJobSerializer(job).data,
+            'url_estado': f'/api/diplomas/jobs/{job.id}/'
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['get'], url_path='jobs/(?P<job_id>[0-9]+)')
+    def jobs(self, request, job_id=None):
+        """
+        Estado de un trabajo de generación de diploma
+        GET /diplomas/jobs/{id}/
+        
+        Visible para administradores, el estudiante de la inscripción y quien lo solicitó
+        """
+        contexto = contexto_autorizacion(request)
+        
+        try:
+            job = DiplomaJob.objects.select_related('inscripcion').get(id=job_id)
+        except DiplomaJob.DoesNotExist:
+            return Response({
+                'error': 'Trabajo no encontrado'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        puede_ver = (
+            contexto.es_administrador or
+            contexto.es_propio(job.inscripcion.estudiante_id) or
+            contexto.es_propio(job.solicitado_por_id)
+        )
+        if not puede_ver:
+            return Response({
+                'error': 'No tienes permiso para ver este trabajo'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        return Response(DiplomaJobSerializer(job).data)
     
     @action(detail=False, methods=['get'], url_path='validar/(?P<codigo>[^/.]+)')
     def validar(self, request, codigo=None):
@@ -126,7 +168,10 @@ class DiplomaViewSet(viewsets.ViewSet):
         Valida un código de diploma
         GET /diplomas/validar/{codigo}/
         
-        Endpoint público (no requiere autenticación)
+        Endpoint público (no requiere autenticación). El resultado se cachea
+        por código, se limita por IP (token bucket) y se responde con
+        ETag/Cache-Control para que navegadores y CDN sirvan las
+        verificaciones repetidas (304 Not Modified con If-None-Match).
         """
         if not codigo:
             return Response({
@@ -136,12 +181,14 @@ class DiplomaViewSet(viewsets.ViewSet):
         resultado = validar_codigo_diploma(codigo)
         
         if not resultado.get('valido'):
-            return Response({
+            response = Response({
                 'valido': False,
                 'mensaje': 'Código de diploma no válido'
             }, status=status.HTTP_404_NOT_FOUND)
+            patch_cache_control(response, public=True, max_age=60)
+            return response
         
-        return Response({
+        data = {
             'valido': True,
             'diploma': {
                 'estudiante': resultado['estudiante'],
@@ -151,7 +198,20 @@ class DiplomaViewSet(viewsets.ViewSet):
                 'nota_final': resultado['nota_final'],
                 'url': resultado['diploma_url']
             }
-        })
+        }
+        
+        contenido = json.dumps(data, sort_keys=True, default=str).encode('utf-8')
+        etag = quote_etag(hashlib.sha256(contenido).hexdigest()[:32])
+        max_age = settings.DIPLOMAS_VALIDACION['MAX_AGE_HTTP']
+        
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=max_age)
+        return response
     
     @action(detail=False, methods=['get'])
     def mis_diplomas(self, request):
@@ -243,7 +303,3 @@ class DiplomaViewSet(viewsets.ViewSet):
             'count': len(pendientes),
             'pendientes': pendientes
         })
-
-
-# Hacer públicamente accesible la validación de diplomas
-validar_diploma_permission_classes = []
\ No newline at end of file
@@ -0,0 +1,156 @@
+# views_scorm.py
+# ViewSet de paquetes SCORM y entrega de sus archivos por rango
+# LMS JC Digital Training
+
+import mimetypes
+
+import requests
+from django.db.models import Exists, OuterRef
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.clickjacking import xframe_options_exempt
+from django.views.decorators.http import require_GET
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from api_lms.models import PaqueteScorm, ArchivoScorm, Inscripcion, LeccionMaterial, Usuario
+from api_lms.serializers import PaqueteScormSerializer, RecursoScormSerializer
+from .permissions import PermisoPorRol, AUTENTICADOS
+from .services.scorm import firmar_lanzamiento, verificar_lanzamiento, abrir_archivo_scorm
+from .visibilidad import contexto_autorizacion, cursos_estudiante
+
+
+class PaqueteScormViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet de solo lectura para paquetes SCORM indexados
+
+    Endpoints:
+    - GET /paquetes-scorm/ - Listar paquetes (filtro ?material=)
+    - GET /paquetes-scorm/{id}/ - Detalle con recursos (SCOs/assets)
+    - GET /paquetes-scorm/{id}/lanzar/ - URL firmada para abrir un SCO
+    """
+    serializer_class = PaqueteScormSerializer
+    permission_classes = [PermisoPorRol]
+    permisos_por_rol = {'*': AUTENTICADOS}
+    filterset_fields = ['material', 'estado']
+
+    def get_queryset(self):
+        queryset = PaqueteScorm.objects.select_related('material').prefetch_related('recursos')
+
+        rol = contexto_autorizacion(self.request).rol
+        if rol is None:
+            return queryset.none()
+
+        # Estudiantes: solo paquetes usados en lecciones de sus cursos
+        if rol == 'estudiante':
+            queryset = queryset.filter(Exists(LeccionMaterial.objects.filter(
+                material=OuterRef('material'),
+                leccion__modulo__curso__in=cursos_estudiante(self.request)
+            )))
+
+        return queryset
+
+    @action(detail=True, methods=['get'])
+    def lanzar(self, request, pk=None):
+        """
+        Entrega la URL de lanzamiento de un SCO
+        GET /paquetes-scorm/{id}/lanzar/?recurso={identificador}
+
+        Sin ?recurso se lanza el primer SCO de la organización por defecto.
+        La URL incluye un token de corta duración, por lo que el contenido
+        puede cargarse en un iframe sin cabecera Authorization.
+        """
+        paquete = self.get_object()
+
+        if paquete.estado != 'indexado':
+            return Response({
+                'error': 'El paquete no está indexado',
+                'detalle': paquete.error
+            }, status=status.HTTP_409_CONFLICT)
+
+        recursos = paquete.recursos.exclude(href='')
+        identificador = request.query_params.get('recurso')
+        if identificador:
+            recurso = recursos.filter(identificador=identificador).first()
+        else:
+            recurso = recursos.filter(tipo='sco').first() or recursos.first()
+
+        if not recurso:
+            return Response({
+                'error': 'Recurso no encontrado en el paquete'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        token = firmar_lanzamiento(paquete.id, contexto_autorizacion(request).perfil_id)
+        url = request.build_absolute_uri(
+            reverse('scorm-archivo', kwargs={'token': token, 'ruta': recurso.href})
+        )
+        if recurso.parametros:
+            separador = '&' if '?' in url else '?'
+            url = f"{url}{separador}{recurso.parametros.lstrip('?&')}"
+
+        return Response({
+            'url_lanzamiento': url,
+            'recurso': RecursoScormSerializer(recurso).data,
+        })
+
+
+def puede_abrir_paquete(usuario_id, material_id):
+    """
+    True si el usuario firmado en el token sigue activo y, si es estudiante,
+    sigue inscrito en algún curso que usa el material (mismo criterio que
+    PaqueteScormViewSet.get_queryset)
+
+    El token vive SCORM['TOKEN_EXPIRACION'] segundos: así una baja o una
+    desinscripción cortan el acceso sin esperar a que expire.
+    """
+    usuario = Usuario.objects.filter(id=usuario_id, activo=True).only('tipo_usuario').first()
+    if usuario is None:
+        return False
+    if usuario.tipo_usuario != 'estudiante':
+        return True
+    return LeccionMaterial.objects.filter(
+        material_id=material_id,
+        leccion__modulo__curso__in=Inscripcion.objects.filter(estudiante_id=usuario_id).values('curso_id')
+    ).exists()
+
+
+@xframe_options_exempt
+@require_GET
+def archivo_scorm(request, token, ruta):
+    """
+    GET /api/scorm/contenido/{token}/{ruta}
+
+    Entrega un archivo del paquete pidiendo al almacenamiento solo su rango
+    de bytes dentro del ZIP (nunca se descarga el paquete completo).
+
+    El HTML/JS del paquete lo sube un relator y se sirve desde el origen de
+    la API dentro de un iframe: la CSP `sandbox allow-scripts` lo ejecuta
+    en un origen opaco, sin acceso a cookies ni almacenamiento del sitio.
+    No se envía Content-Length: los bytes salen de descomprimir en
+    streaming y el tamaño indexado no se puede garantizar de antemano.
+    """
+    lanzamiento = verificar_lanzamiento(token)
+    if not lanzamiento:
+        return JsonResponse({'error': 'Token de lanzamiento inválido o expirado'}, status=403)
+
+    archivo = ArchivoScorm.objects.select_related('paquete__material').filter(
+        paquete_id=lanzamiento['paquete_id'],
+        ruta=ruta
+    ).first()
+    if not archivo:
+        return JsonResponse({'error': 'Archivo no encontrado en el paquete'}, status=404)
+
+    if not puede_abrir_paquete(lanzamiento.get('usuario_id'), archivo.paquete.material_id):
+        return JsonResponse({'error': 'No tiene acceso a este paquete'}, status=403)
+
+    try:
+        contenido = abrir_archivo_scorm(archivo.paquete.material.archivo_url, archivo)
+    except (requests.RequestException, IOError) as e:
+        return JsonResponse({'error': f'Error al leer el paquete: {str(e)}'}, status=502)
+
+    tipo_contenido = mimetypes.guess_type(ruta)[0] or 'application/octet-stream'
+    response = StreamingHttpResponse(contenido, content_type=tipo_contenido)
+    response['Content-Security-Policy'] = 'sandbox allow-scripts'
+    patch_cache_control(response, private=True, max_age=3600)
+    return response
@@ -4,16 +4,33 @@ LMS JC Digital Training
 """
 
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django.conf import settings
+from django.db.models import F
 from django.utils import timezone
 import cloudinary.uploader
+import logging
 import os
+from PIL import Image, UnidentifiedImageError
 
 from .models import Material, Usuario
+from .permissions import permisos_vista, AUTENTICADOS, RELATOR_O_ADMINISTRADOR
 from .serializers import MaterialSerializer, UsuarioSerializer
+from .services.subidas import (
+    subir_archivo_streaming, iniciar_subida, obtener_subida, agregar_chunk,
+    descartar_subida, ruta_datos_subida, generar_firma_subida, verificar_subida_directa,
+    calcular_sha256
+)
+from .services.metadatos import extraer_metadatos
+from .services.scorm import leer_paquete_scorm, guardar_paquete_scorm
+from .services.avatares import (
+    LADOS_AVATAR, generar_variantes_avatar, subir_variantes_avatar,
+    eliminar_variantes_avatar, public_id_desde_url, urls_avatar
+)
+from .visibilidad import contexto_autorizacion
+
+logger = logging.getLogger(__name__)
 
 
 def validar_archivo(file, tipo_material=None):
@@ -21,6 +38,15 @@ def validar_archivo(file, tipo_material=None):
     Valida tamaño y extensión del archivo
     Returns: (bool, str) - (es_valido, mensaje_error)
     """
+    return validar_nombre_y_tamano(file.name, file.size, tipo_material)
+
+
+def validar_nombre_y_tamano(nombre_archivo, total_bytes, tipo_material=None):
+    """
+    Valida tamaño y extensión a partir del nombre y tamaño declarados
+    (usado también al iniciar una subida por chunks, antes de recibir datos)
+    Returns: (bool, str) - (es_valido, mensaje_error)
+    """
     # Obtener configuración según tipo
     if tipo_material and tipo_material != 'enlace':
         config = settings.CLOUDINARY_SETTINGS['materiales'].get(tipo_material)
@@ -31,12 +57,12 @@ def validar_archivo(file, tipo_material=None):
         config = settings.CLOUDINARY_SETTINGS['avatares']
     
     # Validar tamaño
-    if file.size > config['max_size']:
+    if total_bytes > config['max_size']:
         max_mb = config['max_size'] / (1024 * 1024)
         return False, f"El archivo excede el tamaño máximo de {max_mb:.0f} MB"
     
     # Validar extensión
-    ext = os.path.splitext(file.name)[1].lower()
+    ext = os.path.splitext(nombre_archivo)[1].lower()
     if ext not in config['extensions']:
         extensions_str = ', '.join(config['extensions'])
         return False, f"Extensión no permitida. Use: {extensions_str}"
@@ -44,26 +70,192 @@ def validar_archivo(file, tipo_material=None):
     return True, None
 
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def upload_material(request):
+TIPOS_MATERIAL_ARCHIVO = ['pdf', 'video', 'documento', 'presentacion', 'imagen', 'scorm']
+
+# La subida directa no pasa el archivo por el servidor: un SCORM no se
+# podría validar ni indexar antes de registrarlo, así que va por las otras vías
+TIPOS_SUBIDA_DIRECTA = [tipo for tipo in TIPOS_MATERIAL_ARCHIVO if tipo != 'scorm']
+
+
+def sin_perfil(request):
+    """Returns: Response con el error si el usuario no tiene perfil, o None"""
+    if contexto_autorizacion(request).perfil_id is None:
+        return Response({'error': 'Usuario sin perfil'}, status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+
+def sin_permiso_materiales(request):
     """
-    POST /api/upload/material/
-    Sube un archivo de material educativo a Cloudinary
+    Para las vistas que también reciben avatares (cualquier rol): solo
+    admin y relator pueden subir materiales
+    Returns: Response con el error, o None
     """
-    
-    # Verificar perfil
-    if not hasattr(request.user, 'perfil'):
-        return Response({'error': 'Usuario sin perfil'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    usuario = request.user.perfil
-    
-    # Solo admin y relator pueden subir materiales
-    if usuario.tipo_usuario not in ['administrador', 'relator']:
+    if contexto_autorizacion(request).rol not in RELATOR_O_ADMINISTRADOR:
         return Response(
             {'error': 'No tiene permisos para subir materiales'}, 
             status=status.HTTP_403_FORBIDDEN
         )
+    return None
+
+
+def validar_tipo_material(tipo, tipos_validos=TIPOS_MATERIAL_ARCHIVO):
+    """Returns: Response con el error, o None si el tipo es válido"""
+    if tipo not in tipos_validos:
+        return Response(
+            {'error': f'Tipo de material no válido. Use: {", ".join(tipos_validos)}'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return None
+
+
+def datos_material_request(request, usuario, tipo, nombre):
+    """Campos comunes del Material a partir del request y del usuario que sube"""
+    return {
+        'nombre': nombre,
+        'descripcion': request.data.get('descripcion', ''),
+        'tipo': tipo,
+        'subido_por': usuario,
+        'relator_autor': usuario if usuario.tipo_usuario == 'relator' else None,
+        'estado': 'pendiente' if usuario.tipo_usuario == 'relator' else 'aprobado',
+        'categoria': request.data.get('categoria', ''),
+        'tags': [tag.strip() for tag in request.data.get('tags', '').split(',') if tag.strip()],
+    }
+
+
+def respuesta_material(material, extra=None, http_status=status.HTTP_201_CREATED):
+    """Respuesta estándar de los endpoints de subida de materiales"""
+    data = {
+        'success': True,
+        'message': 'Material subido exitosamente',
+        'material': {
+            'id': material.id,
+            'nombre': material.nombre,
+            'tipo': material.tipo,
+            'estado': material.estado,
+            'archivo_url': material.archivo_url,
+            'subido_por': material.subido_por.nombre_completo() if material.subido_por else None
+        },
+    }
+    data.update(extra or {})
+    return Response(data, status=http_status)
+
+
+def crear_material_subido(request, usuario, tipo, nombre, upload_result, archivo_size,
+                          archivo_hash='', metadatos=None, paquete_scorm=None):
+    """
+    Crea el Material (un solo INSERT) y arma la respuesta 201
+    
+    Los metadatos extraídos localmente tienen prioridad; los de la respuesta
+    de Cloudinary se usan solo como respaldo (p. ej. en subidas directas).
+    """
+    metadatos = metadatos or {}
+    
+    duracion_segundos = metadatos.get('duracion_segundos')
+    if duracion_segundos is None and tipo == 'video' and 'duration' in upload_result:
+        duracion_segundos = int(upload_result['duration'])
+    
+    total_paginas = metadatos.get('total_paginas')
+    if total_paginas is None and tipo == 'pdf' and 'pages' in upload_result:
+        total_paginas = upload_result['pages']
+    
+    material = Material.objects.create(
+        archivo_url=upload_result['secure_url'],
+        archivo_size=archivo_size,
+        archivo_hash=archivo_hash,
+        duracion_segundos=duracion_segundos,
+        total_paginas=total_paginas,
+        metadata=metadatos.get('metadata', {}),
+        **datos_material_request(request, usuario, tipo, nombre)
+    )
+    
+    extra = indexar_scorm_subido(material, paquete_scorm)
+    
+    return respuesta_material(material, {
+        **extra,
+        'cloudinary': {
+            'public_id': upload_result['public_id'],
+            'url': upload_result['secure_url'],
+            'format': upload_result.get('format'),
+            'size': upload_result['bytes'],
+        }
+    })
+
+
+def buscar_material_duplicado(tipo, archivo_hash):
+    """
+    Busca un material reutilizable con el mismo contenido (usa el índice de archivo_hash)
+    Returns: Material o None
+    """
+    if not archivo_hash:
+        return None
+    return Material.objects.filter(
+        archivo_hash=archivo_hash,
+        tipo=tipo,
+        reutilizable=True,
+    ).exclude(archivo_url='').exclude(estado='rechazado').order_by('id').first()
+
+
+def indexar_scorm_subido(material, paquete_scorm):
+    """Guarda el índice de un paquete SCORM ya leído; retorna datos extra para la respuesta"""
+    if not paquete_scorm:
+        return {}
+    paquete = guardar_paquete_scorm(material, paquete_scorm)
+    return {'paquete_scorm_id': paquete.id}
+
+
+def leer_scorm_si_corresponde(tipo, origen):
+    """
+    Lee el paquete SCORM antes de subirlo, para rechazar ZIPs inválidos
+    sin gastar la subida
+    Returns: (datos_paquete, Response) - el Response solo si hay error
+    """
+    if tipo != 'scorm':
+        return None, None
+    datos = leer_paquete_scorm(origen)
+    if not datos['success']:
+        return None, Response(
+            {'error': f"Paquete SCORM inválido: {datos['error']}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return datos, None
+
+
+def crear_material_reutilizado(request, usuario, tipo, nombre, original, paquete_scorm=None):
+    """
+    Crea el Material del usuario apuntando al archivo ya almacenado de `original`,
+    sin volver a subir los bytes, e incrementa total_usos del original
+    """
+    material = Material.objects.create(
+        archivo_url=original.archivo_url,
+        archivo_size=original.archivo_size,
+        archivo_hash=original.archivo_hash,
+        duracion_segundos=original.duracion_segundos,
+        total_paginas=original.total_paginas,
+        metadata=original.metadata,
+        **datos_material_request(request, usuario, tipo, nombre)
+    )
+    Material.objects.filter(pk=original.pk).update(total_usos=F('total_usos') + 1)
+    
+    extra = indexar_scorm_subido(material, paquete_scorm)
+    
+    return respuesta_material(material, {
+        **extra,
+        'reutilizado': True,
+        'material_original_id': original.id,
+    })
+
+
+@api_view(['POST'])
+@permisos_vista(RELATOR_O_ADMINISTRADOR)
+def upload_material(request):
+    """
+    POST /api/upload/material/
+    Sube un archivo de material educativo a Cloudinary
+    
+    El archivo llega a un temporal en disco (FILE_UPLOAD_MAX_MEMORY_SIZE) y
+    se envía a Cloudinary por partes; para archivos grandes o conexiones
+    inestables usar las sesiones resumibles de /api/upload/material/sesiones/
+    """
     
     # Validar datos requeridos
     if 'file' not in request.FILES:
@@ -80,203 +272,457 @@ def upload_material(request):
     nombre = request.data['nombre']
     
     # Validar tipo
-    tipos_validos = ['pdf', 'video', 'documento', 'presentacion', 'imagen', 'scorm']
-    if tipo not in tipos_validos:
-        return Response(
-            {'error': f'Tipo de material no válido. Use: {", ".join(tipos_validos)}'}, 
-            status=status.HTTP_400_BAD_REQUEST
-        )
+    error = validar_tipo_material(tipo)
+    if error:
+        return error
+    
+    es_valido, mensaje = validar_archivo(file, tipo)
+    if not es_valido:
+        return Response({'error': mensaje}, status=status.HTTP_400_BAD_REQUEST)
+    
+    usuario = request.user.perfil
     
     try:
         # Obtener configuración del tipo
         config = settings.CLOUDINARY_SETTINGS['materiales'][tipo]
+        archivo_size = file.size
+        
+        paquete_scorm, error = leer_scorm_si_corresponde(tipo, file)
+        if error:
+            return error
+        
+        # Mismo contenido ya almacenado: reutilizar sin volver a subir
+        archivo_hash = calcular_sha256(file)
+        original = buscar_material_duplicado(tipo, archivo_hash)
+        if original:
+            return crear_material_reutilizado(request, usuario, tipo, nombre, original, paquete_scorm)
         
-        # Subir a Cloudinary
-        upload_result = cloudinary.uploader.upload(
+        # Metadatos desde el archivo local, antes de subirlo
+        metadatos = extraer_metadatos(file, tipo)
+        
+        # Subir a Cloudinary por partes (memoria acotada)
+        upload_result = subir_archivo_streaming(
             file,
-            folder=config['folder'],
-            resource_type='auto',
+            config['folder'],
             use_filename=True,
             unique_filename=True,
         )
         
-        # Crear material directamente con objects.create
-        material = Material.objects.create(
-            nombre=nombre,
-            descripcion=request.data.get('descripcion', ''),
-            tipo=tipo,
-            archivo_url=upload_result['secure_url'],
-            archivo_size=file.size,
-            subido_por=usuario,
-            relator_autor=usuario if usuario.tipo_usuario == 'relator' else None,
-            estado='pendiente' if usuario.tipo_usuario == 'relator' else 'aprobado',
-            categoria=request.data.get('categoria', ''),
-            tags=[tag.strip() for tag in request.data.get('tags', '').split(',') if tag.strip()]
+        return crear_material_subido(
+            request, usuario, tipo, nombre, upload_result, archivo_size, archivo_hash, metadatos,
+            paquete_scorm
         )
-        
-        # Metadata adicional según tipo
-        if tipo == 'video' and 'duration' in upload_result:
-            material.duracion_segundos = int(upload_result['duration'])
-            material.save()
-        
-        if tipo == 'pdf' and 'pages' in upload_result:
-            material.total_paginas = upload_result['pages']
-            material.save()
-        
-        return Response({
-            'success': True,
-            'message': 'Material subido exitosamente',
-            'material': {
-                'id': material.id,
-                'nombre': material.nombre,
-                'tipo': material.tipo,
-                'estado': material.estado,
-                'archivo_url': material.archivo_url,
-                'subido_por': material.subido_por.nombre_completo() if material.subido_por else None
-            },
-            'cloudinary': {
-                'public_id': upload_result['public_id'],
-                'url': upload_result['secure_url'],
-                'format': upload_result['format'],
-                'size': upload_result['bytes'],
-            }
-        }, status=status.HTTP_201_CREATED)
     
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception('Error al subir material')
         return Response(
             {'error': f'Error al subir archivo: {str(e)}'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+
 @api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def upload_avatar(request):
+@permisos_vista(RELATOR_O_ADMINISTRADOR)
+def iniciar_subida_material(request):
     """
-    POST /api/upload/avatar/
+    POST /api/upload/material/sesiones/
     
-    Sube una foto de avatar del usuario a Cloudinary
+    Inicia una subida resumible por chunks
     
-    Body (multipart/form-data):
-    - file: imagen a subir (jpg, jpeg, png)
+    Body:
+    - nombre_archivo: nombre original (para validar la extensión)
+    - total_bytes: tamaño total del archivo
+    - tipo: tipo de material
     """
+    nombre_archivo = request.data.get('nombre_archivo')
+    tipo = request.data.get('tipo')
+    try:
+        total_bytes = int(request.data.get('total_bytes'))
+    except (TypeError, ValueError):
+        total_bytes = 0
     
-    # Verificar perfil
-    if not hasattr(request.user, 'perfil'):
+    if not nombre_archivo or total_bytes <= 0:
         return Response(
-            {'error': 'Usuario sin perfil'}, 
+            {'error': 'Debe especificar nombre_archivo y total_bytes'},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    usuario = request.user.perfil
+    error = validar_tipo_material(tipo)
+    if error:
+        return error
     
-    # Validar archivo
-    if 'file' not in request.FILES:
+    es_valido, mensaje = validar_nombre_y_tamano(nombre_archivo, total_bytes, tipo)
+    if not es_valido:
+        return Response({'error': mensaje}, status=status.HTTP_400_BAD_REQUEST)
+    
+    sesion = iniciar_subida(contexto_autorizacion(request).perfil_id, nombre_archivo, total_bytes, tipo)
+    sesion['chunk_max'] = settings.SUBIDAS['CHUNK_MAX']
+    return Response(sesion, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'DELETE'])
+@permisos_vista(RELATOR_O_ADMINISTRADOR)
+def estado_subida_material(request, upload_id):
+    """
+    GET /api/upload/material/sesiones/{upload_id}/
+    Retorna cuántos bytes se han recibido (para reanudar una subida)
+    
+    DELETE /api/upload/material/sesiones/{upload_id}/
+    Cancela la subida y descarta lo recibido
+    """
+    sesion = obtener_subida(upload_id, contexto_autorizacion(request).perfil_id)
+    if not sesion:
+        return Response({'error': 'Sesión de subida no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if request.method == 'DELETE':
+        descartar_subida(upload_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    return Response(sesion)
+
+
+@api_view(['POST'])
+@permisos_vista(RELATOR_O_ADMINISTRADOR)
+def subir_chunk_material(request, upload_id):
+    """
+    POST /api/upload/material/sesiones/{upload_id}/chunks/
+    
+    Body (multipart/form-data):
+    - chunk: bloque de datos (máximo SUBIDAS['CHUNK_MAX'] bytes)
+    - offset: byte del archivo en que comienza el bloque
+    
+    Si el offset no coincide con lo recibido responde 409 con el offset
+    correcto ('recibido_bytes') para que el cliente continúe desde ahí.
+    """
+    sesion = obtener_subida(upload_id, contexto_autorizacion(request).perfil_id)
+    if not sesion:
+        return Response({'error': 'Sesión de subida no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if 'chunk' not in request.FILES:
+        return Response({'error': 'No se ha enviado ningún chunk'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    chunk = request.FILES['chunk']
+    if chunk.size > settings.SUBIDAS['CHUNK_MAX']:
+        max_mb = settings.SUBIDAS['CHUNK_MAX'] / (1024 * 1024)
         return Response(
-            {'error': 'No se ha enviado ningún archivo'}, 
+            {'error': f'El chunk excede el máximo de {max_mb:.0f} MB'},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    file = request.FILES['file']
+    try:
+        offset = int(request.data.get('offset'))
+    except (TypeError, ValueError):
+        return Response({'error': 'Debe especificar offset'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Validar archivo
-    es_valido, error = validar_archivo(file)
-    if not es_valido:
-        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+    resultado = agregar_chunk(sesion, offset, chunk)
+    if not resultado['success']:
+        return Response(resultado, status=status.HTTP_409_CONFLICT)
     
+    return Response(resultado)
+
+
+@api_view(['POST'])
+@permisos_vista(RELATOR_O_ADMINISTRADOR)
+def completar_subida_material(request, upload_id):
+    """
+    POST /api/upload/material/sesiones/{upload_id}/completar/
+    
+    Envía el archivo ensamblado a Cloudinary por partes y crea el Material
+    
+    Body: nombre (requerido), descripcion, categoria, tags
+    """
+    sesion = obtener_subida(upload_id, contexto_autorizacion(request).perfil_id)
+    if not sesion:
+        return Response({'error': 'Sesión de subida no encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if 'nombre' not in request.data:
+        return Response({'error': 'Debe especificar el nombre del material'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if sesion['recibido_bytes'] != sesion['total_bytes']:
+        return Response(
+            {
+                'error': 'La subida está incompleta',
+                'recibido_bytes': sesion['recibido_bytes'],
+                'total_bytes': sesion['total_bytes'],
+            },
+            status=status.HTTP_409_CONFLICT
+        )
+    
+    tipo = sesion['tipo']
+    usuario = request.user.perfil
     try:
-        # Configuración de avatares
-        config = settings.CLOUDINARY_SETTINGS['avatares']
+        config = settings.CLOUDINARY_SETTINGS['materiales'][tipo]
+        ruta_datos = ruta_datos_subida(upload_id)
         
-        # Subir a Cloudinary con transformaciones
-        upload_result = cloudinary.uploader.upload(
-            file,
-            folder=config['folder'],
-            transformation=[
-                {'width': 400, 'height': 400, 'crop': 'fill', 'gravity': 'face'},
-                {'quality': 'auto:good'},
-                {'fetch_format': 'auto'}
-            ],
-            use_filename=False,
-            unique_filename=True,
-        )
+        paquete_scorm, error = leer_scorm_si_corresponde(tipo, ruta_datos)
+        if error:
+            descartar_subida(upload_id)
+            return error
         
-        # Actualizar usuario
+        archivo_hash = calcular_sha256(ruta_datos)
+        original = buscar_material_duplicado(tipo, archivo_hash)
+        if original:
+            respuesta = crear_material_reutilizado(
+                request, usuario, tipo, request.data['nombre'], original, paquete_scorm
+            )
+        else:
+            metadatos = extraer_metadatos(ruta_datos, tipo)
+            upload_result = subir_archivo_streaming(
+                ruta_datos,
+                config['folder'],
+                nombre_archivo=sesion['nombre_archivo'],
+                use_filename=True,
+                unique_filename=True,
+            )
+            respuesta = crear_material_subido(
+                request, usuario, tipo, request.data['nombre'], upload_result,
+                sesion['total_bytes'], archivo_hash, metadatos, paquete_scorm
+            )
+    except Exception as e:
+        logger.exception('Error al completar la subida %s', upload_id)
+        # La sesión se conserva para poder reintentar la finalización
+        return Response(
+            {'error': f'Error al subir archivo: {str(e)}'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    descartar_subida(upload_id)
+    return respuesta
+
+
+@api_view(['POST'])
+@permisos_vista(AUTENTICADOS)
+def firmar_subida_directa(request):
+    """
+    POST /api/upload/directa/firmar/
+    
+    Entrega parámetros firmados y de corta duración para que el navegador
+    suba el archivo directamente a Cloudinary, sin pasar por el servidor
+    
+    Body:
+    - tipo: tipo de material (salvo 'scorm'), o 'avatar'
+    
+    El cliente hace POST multipart a 'upload_url' con 'params' + el archivo,
+    y luego llama a /api/upload/directa/completar/ con el 'token' y la
+    respuesta de Cloudinary.
+    
+    Como el servidor no ve los bytes, estas subidas no se deduplican por
+    hash ni se les extraen metadatos locales (duración y páginas salen de
+    la respuesta de Cloudinary).
+    """
+    error = sin_perfil(request)
+    if error:
+        return error
+    
+    tipo = request.data.get('tipo')
+    if tipo != 'avatar':
+        error = sin_permiso_materiales(request) or validar_tipo_material(tipo, TIPOS_SUBIDA_DIRECTA)
+        if error:
+            return error
+    
+    return Response(generar_firma_subida(contexto_autorizacion(request).perfil_id, tipo))
+
+
+@api_view(['POST'])
+@permisos_vista(AUTENTICADOS)
+def completar_subida_directa(request):
+    """
+    POST /api/upload/directa/completar/
+    
+    Registra una subida directa ya realizada por el navegador
+    
+    Body:
+    - token: entregado por /api/upload/directa/firmar/
+    - public_id, version, signature, resource_type: de la respuesta de Cloudinary
+    - nombre (requerido para materiales), descripcion, categoria, tags
+    
+    Cada token registra una sola vez: si el recurso ya está registrado
+    responde 409.
+    """
+    error = sin_perfil(request)
+    if error:
+        return error
+    
+    campos = ['token', 'public_id', 'version', 'signature', 'resource_type']
+    faltantes = [campo for campo in campos if not request.data.get(campo)]
+    if faltantes:
+        return Response(
+            {'error': f'Faltan campos: {", ".join(faltantes)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        verificacion = verificar_subida_directa(
+            contexto_autorizacion(request).perfil_id,
+            request.data['token'],
+            request.data['public_id'],
+            request.data['version'],
+            request.data['signature'],
+            request.data['resource_type'],
+        )
+    except Exception as e:
+        return Response(
+            {'error': f'Error al verificar la subida: {str(e)}'},
+            status=status.HTTP_502_BAD_GATEWAY
+        )
+    
+    if not verificacion['success']:
+        return Response({'error': verificacion['error']}, status=status.HTTP_400_BAD_REQUEST)
+    
+    tipo = verificacion['tipo']
+    upload_result = verificacion['upload_result']
+    
+    if tipo == 'avatar':
+        usuario = request.user.perfil
+        if usuario.avatar_url == upload_result['secure_url']:
+            return Response({'error': 'La subida ya fue registrada'}, status=status.HTTP_409_CONFLICT)
+        # El avatar subido directo no tiene variantes locales: se descartan las anteriores
+        eliminar_variantes_avatar(usuario.avatar_variantes)
         usuario.avatar_url = upload_result['secure_url']
+        usuario.avatar_variantes = {}
         usuario.save()
-        
         return Response({
             'success': True,
             'message': 'Avatar actualizado exitosamente',
             'usuario': UsuarioSerializer(usuario).data,
-            'cloudinary': {
-                'public_id': upload_result['public_id'],
-                'url': upload_result['secure_url'],
-                'format': upload_result['format'],
-                'size': upload_result['bytes'],
-            }
         }, status=status.HTTP_200_OK)
     
-    except Exception as e:
-        return Response(
-            {'error': f'Error al subir avatar: {str(e)}'}, 
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
+    # El rol pudo cambiar entre la firma y la finalización; los tokens
+    # firmados antes de excluir SCORM se rechazan igual
+    error = sin_permiso_materiales(request) or validar_tipo_material(tipo, TIPOS_SUBIDA_DIRECTA)
+    if error:
+        return error
+    
+    if 'nombre' not in request.data:
+        return Response({'error': 'Debe especificar el nombre del material'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # El public_id lo genera la firma: si ya hay un Material con esa URL,
+    # el token ya se usó
+    if Material.objects.filter(archivo_url=upload_result['secure_url']).exists():
+        return Response({'error': 'La subida ya fue registrada'}, status=status.HTTP_409_CONFLICT)
+    
+    return crear_material_subido(
+        request, request.user.perfil, tipo, request.data['nombre'], upload_result, upload_result['bytes']
+    )
+
+
+@api_view(['POST', 'DELETE'])
+@permisos_vista(AUTENTICADOS)
+def avatar(request):
+    """
+    POST/DELETE /api/upload/avatar/
+    
+    Ambos métodos comparten la URL: POST sube un avatar, DELETE lo elimina
+    """
+    
+    error = sin_perfil(request)
+    if error:
+        return error
+    
+    usuario = request.user.perfil
+    
+    if request.method == 'POST':
+        return subir_avatar(request, usuario)
+    return eliminar_avatar(usuario)
 
 
-@api_view(['DELETE'])
-@permission_classes([IsAuthenticated])
-def delete_avatar(request):
+def subir_avatar(request, usuario):
     """
-    DELETE /api/upload/avatar/
+    Procesa localmente la foto de avatar y sube variantes WebP de
+    48, 128 y 400 px con nombre según su contenido (URLs inmutables)
     
-    Elimina el avatar del usuario
+    Body (multipart/form-data):
+    - file: imagen a subir (jpg, jpeg, png)
     """
     
-    if not hasattr(request.user, 'perfil'):
+    # Validar archivo
+    if 'file' not in request.FILES:
         return Response(
-            {'error': 'Usuario sin perfil'}, 
+            {'error': 'No se ha enviado ningún archivo'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    usuario = request.user.perfil
+    file = request.FILES['file']
+    
+    # Validar archivo
+    es_valido, error = validar_archivo(file)
+    if not es_valido:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
     
-    if not usuario.avatar_url:
+    try:
+        variantes = generar_variantes_avatar(file)
+    except Image.DecompressionBombError:
         return Response(
-            {'error': 'El usuario no tiene avatar'}, 
+            {'error': 'La imagen es demasiado grande; use una de menor resolución'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except (UnidentifiedImageError, OSError):
+        return Response(
+            {'error': 'El archivo no es una imagen válida'},
             status=status.HTTP_400_BAD_REQUEST
         )
     
     try:
-        # Extraer public_id de la URL (si es de Cloudinary)
-        if 'cloudinary.com' in usuario.avatar_url:
-            # URL típica: https://res.cloudinary.com/cloud_name/image/upload/v123456/folder/file.jpg
-            parts = usuario.avatar_url.split('/')
-            if len(parts) >= 2:
-                # El public_id incluye folder/filename sin extensión
-                public_id_parts = parts[-2:]  # folder y filename
-                public_id = '/'.join(public_id_parts).rsplit('.', 1)[0]
-                
-                # Eliminar de Cloudinary
-                cloudinary.uploader.destroy(public_id)
-        
-        # Limpiar URL en BD
-        usuario.avatar_url = ''
-        usuario.save()
-
-        return Response({
-            'success': True,
-            'message': 'Avatar eliminado exitosamente'
-        }, status=status.HTTP_200_OK)
-        
+        nuevas_variantes = subir_variantes_avatar(usuario.id, variantes)
     except Exception as e:
-        import traceback
-        print("=" * 80)
-        print("ERROR COMPLETO:")
-        traceback.print_exc()
-        print("=" * 80)
         return Response(
-            {'error': f'Error al eliminar avatar: {str(e)}'}, 
+            {'error': f'Error al subir avatar: {str(e)}'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+    
+    variantes_anteriores = usuario.avatar_variantes
+    
+    # Actualizar usuario (avatar_url se mantiene con la variante grande)
+    usuario.avatar_variantes = nuevas_variantes
+    usuario.avatar_url = nuevas_variantes[str(LADOS_AVATAR[-1])]['url']
+    usuario.save(update_fields=['avatar_variantes', 'avatar_url', 'ultima_actualizacion'])
+    
+    # Las variantes anteriores se eliminan solo después de guardar las nuevas
+    # (si la imagen es la misma, los public_id coinciden y no se borra nada)
+    nuevos_ids = {variante['public_id'] for variante in nuevas_variantes.values()}
+    eliminar_variantes_avatar({
+        lado: variante for lado, variante in variantes_anteriores.items()
+        if variante['public_id'] not in nuevos_ids
+    })
+    
+    return Response({
+        'success': True,
+        'message': 'Avatar actualizado exitosamente',
+        'usuario': UsuarioSerializer(usuario).data,
+        'variantes': urls_avatar(usuario),
+    }, status=status.HTTP_200_OK)
+
+
+def eliminar_avatar(usuario):
+    """Elimina el avatar del usuario (variantes y URL)"""
+    
+    if not usuario.avatar_url and not usuario.avatar_variantes:
+        return Response(
+            {'error': 'El usuario no tiene avatar'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if usuario.avatar_variantes:
+        # Los public_id quedaron registrados al subir las variantes
+        eliminar_variantes_avatar(usuario.avatar_variantes)
+    elif 'cloudinary.com' in usuario.avatar_url:
+        # Avatares anteriores a las variantes: derivar el public_id de la URL
+        public_id = public_id_desde_url(usuario.avatar_url)
+        if public_id:
+            try:
+                cloudinary.uploader.destroy(public_id)
+            except Exception as e:
+                return Response(
+                    {'error': f'Error al eliminar avatar: {str(e)}'}, 
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+    
+    # Limpiar avatar en BD
+    usuario.avatar_url = ''
+    usuario.avatar_variantes = {}
+    usuario.save(update_fields=['avatar_url', 'avatar_variantes', 'ultima_actualizacion'])
+    
+    return Response({
+        'success': True,
+        'message': 'Avatar eliminado exitosamente'
+    }, status=status.HTTP_200_OK)
@@ -0,0 +1,120 @@
+# visibilidad.py
+# Cursos visibles por rol, calculados una vez por request
+# LMS JC Digital Training
+
+"""
+Los ViewSets filtraban por relator con joins multivaluados
+(curso__asignaciones_relator__relator=...), que obligan a unir cada fila con
+la tabla de asignaciones. Aquí se obtiene primero el conjunto de IDs de
+curso del usuario (una consulta pequeña sobre índices) y los querysets se
+filtran con `curso_id IN (...)`: sin joins extra ni filas duplicadas.
+
+Los conjuntos viven en un ContextoAutorizacion guardado en el HttpRequest,
+así que los distintos ViewSets, serializers y permisos (también los de
+objeto, en permissions.py) de un mismo request los calculan una sola vez.
+"""
+
+from api_lms.authentication import rol_usuario, perfil_id
+from api_lms.models import CursoRelator, Inscripcion
+
+
+class ContextoAutorizacion:
+    """
+    Rol, perfil y cursos del usuario de un request
+
+    Los conjuntos de cursos se consultan la primera vez que se piden y
+    quedan en memoria: permisos de objeto, filtros de queryset y
+    serializers del mismo request responden desde ahí, sin una consulta
+    por objeto.
+    """
+
+    def __init__(self, request):
+        self.rol = rol_usuario(request.user)
+        self.perfil_id = perfil_id(request.user)
+        self._cursos_relator = {}
+        self._cursos_estudiante = None
+
+    @property
+    def es_administrador(self):
+        return self.rol == 'administrador'
+
+    def cursos_relator(self, solo_activos=False):
+        """
+        IDs de los cursos asignados al relator
+
+        Args:
+            solo_activos: True para considerar solo asignaciones activas
+
+        Returns:
+            frozenset de IDs de curso
+        """
+        if solo_activos not in self._cursos_relator:
+            asignaciones = CursoRelator.objects.filter(relator_id=self.perfil_id)
+            if solo_activos:
+                asignaciones = asignaciones.filter(activo=True)
+            self._cursos_relator[solo_activos] = frozenset(asignaciones.values_list('curso_id', flat=True))
+        return self._cursos_relator[solo_activos]
+
+    def cursos_estudiante(self):
+        """IDs de los cursos en que está inscrito el usuario"""
+        if self._cursos_estudiante is None:
+            self._cursos_estudiante = frozenset(
+                Inscripcion.objects.filter(estudiante_id=self.perfil_id).values_list('curso_id', flat=True)
+            )
+        return self._cursos_estudiante
+
+    def relator_de(self, curso_id, solo_activos=False):
+        return self.rol == 'relator' and curso_id in self.cursos_relator(solo_activos)
+
+    def inscrito_en(self, curso_id):
+        return self.rol == 'estudiante' and curso_id in self.cursos_estudiante()
+
+    def puede_ver_curso(self, curso_id):
+        """Administrador: todos; relator: asignados; estudiante: inscritos"""
+        return self.es_administrador or self.relator_de(curso_id) or self.inscrito_en(curso_id)
+
+    def es_propio(self, usuario_id):
+        """True si usuario_id es el perfil del usuario del request"""
+        return self.perfil_id is not None and usuario_id == self.perfil_id
+
+
+def contexto_autorizacion(request):
+    """ContextoAutorizacion del request (se crea una vez, en el HttpRequest)"""
+    http_request = getattr(request, '_request', request)
+    contexto = getattr(http_request, '_contexto_autorizacion', None)
+    if contexto is None:
+        contexto = http_request._contexto_autorizacion = ContextoAutorizacion(request)
+    return contexto
+
+
+def cursos_relator(request, solo_activos=False):
+    """
+    IDs de los cursos asignados al relator del request
+
+    Args:
+        request: Request con usuario autenticado con perfil
+        solo_activos: True para considerar solo asignaciones activas
+
+    Returns:
+        frozenset de IDs de curso
+    """
+    return contexto_autorizacion(request).cursos_relator(solo_activos)
+
+
+def cursos_estudiante(request):
+    """IDs de los cursos en que está inscrito el usuario del request"""
+    return contexto_autorizacion(request).cursos_estudiante()
+
+
+def filtrar_por_cursos_relator(queryset, request, campo_curso, solo_activos=False):
+    """
+    Restringe el queryset a los cursos del relator
+
+    Args:
+        queryset: Queryset a filtrar
+        request: Request del relator
+        campo_curso: Ruta al curso desde el modelo ('id' para Curso,
+            'curso' para Inscripcion, 'inscripcion__curso', ...)
+        solo_activos: Ver cursos_relator()
+    """
+    return queryset.filter(**{f'{campo_curso}__in': cursos_relator(request, solo_activos)})
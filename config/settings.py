@@ -5,6 +5,7 @@ Django settings for LMS JC Digital Training
 from pathlib import Path
 from decouple import config, Csv
 import os
+import tempfile
 
 # Build paths
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -36,6 +37,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'api_lms.instrumentacion.InstrumentacionConsultasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -108,7 +110,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # ← Agregar .authentication
+        # JWTAuthentication sin consultas: rol y perfil desde los claims del token
+        'api_lms.authentication.JWTClaimsAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -119,9 +122,15 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
+        'api_lms.filters.CamposDinamicosFilter',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'api_lms.renderers.ORJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api_lms.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DATETIME_FORMAT': '%Y-%m-%d %H:%M:%S',
 }
@@ -131,6 +140,21 @@ if DEBUG:
         'rest_framework.renderers.BrowsableAPIRenderer'
     )
 
+# Cache (locmem por defecto; en producción debe apuntar a Redis con
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache y CACHE_LOCATION=redis://...)
+# LocMemCache es por proceso: con varios workers de gunicorn las
+# invalidaciones no llegan a los demás (ver CACHE_RESPUESTAS['ACTIVO'])
+CACHES_POR_PROCESO = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='lms-jcdigital'),
+    }
+}
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = config('CORS_ALLOWED_ORIGINS', cast=Csv())
 CORS_ALLOW_CREDENTIALS = True
@@ -139,8 +163,20 @@ CORS_ALLOW_CREDENTIALS = True
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
 
 # File Upload Settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = config('MAX_UPLOAD_SIZE', default=104857600, cast=int)
-DATA_UPLOAD_MAX_MEMORY_SIZE = FILE_UPLOAD_MAX_MEMORY_SIZE
+# Sobre este umbral Django escribe el archivo a un temporal en disco en vez de
+# mantenerlo en RAM; así varios videos grandes en paralelo no agotan la memoria
+FILE_UPLOAD_MAX_MEMORY_SIZE = config('UPLOAD_MAX_MEMORY_SIZE', default=2621440, cast=int)
+FILE_UPLOAD_TEMP_DIR = config('FILE_UPLOAD_TEMP_DIR', default=None)
+DATA_UPLOAD_MAX_MEMORY_SIZE = config('MAX_UPLOAD_SIZE', default=104857600, cast=int)
+
+# Subidas en streaming (ver api_lms/services/subidas.py)
+SUBIDAS = {
+    'DIRECTORIO': config('SUBIDAS_DIRECTORIO', default=os.path.join(tempfile.gettempdir(), 'lms_subidas')),
+    'CHUNK_CLOUDINARY': 6 * 1024 * 1024,  # partes enviadas a Cloudinary (mínimo 5 MB)
+    'CHUNK_MAX': 10 * 1024 * 1024,  # tamaño máximo de cada chunk recibido del cliente
+    'EXPIRACION': 24 * 60 * 60,  # segundos antes de descartar una sesión abandonada
+    'FIRMA_EXPIRACION': 15 * 60,  # validez de los parámetros de subida directa firmados
+}
 
 # SENCE Integration
 SENCE_API_URL = config('SENCE_API_URL', default='')
@@ -204,6 +240,99 @@ CLOUDINARY_SETTINGS = {
     }
 }
 
+# Backends de almacenamiento (ver api_lms/services/almacenamiento.py)
+# Para desarrollo/pruebas: DIPLOMAS_STORAGE_BACKEND=api_lms.services.almacenamiento.LocalBackend
+ALMACENAMIENTO = {
+    'diplomas': {
+        'BACKEND': config('DIPLOMAS_STORAGE_BACKEND', default='api_lms.services.almacenamiento.CloudinaryBackend'),
+        'CARPETA': 'diplomas',
+        'MAX_WORKERS': config('DIPLOMAS_UPLOAD_WORKERS', default=4, cast=int),
+        'REINTENTOS': config('DIPLOMAS_UPLOAD_REINTENTOS', default=3, cast=int),
+        'BACKOFF_BASE': 1.0,  # segundos; se duplica en cada reintento
+        'TIMEOUT': config('DIPLOMAS_UPLOAD_TIMEOUT', default=60, cast=int),
+    },
+    'avatares': {
+        'BACKEND': config('AVATARES_STORAGE_BACKEND', default='api_lms.services.almacenamiento.CloudinaryBackend'),
+        'CARPETA': 'lms/avatares',
+        'MAX_WORKERS': 3,  # una subida por variante
+        'REINTENTOS': 2,
+        'BACKOFF_BASE': 0.5,
+        'TIMEOUT': 30,
+    },
+}
+
+# Validación pública de diplomas (GET /api/diplomas/validar/{codigo}/)
+DIPLOMAS_VALIDACION = {
+    'CACHE_TTL': 60 * 60,  # segundos para códigos válidos
+    'CACHE_TTL_NEGATIVO': 5 * 60,  # segundos para códigos inexistentes
+    'MAX_AGE_HTTP': 5 * 60,  # Cache-Control para navegadores/CDN
+    'THROTTLE_CAPACIDAD': config('DIPLOMAS_VALIDACION_RAFAGA', default=30, cast=int),
+    'THROTTLE_RECARGA': config('DIPLOMAS_VALIDACION_POR_SEGUNDO', default=0.5, cast=float),
+}
+
+# Códigos de validación firmados (HMAC) y QR embebido en el PDF
+DIPLOMAS_FIRMA = {
+    # Rotar este secreto invalida todos los códigos firmados ya emitidos
+    'SECRETO': config('DIPLOMAS_FIRMA_SECRETO', default=SECRET_KEY),
+    # Prefijo de la URL codificada en el QR; vacío para codificar solo el código
+    'URL_VALIDACION': config('DIPLOMAS_URL_VALIDACION', default=''),
+}
+
+# Paquetes SCORM (ver api_lms/services/scorm.py)
+SCORM = {
+    'TOKEN_EXPIRACION': 4 * 60 * 60,  # segundos de validez de un lanzamiento
+    'TIMEOUT': 30,  # segundos por petición por rango al almacenamiento
+    'MAX_MANIFIESTO': 5 * 1024 * 1024,  # tamaño máximo de imsmanifest.xml descomprimido
+}
+
+# Estructura de cursos (GET /api/cursos/{id}/estructura/), invalidada por versión
+ESTRUCTURA_CURSOS = {
+    'CACHE_TTL': 24 * 60 * 60,  # segundos; las versiones viejas expiran solas
+}
+
+# Cache de respuestas de catálogo (api_lms/mixins.py: RespuestaCacheadaMixin)
+CACHE_RESPUESTAS = {
+    'TTL': config('CACHE_RESPUESTAS_TTL', default=10 * 60, cast=int),
+    # Los tokens de versión (respuestas de catálogo, ETags que dependen de
+    # otros modelos y estructura de cursos) deben vivir en un cache
+    # compartido por todos los procesos. Con LocMemCache queda desactivado
+    # salvo que se fuerce (solo para un proceso, p.ej. runserver)
+    'ACTIVO': config(
+        'CACHE_RESPUESTAS_ACTIVO',
+        default=CACHES['default']['BACKEND'] not in CACHES_POR_PROCESO,
+        cast=bool
+    ),
+}
+
+# Cola de generación asíncrona de diplomas (worker: manage.py procesar_diplomas)
+DIPLOMAS_JOBS = {
+    'MAX_INTENTOS': config('DIPLOMAS_JOBS_MAX_INTENTOS', default=3, cast=int),
+    'BACKOFF_BASE': 30,  # segundos; se duplica en cada reintento
+    'TIMEOUT_PROCESANDO': 15 * 60,  # segundos antes de retomar un trabajo abandonado
+    'INTERVALO_POLLING': 5,  # segundos entre consultas cuando la cola está vacía
+}
+
+# Endpoints masivos de contenido (api_lms/mixins.py: OperacionesMasivasMixin)
+OPERACIONES_MASIVAS = {
+    'MAX_ELEMENTOS': config('OPERACIONES_MASIVAS_MAX', default=500, cast=int),
+    'BATCH_SIZE': 200,  # filas por INSERT/UPDATE
+}
+
+# Registro masivo de usuarios (api_lms/services/registro.py)
+REGISTRO_MASIVO = {
+    'MAX_USUARIOS': config('REGISTRO_MASIVO_MAX', default=1000, cast=int),
+    'HILOS_HASH': config('REGISTRO_MASIVO_HILOS', default=4, cast=int),  # hilos para make_password
+    'BATCH_SIZE': 500,
+}
+
+# Instrumentación de consultas SQL por request (api_lms/instrumentacion.py)
+INSTRUMENTACION = {
+    'ACTIVA': config('INSTRUMENTACION_CONSULTAS', default=DEBUG, cast=bool),
+    'HEADERS': DEBUG,  # X-DB-Queries, X-DB-Time-Ms, X-DB-Duplicates, Server-Timing
+    'ESTADISTICAS': True,  # acumuladas por endpoint (manage.py estadisticas_consultas)
+    'ESTRICTO': config('INSTRUMENTACION_ESTRICTO', default=False, cast=bool),  # excepción si se excede el presupuesto
+}
+
 
 # Logging
 os.makedirs(BASE_DIR / 'logs', exist_ok=True)